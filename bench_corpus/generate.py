@@ -0,0 +1,127 @@
+"""
+Generate the synthetic pages in this corpus.
+
+They mimic the markup x.com serves to a logged-in browser: the app shell,
+inline scripts and styles, navigation, error/noscript containers and the
+tweetText/longform nodes the extractor reads. Output is deterministic, so
+regenerating only changes files when this script changes; bump
+CORPUS_VERSION when it does, since baselines are tied to the corpus.
+
+Real pages saved with debug traces (traces/<request id>/raw_page.html)
+can be dropped in alongside these and added to manifest.json.
+
+Usage: python bench_corpus/generate.py
+"""
+
+import json
+import os
+import random
+
+CORPUS_VERSION = 1
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WORDS = (
+    "the a writing build attention system habit focus leverage skill audience product "
+    "learn create work value idea time people future simple hard problem solve market "
+    "content compound years daily practice distribution internet one person business"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def shell(title: str, body: str, rng: random.Random) -> str:
+    """Wrap content in the scripts, styles and chrome of the x.com app."""
+    scripts = "\n".join(
+        f'<script nonce="n">window.__SCRIPTS__.push({json.dumps(paragraph(rng, 30))});</script>'
+        for _ in range(40)
+    )
+    styles = "\n".join(f".r-{i:x}{{margin:{i % 7}px;padding:{i % 5}px}}" for i in range(3000))
+    nav = "".join(
+        f'<a role="link" href="/{item.lower()}"><span>{item}</span></a>'
+        for item in ("Home", "Explore", "Notifications", "Messages", "Bookmarks", "Profile", "More")
+    )
+    return f"""<!DOCTYPE html>
+<html dir="ltr" lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>{styles}</style>
+{scripts}
+</head>
+<body>
+<noscript><div class="errorContainer"><p>JavaScript is not available. We've detected that JavaScript is disabled in this browser.</p></div></noscript>
+<div id="react-root"><div class="css-175oi2r">
+<header role="banner"><nav aria-label="Primary">{nav}</nav></header>
+<main role="main"><div data-testid="primaryColumn"><section aria-label="Timeline: Conversation">
+{body}
+</section></div></main>
+<aside aria-label="Who to follow"><div><span>Follow</span><span>Show more</span></div></aside>
+</div></div>
+</body>
+</html>"""
+
+
+def tweet(rng: random.Random, text: str) -> str:
+    actions = "".join(
+        f'<div role="group"><button data-testid="{name}"><span>{rng.randint(1, 999)}K</span></button></div>'
+        for name in ("reply", "retweet", "like", "bookmark")
+    )
+    return f"""<article data-testid="tweet" role="article" tabindex="-1">
+<div data-testid="User-Name"><span>Dan Koe</span><span>@thedankoe</span><time>Jan 15</time></div>
+<div data-testid="tweetText" lang="en"><span class="css-1jxf684">{text}</span></div>
+{actions}
+</article>"""
+
+
+def short_tweet(rng: random.Random) -> str:
+    text = paragraph(rng, 2)
+    return shell(f'Dan Koe on X: "{text[:60]}" / X', tweet(rng, text), rng)
+
+
+def long_thread(rng: random.Random) -> str:
+    tweets = [tweet(rng, paragraph(rng, rng.randint(2, 4))) for _ in range(40)]
+    return shell('Dan Koe on X: "How to build a one person business" / X', "\n".join(tweets), rng)
+
+
+def longform_article(rng: random.Random) -> str:
+    blocks = []
+    for section in range(12):
+        blocks.append(f'<div class="longform-header-one"><span>Part {section + 1}: {sentence(rng, 5)}</span></div>')
+        for _ in range(6):
+            # Inline styling splits a paragraph into several spans, as on the real page
+            spans = "".join(
+                f'<span class="css-1jxf684{" r-b88u0q" if i % 3 == 0 else ""}">{sentence(rng, rng.randint(8, 20))} </span>'
+                for i in range(rng.randint(2, 5))
+            )
+            blocks.append(f'<div class="longform-unstyled"><div data-block="true">{spans}</div></div>')
+    body = f"""<article data-testid="tweet" role="article">
+<div data-testid="twitterArticleRichTextView">{"".join(blocks)}</div>
+</article>"""
+    return shell('Dan Koe on X: "The art of focus" / X', body, rng)
+
+
+FIXTURES = {
+    "short_tweet": ("https://x.com/thedankoe/status/1000000000000000001", short_tweet),
+    "long_thread": ("https://x.com/thedankoe/status/1000000000000000002", long_thread),
+    "longform_article": ("https://x.com/thedankoe/status/1000000000000000003", longform_article),
+}
+
+
+if __name__ == "__main__":
+    manifest = {"version": CORPUS_VERSION, "fixtures": {}}
+    for name, (url, build) in FIXTURES.items():
+        page = build(random.Random(name))
+        with open(os.path.join(HERE, f"{name}.html"), "w") as f:
+            f.write(page)
+        manifest["fixtures"][name] = {"file": f"{name}.html", "url": url}
+        print(f"{name}.html: {len(page) // 1024} KB")
+    with open(os.path.join(HERE, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,194 @@
+"""
+Offline benchmark for extraction and rendering over the saved pages in bench_corpus/.
+
+Each stage is measured separately per page: wall time (best of --runs, the
+least noisy figure on a shared machine), peak Python memory (tracemalloc,
+one extra run) and output size. Results are compared with
+bench_corpus/baseline.json and the script exits non-zero when a stage is
+slower, hungrier or bigger than the baseline by more than --threshold.
+
+Timings only compare on the same machine, so the baseline is not committed:
+record it where the comparison runs (e.g. on the base commit in the same CI
+job), and raise --threshold on shared or throttled hosts.
+
+Usage:
+    python bench_extract.py                     # compare with the baseline
+    python bench_extract.py --update-baseline   # record a new baseline
+    python bench_extract.py --runs 10 --threshold 0.25 --no-render
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from readability.htmls import build_doc
+
+from extractor import _ArticleDocument, _collect_paragraphs, _format_html, _remove_twitter_errors, clean_html
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_corpus")
+BASELINE = os.path.join(CORPUS_DIR, "baseline.json")
+
+# Differences below these are noise whatever the ratio
+MIN_MS = 1.0
+MIN_KB = 64
+
+
+def load_corpus() -> tuple[int, dict[str, str]]:
+    with open(os.path.join(CORPUS_DIR, "manifest.json")) as f:
+        manifest = json.load(f)
+    pages = {}
+    for name, fixture in manifest["fixtures"].items():
+        with open(os.path.join(CORPUS_DIR, fixture["file"])) as f:
+            pages[name] = f.read()
+    return manifest["version"], pages
+
+
+def load_renderer():
+    """pdf_renderer._render, or None when WeasyPrint's native libraries are missing."""
+    try:
+        from pdf_renderer import _render
+
+        _render("<p>warm up</p>")
+    except (ImportError, OSError) as e:
+        print(f"Skipping render stage: {str(e).splitlines()[0]}")
+        return None
+    return _render
+
+
+def pipeline(raw_html: str, render):
+    """Yield (stage, callable) pairs; each callable runs the stage and returns its output."""
+    state = {}
+
+    def parse():
+        state["doc"], _ = build_doc(raw_html)
+
+    def remove_errors():
+        _remove_twitter_errors(state["doc"])
+
+    def readability():
+        state["readable"] = _ArticleDocument(state["doc"])
+        state["summary"] = state["readable"].summary()
+        state["title"] = state["readable"].title()
+        return state["summary"]
+
+    def clean():
+        # The string-in helper as a whole (re-parse, collect, format); not part of the chain below
+        return clean_html(state["summary"], state["title"])
+
+    def collect_paragraphs():
+        state["parts"] = _collect_paragraphs(state["readable"].article)
+
+    def format_html():
+        state["html"] = _format_html(state["parts"], state["title"])
+        return state["html"]
+
+    stages = [
+        ("parse", parse),
+        ("remove_errors", remove_errors),
+        ("readability", readability),
+        ("clean_html", clean),
+        ("collect_paragraphs", collect_paragraphs),
+        ("format_html", format_html),
+    ]
+    if render is not None:
+        stages.append(("render", lambda: render(state["html"])))
+    return stages
+
+
+def measure(raw_html: str, runs: int, render) -> dict:
+    """Per-stage {"ms", "peak_kb", "bytes"} for one page."""
+    times = {}
+    sizes = {}
+    for _ in range(runs):
+        for stage, run in pipeline(raw_html, render):
+            start = time.perf_counter()
+            output = run()
+            times.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+            sizes[stage] = len(output) if output is not None else 0
+
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for stage, run in pipeline(raw_html, render):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run()
+            peaks[stage] = (tracemalloc.get_traced_memory()[1] - before) / 1024
+    finally:
+        tracemalloc.stop()
+
+    return {
+        stage: {
+            "ms": round(min(times[stage]), 2),
+            "peak_kb": round(peaks[stage]),
+            "bytes": sizes[stage],
+        }
+        for stage in times
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Describe every stage that got worse than the baseline by more than `threshold`."""
+    problems = []
+    limits = {"ms": MIN_MS, "peak_kb": MIN_KB, "bytes": 0}
+    for page, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(page, {}).get(stage)
+            if base is None:
+                continue
+            for metric, floor in limits.items():
+                if current[metric] > base[metric] * (1 + threshold) and current[metric] - base[metric] > floor:
+                    problems.append(
+                        f"{page}/{stage}: {metric} {base[metric]:g} -> {current[metric]:g}"
+                        f" (+{(current[metric] / max(base[metric], 1e-9) - 1) * 100:.0f}%)"
+                    )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression ratio")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-render", action="store_true", help="skip WeasyPrint rendering")
+    args = parser.parse_args()
+
+    version, pages = load_corpus()
+    render = None if args.no_render else load_renderer()
+
+    results = {}
+    print(f"{'page':<18} {'stage':<18} {'ms':>9} {'peak KB':>9} {'bytes':>9}")
+    for page, raw_html in pages.items():
+        results[page] = measure(raw_html, args.runs, render)
+        for stage, result in results[page].items():
+            print(f"{page:<18} {stage:<18} {result['ms']:9.2f} {result['peak_kb']:9} {result['bytes']:9}")
+
+    if args.update_baseline:
+        with open(BASELINE, "w") as f:
+            json.dump({"corpus_version": version, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE}")
+        return 0
+
+    if not os.path.exists(BASELINE):
+        print("No baseline on this machine yet; run with --update-baseline (e.g. on the base commit) first")
+        return 1
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    if baseline["corpus_version"] != version:
+        print(f"Baseline is for corpus v{baseline['corpus_version']}, corpus is v{version}; re-record it")
+        return 1
+
+    problems = regressions(results, baseline["results"], args.threshold)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if not problems:
+        print(f"✓ No stage regressed more than {args.threshold:.0%}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
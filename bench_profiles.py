@@ -0,0 +1,83 @@
+"""
+Compare output profiles per article: bytes, render time and CPU time.
+
+Each page in bench_corpus/ (plus any saved pages given on the command
+line, e.g. a debug trace's raw_page.html) is extracted once, then rendered
+in-process with every profile: the PDF profiles in RENDER_PROFILES, and
+"epub" for the EPUB output. Results are reported per article against the
+first profile.
+
+Usage:
+    python bench_profiles.py                              # default vs remarkable vs epub
+    python bench_profiles.py --profiles default,epub --runs 5 traces/abc/raw_page.html
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from bench_extract import load_corpus
+from epub_builder import build_epub
+from extractor import parse_article
+from pdf_renderer import RENDER_PROFILES, _render
+
+EPUB = "epub"
+
+
+def articles(paths: list[str]) -> dict[str, str]:
+    """Article HTML keyed by name: the benchmark corpus, then any extra saved pages."""
+    _, pages = load_corpus()
+    for path in paths:
+        with open(path) as f:
+            pages[os.path.relpath(path)] = f.read()
+    return {name: parse_article(raw_html, "", "")["html"] for name, raw_html in pages.items()}
+
+
+def renderer(profile: str):
+    if profile == EPUB:
+        return lambda html_content: build_epub("Benchmark", html_content)
+    return lambda html_content: _render(html_content, profile)
+
+
+def measure(html_content: str, profile: str, runs: int) -> tuple[int, float, float]:
+    """(output bytes, best wall ms, best CPU ms) for one article and profile."""
+    render = renderer(profile)
+    render(html_content)  # Warm up fonts and stylesheet
+    wall, cpu = [], []
+    for _ in range(runs):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        size = len(render(html_content))
+        wall.append((time.perf_counter() - start) * 1000)
+        cpu.append((time.process_time() - start_cpu) * 1000)
+    return size, min(wall), min(cpu)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pages", nargs="*", help="extra saved pages (raw HTML) to include")
+    parser.add_argument("--profiles", default="default,remarkable,epub", help="comma-separated, first is the baseline")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(",")
+    unknown = [profile for profile in profiles if profile not in RENDER_PROFILES and profile != EPUB]
+    if unknown:
+        print(f"Unknown profile(s): {', '.join(unknown)}; have {', '.join([*RENDER_PROFILES, EPUB])}")
+        return 1
+
+    print(f"{'article':<22} {'profile':<12} {'bytes':>9} {'vs base':>8} {'ms':>8} {'cpu ms':>8} {'vs base':>8}")
+    for name, html_content in articles(args.pages).items():
+        base = None
+        for profile in profiles:
+            size, ms, cpu_ms = measure(html_content, profile, args.runs)
+            base = base or (size, ms, cpu_ms)
+            print(
+                f"{name[:22]:<22} {profile:<12} {size:9} {size / base[0] - 1:+8.0%} "
+                f"{ms:8.1f} {cpu_ms:8.1f} {cpu_ms / max(base[2], 1e-9) - 1:+8.0%}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for PDF rendering.
+Compares re-parsing an inline <style> block on every render against the
+cached profile stylesheet and FontConfiguration used by pdf_renderer.
+Runs in-process (no worker pool) so only the rendering itself is timed.
+
+Usage: python bench_render.py [renders]
+"""
+
+import io
+import sys
+import time
+
+from weasyprint import HTML
+
+from extractor import _format_html
+from pdf_renderer import RENDER_PROFILES, _render, _stylesheet
+
+
+def sample_article(paragraphs: int = 40) -> str:
+    text = "A reasonably long tweet in a thread, the kind that wraps over a few lines. " * 3
+    return _format_html([f"{i}. {text}" for i in range(paragraphs)], "Benchmark thread / X")
+
+
+def render_inline(html_content: str) -> bytes:
+    """The old approach: wrap the article in a new document with an inline stylesheet."""
+    styled_html = f"""<!DOCTYPE html>
+    <html><head><meta charset="utf-8"><style>{RENDER_PROFILES["default"]}</style></head>
+    <body>{html_content}</body></html>"""
+    pdf_buffer = io.BytesIO()
+    HTML(string=styled_html).write_pdf(pdf_buffer)
+    return pdf_buffer.getvalue()
+
+
+def bench(label: str, render, html_content: str, renders: int) -> float:
+    render(html_content)  # Warm up fonts and caches
+    start = time.perf_counter()
+    for _ in range(renders):
+        size = len(render(html_content))
+    per_render = (time.perf_counter() - start) / renders * 1000
+    print(f"{label:<22} {per_render:8.1f} ms/render  ({size} bytes)")
+    return per_render
+
+
+if __name__ == "__main__":
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    article = sample_article()
+    _stylesheet("default")
+
+    inline = bench("inline <style>", render_inline, article, renders)
+    cached = bench("cached profile", _render, article, renders)
+    print(f"{'saving':<22} {inline - cached:8.1f} ms/render ({(1 - cached / inline) * 100:.0f}%)")
@@ -0,0 +1,320 @@
+"""
+Long-lived Chromium browser with a pool of pre-warmed contexts.
+The browser is launched once at startup so each fetch only pays for navigation.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Callable
+from playwright.async_api import async_playwright, BrowserContext, CDPSession, Page, Request
+from shared_service import SharedService
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+CONTEXT_MAX_PAGES = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "25"))
+MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+
+# Requests that never affect the extracted text are aborted before they hit the network
+BLOCK_RESOURCE_TYPES = set(
+    filter(None, os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font").split(","))
+)
+BLOCK_URL_PATTERNS = list(filter(None, os.getenv(
+    "BLOCK_URL_PATTERNS",
+    "/i/jot,/1.1/jot/,google-analytics.com,googletagmanager.com,doubleclick.net,"
+    "ads-twitter.com,ads-api.x.com,ads-api.twitter.com,analytics.twitter.com",
+).split(",")))
+
+
+# Playwright resource type names -> CDP Network.ResourceType, for Fetch interception patterns
+_CDP_RESOURCE_TYPES = {
+    "document": "Document", "stylesheet": "Stylesheet", "image": "Image", "media": "Media",
+    "font": "Font", "script": "Script", "texttrack": "TextTrack", "xhr": "XHR", "fetch": "Fetch",
+    "eventsource": "EventSource", "websocket": "WebSocket", "manifest": "Manifest", "other": "Other",
+}
+
+
+def _parents() -> dict[int, int]:
+    """Parent pid of every process (Linux only; empty elsewhere)."""
+    parents = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent pid; comm (field 2) may contain spaces
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def _rss_mb(pids: set[int]) -> float:
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+def _subtrees(roots: set[int], parents: dict[int, int]) -> set[int]:
+    """`roots` and everything below them."""
+    found = set(roots)
+    frontier = set(roots)
+    while frontier:
+        frontier = {pid for pid, ppid in parents.items() if ppid in frontier} - found
+        found |= frontier
+    return found
+
+
+def _is_playwright_driver(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"run-driver" in f.read()
+    except OSError:
+        return False
+
+
+def process_tree_rss_mb(pid: int | None = None) -> float:
+    """Total resident memory (MB) of every process spawned by `pid` (default: this one)."""
+    pid = pid or os.getpid()
+    return _rss_mb(_subtrees({pid}, _parents()) - {pid})
+
+
+def browser_rss_mb() -> float:
+    """
+    Resident memory (MB) of the Playwright driver and the Chromium processes under it.
+    PDF workers are children of the server too, but must not wear out browser contexts.
+    """
+    parents = _parents()
+    drivers = {pid for pid, ppid in parents.items() if ppid == os.getpid() and _is_playwright_driver(pid)}
+    return _rss_mb(_subtrees(drivers, parents))
+
+
+class BrowserPool:
+    """
+    One Chromium instance plus a bounded queue of browser contexts.
+
+    Contexts come pre-loaded with cookies and are recycled after
+    `max_pages` pages or when browser memory passes `max_rss_mb`.
+    """
+
+    def __init__(
+        self,
+        cookies: Callable[[], list[dict]],
+        size: int = POOL_SIZE,
+        max_pages: int = CONTEXT_MAX_PAGES,
+        max_rss_mb: int = MAX_RSS_MB,
+    ):
+        self._cookies = cookies
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.loop = None
+        self._playwright = None
+        self._browser = None
+        self._idle = None
+        self._page_counts = {}
+        self._traffic = {}
+
+    async def start(self) -> None:
+        """Launch the browser and warm up `size` contexts."""
+        self._cookies()  # Fail fast on missing cookies before launching anything
+        self.loop = asyncio.get_running_loop()
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            for _ in range(self.size):
+                self._idle.put_nowait(await self._new_context())
+        except Exception:
+            await self.close()
+            raise
+        print(f"✓ Browser pool started ({self.size} contexts)")
+
+    async def close(self) -> None:
+        """Close all contexts, the browser and the Playwright driver."""
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+        self._page_counts.clear()
+        print("Browser pool stopped")
+
+    async def _new_context(self) -> BrowserContext:
+        if not self._browser.is_connected():
+            print("Browser disconnected, relaunching...")
+            self._browser = await self._playwright.chromium.launch(headless=True)
+        context = await self._browser.new_context()
+        await context.add_cookies(self._cookies())
+        context.on("requestfinished", self._on_request_finished)
+        context.on("requestfailed", self._on_request_failed)
+        self._page_counts[context] = 0
+        return context
+
+    def _stats_for(self, request: Request) -> dict | None:
+        try:
+            return self._traffic.get(request.frame.page)
+        except Exception:
+            return None  # Service worker requests have no frame
+
+    async def _block_requests(self, page: Page) -> None:
+        """
+        Block media and telemetry for one page over CDP.
+
+        Playwright routing would turn off the HTTP cache, so every page would
+        re-download x.com's scripts. Here only the blocked resource types are
+        intercepted (and failed), and URL patterns are dropped by the network
+        stack, so everything else is served from cache as usual.
+        """
+        cdp = await page.context.new_cdp_session(page)
+        if BLOCK_URL_PATTERNS:
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setBlockedURLs", {"urls": [f"*{pattern}*" for pattern in BLOCK_URL_PATTERNS]})
+        patterns = [
+            {"urlPattern": "*", "resourceType": _CDP_RESOURCE_TYPES[kind], "requestStage": "Request"}
+            for kind in BLOCK_RESOURCE_TYPES
+            if kind in _CDP_RESOURCE_TYPES
+        ]
+        if patterns:
+            cdp.on("Fetch.requestPaused", lambda event: asyncio.ensure_future(self._fail(cdp, event)))
+            await cdp.send("Fetch.enable", {"patterns": patterns})
+
+    async def _fail(self, cdp: CDPSession, event: dict) -> None:
+        try:
+            await cdp.send("Fetch.failRequest", {"requestId": event["requestId"], "errorReason": "BlockedByClient"})
+        except Exception:
+            pass  # Page already closed
+
+    def _on_request_failed(self, request: Request) -> None:
+        stats = self._stats_for(request)
+        if stats is not None and "ERR_BLOCKED_BY_CLIENT" in (request.failure or ""):
+            stats["blocked_requests"] += 1
+            stats["blocked_by_type"][request.resource_type] += 1
+
+    def _on_request_finished(self, request: Request) -> None:
+        stats = self._stats_for(request)
+        if stats is not None:
+            stats["allowed_requests"] += 1
+            stats["_pending"].append(asyncio.ensure_future(self._count_bytes(request, stats)))
+
+    async def _count_bytes(self, request: Request, stats: dict) -> None:
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        stats["allowed_bytes"] += sizes["responseHeadersSize"] + sizes["responseBodySize"]
+
+    async def traffic(self, page: Page) -> dict:
+        """
+        Per-page request counts so far: allowed requests and bytes, blocked requests by type.
+        Blocked requests are aborted before any response, so they have no byte count.
+        """
+        stats = self._traffic.get(page)
+        if stats is None:
+            return {}
+        pending, stats["_pending"] = stats["_pending"], []
+        if pending:
+            await asyncio.wait(pending, timeout=1)
+        return {
+            "allowed_requests": stats["allowed_requests"],
+            "allowed_bytes": stats["allowed_bytes"],
+            "blocked_requests": stats["blocked_requests"],
+            "blocked_by_type": dict(stats["blocked_by_type"]),
+        }
+
+    def stats(self) -> dict:
+        """Snapshot for monitoring: browser connected, live contexts, pages open right now."""
+        return {
+            "browsers": int(bool(self._browser and self._browser.is_connected())),
+            "contexts": len(self._page_counts),
+            "pages": len(self._traffic),
+        }
+
+    async def _release(self, context: BrowserContext) -> None:
+        """Return a context to the pool, recycling it if it is worn out."""
+        self._page_counts[context] += 1
+        worn_out = self._page_counts[context] >= self.max_pages
+        if not worn_out and self.max_rss_mb:
+            worn_out = await asyncio.to_thread(browser_rss_mb) > self.max_rss_mb
+
+        if worn_out or not self._browser.is_connected():
+            self._page_counts.pop(context, None)
+            try:
+                await context.close()
+            except Exception:
+                pass  # Already gone with the browser
+            # Replaced lazily on the next acquire so a failed launch doesn't shrink the pool
+            context = None
+
+        self._idle.put_nowait(context)
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a context from the pool and open a fresh page in it."""
+        context = await self._idle.get()
+        try:
+            if context is None:
+                context = await self._new_context()
+        except Exception:
+            self._idle.put_nowait(None)
+            raise
+
+        page: Page | None = None
+        try:
+            page = await context.new_page()
+            self._traffic[page] = {
+                "allowed_requests": 0,
+                "allowed_bytes": 0,
+                "blocked_requests": 0,
+                "blocked_by_type": Counter(),
+                "_pending": [],
+            }
+            await self._block_requests(page)
+            yield page
+        finally:
+            if page is not None:
+                self._traffic.pop(page, None)
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            await self._release(context)
+
+    def run(self, coro):
+        """Run a coroutine on the pool's event loop from a worker thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_pool = SharedService("browser-pool", BrowserPool)
+
+
+async def start_pool(cookies: Callable[[], list[dict]]) -> BrowserPool:
+    """Start the shared pool on the current event loop (app startup)."""
+    return await _pool.start(cookies)
+
+
+async def stop_pool() -> None:
+    """Shut down the shared pool if it is running (app shutdown)."""
+    await _pool.stop()
+
+
+def pool_stats() -> dict:
+    """Stats of the shared pool (all zero when it isn't running)."""
+    pool = _pool.current
+    if pool is None:
+        return {"browsers": 0, "contexts": 0, "pages": 0}
+    return pool.stats()
+
+
+def get_pool(cookies: Callable[[], list[dict]]) -> BrowserPool:
+    """Return the shared pool, started lazily outside the server (see SharedService)."""
+    return _pool.get(cookies)
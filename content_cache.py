@@ -0,0 +1,135 @@
+"""
+Two-level cache for fetched pages and extracted articles.
+A small in-memory LRU sits in front of a compressed on-disk store.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+CACHE_TTL = int(os.getenv("CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "200"))
+
+
+class TieredCache:
+    """
+    JSON-serializable values keyed by string, with TTL and size-based eviction.
+
+    Memory holds the `memory_items` most recently used entries; disk holds
+    gzip-compressed entries under `<directory>/<name>/`, least recently used
+    evicted first once the directory grows past `max_mb`. Reads bump a file's
+    mtime, which is what eviction orders by; the TTL counts from the write.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        memory_items: int = 32,
+        directory: str = CACHE_DIR,
+        ttl: int = CACHE_TTL,
+        max_mb: int = CACHE_MAX_MB,
+    ):
+        self.path = os.path.join(directory, name)
+        self.memory_items = memory_items
+        self.ttl = ttl
+        self.max_bytes = max_mb * 1024 * 1024
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.path))
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode()).hexdigest() + ".json.gz")
+
+    def get(self, key: str) -> dict | None:
+        """Return the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._touch(self._file(key))
+                    return value
+                del self._memory[key]
+
+        path = self._file(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record["key"] != key:
+            return None
+        if now - record["stored_at"] >= self.ttl:
+            self._remove(path)
+            return None
+
+        self._touch(path)
+        self._remember(key, record["stored_at"], record["value"])
+        return record["value"]
+
+    def put(self, key: str, value: dict) -> None:
+        """Store a value in memory and on disk."""
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+
+        path = self._file(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump({"key": key, "stored_at": stored_at, "value": value}, f)
+        size = os.path.getsize(tmp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._disk_bytes += size - old_size
+            over_limit = self._disk_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        """Drop a key from both levels."""
+        with self._lock:
+            self._memory.pop(key, None)
+        self._remove(self._file(key))
+
+    def _remember(self, key: str, stored_at: float, value: dict) -> None:
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Evicted meanwhile
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _evict(self) -> None:
+        """Delete the least recently used files until the store is back under 90% of its limit."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.path) if entry.name.endswith(".json.gz")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            with self._lock:
+                if self._disk_bytes <= self.max_bytes * 0.9:
+                    return
+            self._remove(entry.path)
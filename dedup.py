@@ -0,0 +1,141 @@
+"""
+Dedup store for articles already sent to Dropbox.
+SQLite in WAL mode gives indexed lookups that are safe across threads
+and across multiple uvicorn workers.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+SENT_DB = os.getenv("SENT_DB", "sent_articles.db")
+LEGACY_LOG = "sent_articles.txt"
+
+# A pending reservation older than this is assumed to belong to a dead worker
+RESERVATION_TTL = int(os.getenv("DEDUP_RESERVATION_TTL", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sent (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    reserved_at REAL,
+    sent_at REAL
+)
+"""
+
+# Insert a pending row, or take over a stale one; rowcount is 1 only if we got it
+_RESERVE = (
+    "INSERT INTO sent (url, status, reserved_at) VALUES (?, 'pending', ?)"
+    " ON CONFLICT(url) DO UPDATE SET reserved_at = excluded.reserved_at"
+    " WHERE sent.status = 'pending' AND sent.reserved_at < ?"
+)
+
+
+class DedupStore:
+    """
+    Set of normalized URLs with an atomic check-and-mark reservation.
+
+    `reserve()` claims a URL before processing, `mark_sent()` commits it
+    and `release()` gives it back if processing failed.
+    """
+
+    def __init__(self, path: str = SENT_DB, legacy_log: str = LEGACY_LOG):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._lock = threading.Lock()
+        self._migrate(legacy_log)
+
+    def _migrate(self, legacy_log: str) -> None:
+        """Create the schema and import the old text log once."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                (version,) = self._db.execute("PRAGMA user_version").fetchone()
+                if version == 0:
+                    self._db.execute(_SCHEMA)
+                    imported = 0
+                    if os.path.exists(legacy_log):
+                        now = time.time()
+                        with open(legacy_log, "r") as f:
+                            urls = {line.strip() for line in f if line.strip()}
+                        self._db.executemany(
+                            "INSERT OR IGNORE INTO sent (url, status, sent_at) VALUES (?, 'sent', ?)",
+                            ((url, now) for url in urls),
+                        )
+                        imported = len(urls)
+                    self._db.execute("PRAGMA user_version = 1")
+                    if imported:
+                        print(f"Imported {imported} URL(s) from {legacy_log}")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def was_sent(self, url: str) -> bool:
+        """Check if URL was already sent."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM sent WHERE url = ? AND status = 'sent'", (url,)
+            ).fetchone()
+        return row is not None
+
+    def reserve(self, url: str) -> bool:
+        """
+        Atomically claim a URL for processing.
+        Returns False if it was already sent or another request holds it.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(_RESERVE, (url, now, now - RESERVATION_TTL))
+        return cursor.rowcount == 1
+
+    def reserve_many(self, urls: list[str]) -> set[str]:
+        """Claim several URLs in one transaction; returns the ones that were claimed."""
+        now = time.time()
+        reserved = set()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for url in urls:
+                    cursor = self._db.execute(_RESERVE, (url, now, now - RESERVATION_TTL))
+                    if cursor.rowcount == 1:
+                        reserved.add(url)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return reserved
+
+    def mark_sent(self, url: str) -> None:
+        """Record URL as sent (whether or not it was reserved first)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sent (url, status, sent_at) VALUES (?, 'sent', ?)"
+                " ON CONFLICT(url) DO UPDATE SET status = 'sent', sent_at = excluded.sent_at",
+                (url, time.time()),
+            )
+
+    def release(self, url: str) -> None:
+        """Drop a pending reservation so the URL can be retried."""
+        with self._lock:
+            self._db.execute("DELETE FROM sent WHERE url = ? AND status = 'pending'", (url,))
+
+    def export(self) -> list[str]:
+        """Return every sent URL, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url FROM sent WHERE status = 'sent' ORDER BY sent_at, url"
+            ).fetchall()
+        return [url for (url,) in rows]
+
+
+if __name__ == "__main__":
+    # Bulk export: python dedup.py export > sent_urls.txt
+    if sys.argv[1:] != ["export"]:
+        print("Usage: python dedup.py export", file=sys.stderr)
+        sys.exit(1)
+    for url in DedupStore().export():
+        print(url)
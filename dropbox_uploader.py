@@ -4,222 +4,498 @@ Uploads articles as PDF files to your Dropbox.
 Supports refresh tokens for long-lived access.
 """
 
-import os
 import io
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable
 import requests
-from weasyprint import HTML
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from pdf_renderer import render_pdf
 
 load_dotenv()
 
-# Cache for refreshed access token
-_cached_access_token = None
+DROPBOX_API_URL = os.getenv("DROPBOX_API_URL", "https://api.dropboxapi.com")
+DROPBOX_CONTENT_URL = os.getenv("DROPBOX_CONTENT_URL", "https://content.dropboxapi.com")
+
+# Refresh this many seconds before the access token expires
+TOKEN_REFRESH_MARGIN = 300
+# Attempts for transient failures (connection errors, 429, 5xx); at least one is always made
+DROPBOX_RETRIES = int(os.getenv("DROPBOX_RETRIES", "3"))
+
+# Files above this size go through upload sessions in CHUNK_SIZE pieces
+SESSION_THRESHOLD = int(os.getenv("DROPBOX_SESSION_THRESHOLD_MB", "8")) * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024  # Well under Dropbox's 150 MB per request; one chunk is held in memory at a time
+# Uploads allowed in flight at once across all jobs
+UPLOAD_CONCURRENCY = int(os.getenv("DROPBOX_UPLOAD_CONCURRENCY", "4"))
+
 
+class DropboxError(Exception):
+    """Raised when a Dropbox API call fails; carries the HTTP status if there was one."""
 
-def refresh_access_token() -> str:
+    def __init__(
+        self,
+        message: str,
+        status_code: int | None = None,
+        correct_offset: int | None = None,
+        retry_after: float | None = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        # Set on upload session "incorrect_offset" errors
+        self.correct_offset = correct_offset
+        # Seconds Dropbox asked us to wait (Retry-After on 429/503)
+        self.retry_after = retry_after
+
+
+class DropboxClient:
     """
-    Refresh the Dropbox access token using refresh token.
-    Returns a new access token.
+    Dropbox API client with a pooled keep-alive session.
+
+    With a refresh token configured, the access token is refreshed shortly
+    before it expires. Only one thread refreshes at a time; the others
+    wait and reuse the new token.
     """
-    app_key = os.getenv("DROPBOX_APP_KEY")
-    app_secret = os.getenv("DROPBOX_APP_SECRET")
-    refresh_token = os.getenv("DROPBOX_REFRESH_TOKEN")
 
-    if not all([app_key, app_secret, refresh_token]):
-        raise ValueError(
-            "Missing refresh token config. Need: DROPBOX_APP_KEY, DROPBOX_APP_SECRET, DROPBOX_REFRESH_TOKEN"
+    def __init__(
+        self,
+        app_key: str | None = None,
+        app_secret: str | None = None,
+        refresh_token: str | None = None,
+        access_token: str | None = None,
+        api_url: str = DROPBOX_API_URL,
+        content_url: str = DROPBOX_CONTENT_URL,
+        retries: int = DROPBOX_RETRIES,
+        backoff: float = 1.0,
+        session_threshold: int = SESSION_THRESHOLD,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        if not refresh_token and not access_token:
+            raise ValueError("Missing DROPBOX_ACCESS_TOKEN or DROPBOX_REFRESH_TOKEN in .env")
+        if refresh_token and not (app_key and app_secret):
+            raise ValueError(
+                "Missing refresh token config. Need: DROPBOX_APP_KEY, DROPBOX_APP_SECRET, DROPBOX_REFRESH_TOKEN"
+            )
+
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.refresh_token = refresh_token
+        self.api_url = api_url.rstrip("/")
+        self.content_url = content_url.rstrip("/")
+        self.retries = max(retries, 1)
+        self.backoff = backoff
+        self.session_threshold = session_threshold
+        self.chunk_size = chunk_size
+
+        # A static access token has no known expiry
+        self._access_token = None if refresh_token else access_token
+        self._expires_at = None
+        self._token_lock = threading.Lock()
+        # No request goes out before this (monotonic) time: a Retry-After seen
+        # by one thread holds every thread sharing the client, not just its own retry
+        self._hold_until = 0.0
+        self._hold_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls) -> "DropboxClient":
+        """Build a client from the DROPBOX_* environment variables."""
+        return cls(
+            app_key=os.getenv("DROPBOX_APP_KEY"),
+            app_secret=os.getenv("DROPBOX_APP_SECRET"),
+            refresh_token=os.getenv("DROPBOX_REFRESH_TOKEN"),
+            access_token=os.getenv("DROPBOX_ACCESS_TOKEN"),
         )
 
-    response = requests.post(
-        "https://api.dropboxapi.com/oauth2/token",
-        data={
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token,
-        },
-        auth=(app_key, app_secret),
-        timeout=30,
-    )
-
-    if response.status_code == 200:
-        data = response.json()
-        return data["access_token"]
-    else:
-        raise Exception(f"Failed to refresh token: {response.status_code} - {response.text}")
-
-
-def get_dropbox_config() -> dict:
-    """Load Dropbox configuration from environment variables."""
-    global _cached_access_token
-
-    # Try refresh token first (preferred for long-lived access)
-    refresh_token = os.getenv("DROPBOX_REFRESH_TOKEN")
-    if refresh_token and not _cached_access_token:
-        try:
-            _cached_access_token = refresh_access_token()
+    def _token_is_fresh(self) -> bool:
+        if self._access_token is None:
+            return False
+        return self._expires_at is None or time.time() < self._expires_at - TOKEN_REFRESH_MARGIN
+
+    def access_token(self) -> str:
+        """Return a valid access token, refreshing it first if it is about to expire."""
+        token = self._access_token
+        if self._token_is_fresh():
+            return token
+        return self._refresh(token)
+
+    def _refresh(self, stale_token: str | None) -> str:
+        """Refresh the token unless another thread already replaced `stale_token`."""
+        if not self.refresh_token:
+            raise DropboxError(
+                "Dropbox token expired. Configure refresh token for auto-renewal.", 401
+            )
+        with self._token_lock:
+            if self._access_token != stale_token and self._token_is_fresh():
+                return self._access_token
+
+            response = self._send(
+                "POST",
+                f"{self.api_url}/oauth2/token",
+                data={"grant_type": "refresh_token", "refresh_token": self.refresh_token},
+                auth=(self.app_key, self.app_secret),
+            )
+            if response.status_code != 200:
+                raise DropboxError(
+                    f"Failed to refresh token: {response.status_code} - {response.text[:200]}",
+                    response.status_code,
+                )
+
+            data = response.json()
+            self._access_token = data["access_token"]
+            expires_in = data.get("expires_in")
+            self._expires_at = time.time() + expires_in if expires_in else None
             print("✓ Refreshed Dropbox access token")
-        except Exception as e:
-            print(f"Token refresh failed: {e}")
-            # Fall back to static access token
-            _cached_access_token = None
+            return self._access_token
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying connection errors, 429 and 5xx with backoff."""
+        kwargs.setdefault("timeout", 30)
+        for attempt in range(self.retries):
+            last_attempt = attempt == self.retries - 1
+            hold = self._hold_until - time.monotonic()
+            if hold > 0:
+                # Never sooner than asked; jitter only spreads waiting threads out after it
+                time.sleep(hold + random.random() * self.backoff)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if last_attempt:
+                    raise DropboxError(f"Dropbox upload failed: {e}")
+                delay = self.backoff * 2 ** attempt
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                retry_after = _retry_after(response)
+                if retry_after is not None:
+                    with self._hold_lock:
+                        self._hold_until = max(self._hold_until, time.monotonic() + retry_after)
+                if last_attempt:
+                    return response
+                if retry_after is not None:
+                    continue  # The hold at the top of the loop waits it out
+                delay = self.backoff * 2 ** attempt
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+    def call(self, method: str, url: str, headers: dict | None = None, **kwargs) -> requests.Response:
+        """Make an authenticated call; on 401 refresh the token and retry once."""
+        headers = dict(headers or {})
+        token = self.access_token()
+        headers["Authorization"] = f"Bearer {token}"
+        response = self._send(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 401 and self.refresh_token:
+            print("Access token expired, refreshing...")
+            headers["Authorization"] = f"Bearer {self._refresh(token)}"
+            response = self._send(method, url, headers=headers, **kwargs)
+        return response
+
+    def _content_call(self, endpoint: str, arg: dict, data: bytes = b"") -> requests.Response:
+        """Call a content endpoint; raise DropboxError unless it returns 200."""
+        response = self.call(
+            "POST",
+            f"{self.content_url}/2/files/{endpoint}",
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Dropbox-API-Arg": json.dumps(arg),
+            },
+            data=data,
+        )
+        if response.status_code != 200:
+            raise DropboxError(
+                f"Dropbox API error: {response.status_code} - {_error_summary(response)}",
+                response.status_code,
+                _correct_offset(response),
+                _retry_after(response),
+            )
+        return response
+
+    def upload(
+        self,
+        path: str,
+        data: bytes | io.BufferedIOBase,
+        size: int | None = None,
+        session: dict | None = None,
+        on_session: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """
+        Upload a file (mode "add" with autorename) and return its metadata.
+        `data` may be bytes or a binary file; large files are streamed through
+        an upload session, resumed from `session` if given (see upload_session).
+        """
+        if not isinstance(data, bytes):
+            if size is None:
+                size = os.fstat(data.fileno()).st_size
+            if size <= self.session_threshold:
+                data = data.read()  # Small enough for a single request
+        if isinstance(data, bytes):
+            size = len(data)
+            if size <= self.session_threshold:
+                return self._content_call("upload", _commit_info(path), data).json()
+            data = io.BytesIO(data)
+
+        session = self.upload_session(data, size, session=session, on_session=on_session)
+        return self._content_call(
+            "upload_session/finish", {"cursor": _cursor(session), "commit": _commit_info(path)}
+        ).json()
+
+    def upload_session(
+        self,
+        fileobj: io.BufferedIOBase,
+        size: int,
+        close: bool = False,
+        session: dict | None = None,
+        on_session: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """
+        Stream a file into an upload session chunk by chunk.
+
+        Returns the session as {"session_id", "offset", "closed"}, ready for
+        upload_session/finish (or, with close=True, for finish_batch()).
+        `on_session` gets the session after every stored chunk; pass the last
+        one back in as `session` to resume an interrupted upload from there.
+        """
+        session = dict(session or {})
+        resumes = 0
+
+        while True:
+            offset = session.get("offset", 0)
+            if "session_id" in session and offset >= size and (session.get("closed") or not close):
+                return session  # Resumed with every byte already stored
+            fileobj.seek(offset)
+            chunk = fileobj.read(self.chunk_size)
+            last = offset + len(chunk) >= size
+            try:
+                if "session_id" not in session:
+                    response = self._content_call("upload_session/start", {"close": close and last}, chunk)
+                    session = {"session_id": response.json()["session_id"], "offset": 0}
+                else:
+                    self._content_call(
+                        "upload_session/append_v2",
+                        {"cursor": _cursor(session), "close": close and last},
+                        chunk,
+                    )
+            except DropboxError as e:
+                # Dropbox tells us where it actually is; otherwise retry the same chunk,
+                # unless the session itself was rejected (e.g. it expired)
+                rejected = e.correct_offset is None and e.status_code in range(400, 500) and e.status_code != 429
+                if resumes >= self.retries or "session_id" not in session or rejected:
+                    raise
+                resumes += 1
+                if e.correct_offset is not None:
+                    print(f"Resuming upload session at offset {e.correct_offset}")
+                    session["offset"] = e.correct_offset
+                continue
+
+            session["offset"] = offset + len(chunk)
+            session["closed"] = close and last
+            if on_session is not None:
+                on_session(dict(session))
+            if last:
+                return session
+
+    def finish_batch(self, entries: list[tuple[dict, str]]) -> list[dict]:
+        """
+        Commit closed upload sessions as files in one call.
+        Takes (session, path) pairs; returns per-entry metadata or {"error": summary}.
+        """
+        response = self.call(
+            "POST",
+            f"{self.api_url}/2/files/upload_session/finish_batch_v2",
+            json={
+                "entries": [
+                    {"cursor": _cursor(session), "commit": _commit_info(path)}
+                    for session, path in entries
+                ]
+            },
+        )
+        if response.status_code != 200:
+            raise DropboxError(
+                f"Dropbox API error: {response.status_code} - {_error_summary(response)}",
+                response.status_code,
+                retry_after=_retry_after(response),
+            )
+
+        results = []
+        for entry in response.json()["entries"]:
+            if entry.get(".tag") == "success":
+                results.append(entry)
+            else:
+                results.append({"error": json.dumps(entry.get("failure", entry))})
+        return results
+
+
+def _commit_info(path: str) -> dict:
+    return {"path": path, "mode": "add", "autorename": True}
+
+
+def _cursor(session: dict) -> dict:
+    return {"session_id": session["session_id"], "offset": session["offset"]}
+
+
+def _correct_offset(response: requests.Response) -> int | None:
+    """Return the server's offset from an upload session "incorrect_offset" error."""
+    if response.status_code != 409:
+        return None
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return None
+    # append_v2 puts it at the top level, finish nests it under lookup_failed
+    error = error.get("lookup_failed", error)
+    if error.get(".tag") == "incorrect_offset":
+        return error.get("correct_offset")
+    return None
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    """Seconds from a Retry-After header, if it has one in that form."""
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+def _error_summary(response: requests.Response) -> str:
+    """Try to parse error as JSON, fallback to text."""
+    try:
+        error_data = response.json()
+        return error_data.get("error_summary", str(error_data))
+    except ValueError:
+        return response.text[:200]  # First 200 chars of response
 
-    access_token = _cached_access_token or os.getenv("DROPBOX_ACCESS_TOKEN")
 
-    config = {
-        "access_token": access_token,
-        "upload_path": os.getenv("DROPBOX_UPLOAD_PATH", "/reMarkable"),
-    }
+_client: DropboxClient | None = None
+_client_lock = threading.Lock()
 
-    if not config["access_token"]:
-        raise ValueError("Missing DROPBOX_ACCESS_TOKEN or DROPBOX_REFRESH_TOKEN in .env")
 
-    return config
+def get_client() -> DropboxClient:
+    """Return the shared Dropbox client, created from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DropboxClient.from_env()
+    return _client
 
 
-def upload_to_dropbox(title: str, html_content: str) -> bool:
+def upload_pdf(title: str, pdf_data: bytes) -> str:
     """
-    Upload an article to Dropbox as a PDF file (reMarkable compatible).
+    Upload rendered PDF bytes to Dropbox.
 
     Args:
         title: Article title (used for filename)
-        html_content: The formatted HTML content
+        pdf_data: The rendered PDF
 
     Returns:
-        True if uploaded successfully
+        The Dropbox path of the uploaded file
     """
+    return upload_file(title, pdf_data, ".pdf")
+
+
+def _configured_client() -> DropboxClient:
     try:
-        config = get_dropbox_config()
+        return get_client()
     except ValueError as e:
         print(f"Dropbox config error: {e}")
         raise Exception(f"Dropbox not configured: {e}")
 
-    # Convert HTML to PDF
-    try:
-        print(f"Converting '{title}' to PDF...")
-
-        # Add basic CSS for better reading on reMarkable
-        styled_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                @page {{
-                    size: A4;
-                    margin: 2cm;
-                }}
-                body {{
-                    font-family: 'Helvetica', 'Arial', sans-serif;
-                    font-size: 12pt;
-                    line-height: 1.6;
-                    color: #000;
-                    max-width: 800px;
-                    margin: 0 auto;
-                }}
-                h1 {{
-                    font-size: 20pt;
-                    margin-bottom: 0.5em;
-                    line-height: 1.2;
-                }}
-                h2 {{
-                    font-size: 16pt;
-                    margin-top: 1em;
-                    margin-bottom: 0.5em;
-                }}
-                p {{
-                    margin-bottom: 1em;
-                    text-align: justify;
-                }}
-                a {{
-                    color: #000;
-                    text-decoration: underline;
-                }}
-                img {{
-                    max-width: 100%;
-                    height: auto;
-                }}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
 
-        # Generate PDF in memory
-        pdf_buffer = io.BytesIO()
-        HTML(string=styled_html).write_pdf(pdf_buffer)
-        pdf_data = pdf_buffer.getvalue()
+def _dropbox_path(title: str, extension: str) -> str:
+    """Where an article goes: `<DROPBOX_UPLOAD_PATH>/<sanitized title><extension>`."""
+    upload_path = os.getenv("DROPBOX_UPLOAD_PATH", "/reMarkable")
+    filename = _sanitize_filename(title) + extension
+    return f"{upload_path}/{filename}".replace("//", "/")
 
-        print(f"PDF generated ({len(pdf_data)} bytes)")
 
-    except Exception as e:
-        print(f"Failed to convert HTML to PDF: {e}")
-        raise Exception(f"PDF conversion failed: {e}")
+def upload_file(
+    title: str,
+    data: bytes | io.BufferedIOBase,
+    extension: str,
+    session: dict | None = None,
+    on_session: Callable[[dict], None] | None = None,
+) -> str:
+    """
+    Upload a rendered article (PDF or EPUB) to Dropbox as `<title><extension>`.
+    `data` may be an open file, which large uploads stream from instead of holding it in memory.
+    `session`/`on_session` resume and record a large upload's session (see DropboxClient.upload_session).
 
-    # Sanitize filename and use .pdf extension
-    filename = _sanitize_filename(title) + ".pdf"
-    dropbox_path = f"{config['upload_path']}/{filename}".replace("//", "/")
+    Returns:
+        The Dropbox path of the uploaded file
+    """
+    client = _configured_client()
+    try:
+        result = client.upload(_dropbox_path(title, extension), data, session=session, on_session=on_session)
+    except DropboxError as e:
+        print(f"Failed to upload to Dropbox: {e}")
+        raise
 
-    # Dropbox API endpoint
-    url = "https://content.dropboxapi.com/2/files/upload"
+    print(f"✓ Uploaded to Dropbox: {result['path_display']}")
+    return result["path_display"]
 
-    headers = {
-        "Authorization": f"Bearer {config['access_token']}",
-        "Content-Type": "application/octet-stream",
-        "Dropbox-API-Arg": f'{{"path": "{dropbox_path}", "mode": "add", "autorename": true}}',
-    }
 
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            data=pdf_data,
-            timeout=30,
-        )
+def upload_files(
+    files: list[tuple[str, io.BufferedIOBase, str, dict | None]],
+    on_session: Callable[[int, dict], None] | None = None,
+) -> list[str | Exception]:
+    """
+    Upload several articles and commit them with a single finish_batch call,
+    so a backlog of files doesn't contend for Dropbox's per-namespace write lock.
 
-        if response.status_code == 200:
-            result = response.json()
-            print(f"✓ Uploaded to Dropbox: {result['path_display']}")
-            return True
-        elif response.status_code == 401:
-            # Token expired - try to refresh and retry once
-            global _cached_access_token
-            refresh_token = os.getenv("DROPBOX_REFRESH_TOKEN")
-            if refresh_token:
-                print("Access token expired, refreshing...")
-                _cached_access_token = refresh_access_token()
-                headers["Authorization"] = f"Bearer {_cached_access_token}"
-                retry_response = requests.post(url, headers=headers, data=pdf_data, timeout=30)
-                if retry_response.status_code == 200:
-                    result = retry_response.json()
-                    print(f"✓ Uploaded to Dropbox: {result['path_display']}")
-                    return True
-                else:
-                    error_msg = retry_response.text[:200]
-                    print(f"Dropbox API error after refresh {retry_response.status_code}: {error_msg}")
-                    raise Exception(f"Dropbox API error: {retry_response.status_code} - {error_msg}")
+    `files` holds (title, file, extension, session) tuples; each file goes
+    through a closed upload session, resumed from `session` if given.
+    `on_session(index, session)` records progress. Returns, per file, its
+    Dropbox path or the error that stopped it.
+    """
+    client = _configured_client()
+    results: list[str | Exception | None] = [None] * len(files)
+    committable = []
+    for index, (title, fileobj, extension, session) in enumerate(files):
+        try:
+            session = client.upload_session(
+                fileobj,
+                os.fstat(fileobj.fileno()).st_size,
+                close=True,
+                session=session,
+                on_session=(lambda progress, index=index: on_session(index, progress)) if on_session else None,
+            )
+        except DropboxError as e:
+            results[index] = e
+            continue
+        committable.append((index, session, _dropbox_path(title, extension)))
+
+    if committable:
+        try:
+            committed = client.finish_batch([(session, path) for _, session, path in committable])
+        except DropboxError as e:
+            committed = [e] * len(committable)
+        for (index, _, _), result in zip(committable, committed):
+            if isinstance(result, Exception):
+                results[index] = result
+            elif "error" in result:
+                results[index] = DropboxError(f"Dropbox batch commit failed: {result['error']}", 409)
             else:
-                print("Dropbox API error 401: Token expired. Add DROPBOX_REFRESH_TOKEN for auto-refresh.")
-                raise Exception("Dropbox token expired. Configure refresh token for auto-renewal.")
-        else:
-            # Try to parse error as JSON, fallback to text
-            try:
-                error_data = response.json()
-                error_msg = error_data.get("error_summary", str(error_data))
-            except:
-                error_msg = response.text[:200]  # First 200 chars of response
+                print(f"✓ Uploaded to Dropbox: {result['path_display']}")
+                results[index] = result["path_display"]
+    return results
 
-            print(f"Dropbox API error {response.status_code}: {error_msg}")
-            raise Exception(f"Dropbox API error: {response.status_code} - {error_msg}")
 
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to upload to Dropbox: {e}")
-        raise Exception(f"Dropbox upload failed: {e}")
-    except Exception as e:
-        if "Dropbox API error" in str(e):
-            raise
-        print(f"Unexpected error: {e}")
-        raise Exception(f"Dropbox upload failed: {e}")
+def upload_to_dropbox(title: str, html_content: str) -> str:
+    """
+    Upload an article to Dropbox as a PDF file (reMarkable compatible).
+
+    Args:
+        title: Article title (used for filename)
+        html_content: The formatted HTML content
+
+    Returns:
+        The Dropbox path of the uploaded file
+    """
+    return upload_pdf(title, render_pdf(html_content))
 
 
 def _sanitize_filename(title: str) -> str:
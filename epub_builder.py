@@ -0,0 +1,130 @@
+"""
+EPUB output for articles.
+The reMarkable reads EPUB natively, so the clean article HTML only needs
+converting to XHTML and zipping with a package document, with no page layout.
+"""
+
+import base64
+import html
+import io
+import time
+import uuid
+import zipfile
+
+from lxml import etree
+from lxml.html import document_fromstring
+
+_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+
+_STYLE = """body { font-family: serif; line-height: 1.45; }
+h1 { font-size: 1.5em; margin: 0 0 0.5em; }
+p { margin: 0 0 0.8em; text-align: justify; }
+figure { margin: 0.8em 0; text-align: center; }
+img { max-width: 100%; height: auto; }
+"""
+
+_PAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="en">
+<head>
+  <meta charset="UTF-8"/>
+  <title>{title}</title>
+  <link rel="stylesheet" type="text/css" href="style.css"/>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+_NAV = """<nav epub:type="toc" id="toc"><ol><li><a href="article.xhtml">{title}</a></li></ol></nav>"""
+
+_PACKAGE = """<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid" xml:lang="en">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="uid">{identifier}</dc:identifier>
+    <dc:title>{title}</dc:title>
+    <dc:language>en</dc:language>
+    <dc:source>{url}</dc:source>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="style" href="style.css" media-type="text/css"/>
+    <item id="article" href="article.xhtml" media-type="application/xhtml+xml"/>
+{images}
+  </manifest>
+  <spine>
+    <itemref idref="article"/>
+  </spine>
+</package>
+"""
+
+_DATA_URI_PREFIX = "data:image/png;base64,"
+
+
+def _article_body(html_content: str) -> tuple[str, list[bytes]]:
+    """
+    Article body as XHTML, plus the inlined PNGs it referenced (now images/<n>.png).
+    Remote images are dropped; the media stage inlines the ones we keep.
+    """
+    doc = document_fromstring(html_content)
+    images = []
+    for img in list(doc.iter("img")):
+        src = img.get("src", "")
+        if src.startswith(_DATA_URI_PREFIX):
+            img.set("src", f"images/{len(images)}.png")
+            images.append(base64.b64decode(src[len(_DATA_URI_PREFIX):]))
+            img.set("alt", img.get("alt", ""))
+        else:
+            parent = img.getparent()
+            (parent if parent.tag == "figure" else img).drop_tree()
+
+    body = doc.find("body")
+    if body is None:
+        body = doc
+    parts = [html.escape(body.text or "", quote=False)] if body.text and body.text.strip() else []
+    parts += [etree.tostring(child, method="xml", encoding="unicode") for child in body]
+    return "\n".join(parts), images
+
+
+def build_epub(title: str, html_content: str, url: str = "") -> bytes:
+    """
+    Build an EPUB 3 file from article HTML (the output of extractor._format_html,
+    optionally with images inlined by media.embed_images).
+    """
+    body, images = _article_body(html_content)
+    escaped_title = html.escape(title)
+    identifier = f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, url or title)}"
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as epub:
+        # The mimetype entry must come first and be stored uncompressed
+        epub.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml", _CONTAINER)
+        epub.writestr(
+            "OEBPS/content.opf",
+            _PACKAGE.format(
+                identifier=identifier,
+                title=escaped_title,
+                url=html.escape(url),
+                modified=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                images="\n".join(
+                    f'    <item id="img{n}" href="images/{n}.png" media-type="image/png"/>'
+                    for n in range(len(images))
+                ),
+            ),
+        )
+        epub.writestr("OEBPS/style.css", _STYLE)
+        epub.writestr("OEBPS/nav.xhtml", _PAGE.format(title=escaped_title, body=_NAV.format(title=escaped_title)))
+        epub.writestr("OEBPS/article.xhtml", _PAGE.format(title=escaped_title, body=body))
+        for n, png in enumerate(images):
+            # Already compressed
+            epub.writestr(f"OEBPS/images/{n}.png", png, compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
@@ -3,21 +3,87 @@ Article extractor for Twitter/X threads.
 Extracts clean, formatted HTML preserving headers, paragraphs, and structure.
 """
 
+import asyncio
+import html
 import os
 import re
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+from lxml.html import HtmlElement, fragment_fromstring
 from readability import Document
+from readability.htmls import build_doc, get_title
 from dotenv import load_dotenv
+from playwright.async_api import Error as PlaywrightError
+from browser_pool import get_pool, start_pool, stop_pool
+from content_cache import TieredCache
+from http_sources import HTTP_SOURCES, get_tier, start_tier, stop_tier
+from tweet_graphql import is_thread_response, parse_thread, status_id
 
 load_dotenv()
 
+# Page readiness tuning: content must stay unchanged for READY_QUIET_MS,
+# and we never wait longer than READY_TIMEOUT_MS after DOMContentLoaded.
+READY_QUIET_MS = int(os.getenv("READY_QUIET_MS", "1000"))
+READY_TIMEOUT_MS = int(os.getenv("READY_TIMEOUT_MS", "20000"))
+READY_POLL_MS = 200
+
+# "graphql" builds articles from the TweetDetail JSON the page loads, falling
+# back to the rendered DOM if it never arrives; "dom" always uses the DOM.
+FETCH_MODE = os.getenv("FETCH_MODE", "graphql")
+
+# Origin the browser loads status pages from; point it at a stand-in server for load tests
+X_BASE_URL = os.getenv("X_BASE_URL", "https://x.com").rstrip("/")
+
+CONTENT_SELECTOR = '[data-testid="tweetText"], .longform-unstyled'
+
+# Snapshot of the content nodes: [node count, total text length, on login page]
+_CONTENT_SNAPSHOT_JS = """(selector) => {
+    const nodes = document.querySelectorAll(selector);
+    let length = 0;
+    for (const node of nodes) length += node.textContent.length;
+    return [nodes.length, length, location.pathname.includes("/login")];
+}"""
+
+# Readiness conditions whose pages are complete enough to cache
+_CACHEABLE_READINESS = ("stable", "graphql")
+
+# How often each condition ended the readiness wait (for tuning)
+readiness_stats = Counter()
+# Which tier served each page: "cache", an HTTP source name, or "browser"
+tier_stats = Counter()
+
+# Bump when parse_article output changes so cached articles are re-extracted
+# from the cached raw pages instead of being served stale.
+ARTICLE_FORMAT_VERSION = 5
+
+page_cache = TieredCache("pages", memory_items=8)
+article_cache = TieredCache("articles", memory_items=64)
+
 
 class AuthExpiredError(Exception):
     """Raised when Twitter authentication cookies have expired."""
     pass
 
 
+def normalize_url(url: str) -> str:
+    """Normalize Twitter URL to canonical form for dedup."""
+    url = re.sub(r"https?://(www\.)?twitter\.com", "https://x.com", url)
+    url = url.split("?")[0].rstrip("/")
+    return url
+
+
+def _navigation_url(url: str) -> str:
+    """The URL the browser actually loads: the status page on X_BASE_URL."""
+    return re.sub(r"^https?://(www\.)?(x|twitter)\.com", X_BASE_URL, url)
+
+
+def _cookie_domain() -> str:
+    host = urlsplit(X_BASE_URL).hostname or "x.com"
+    # Cookies for IP addresses and single-label hosts can't be set on a parent domain
+    return host if "." not in host or host.replace(".", "").isdigit() else f".{host}"
+
+
 def get_twitter_cookies() -> list[dict]:
     """Load Twitter cookies from environment variables."""
     auth_token = os.getenv("TWITTER_AUTH_TOKEN")
@@ -32,17 +98,17 @@ def get_twitter_cookies() -> list[dict]:
         {
             "name": "auth_token",
             "value": auth_token,
-            "domain": ".x.com",
+            "domain": _cookie_domain(),
             "path": "/",
-            "secure": True,
+            "secure": X_BASE_URL.startswith("https://"),
             "httpOnly": True,
         },
         {
             "name": "ct0",
             "value": ct0,
-            "domain": ".x.com",
+            "domain": _cookie_domain(),
             "path": "/",
-            "secure": True,
+            "secure": X_BASE_URL.startswith("https://"),
             "httpOnly": False,
         },
     ]
@@ -63,45 +129,187 @@ def _check_auth_failure(html: str) -> bool:
     return any(indicator in html for indicator in auth_failure_indicators)
 
 
-def fetch_page(url: str, save_raw: bool = False) -> tuple[str, str]:
-    """Fetch page HTML using Playwright with Twitter cookies."""
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        context.add_cookies(get_twitter_cookies())
+async def start_browser() -> None:
+    """Launch the shared browser pool and HTTP tier (called once at app startup)."""
+    if HTTP_SOURCES:
+        await start_tier(get_twitter_cookies)
+    await start_pool(get_twitter_cookies)
+
+
+async def stop_browser() -> None:
+    """Shut the shared browser pool and HTTP tier down cleanly."""
+    await stop_tier()
+    await stop_pool()
 
-        page = context.new_page()
-        page.goto(url, wait_until="networkidle", timeout=60000)
 
-        # Wait for article content to load with multiple possible selectors
+async def _wait_until_ready(page) -> str:
+    """
+    Wait until tweet/longform content stops changing.
+    Returns the condition that ended the wait: "stable", "login", "timeout" or "no_content".
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + READY_TIMEOUT_MS / 1000
+    last_snapshot = None
+    changed_at = loop.time()
+
+    while loop.time() < deadline:
         try:
-            # Try multiple selectors that Twitter might use
-            page.wait_for_selector(
-                'article[data-testid="tweet"], [data-testid="tweetText"], .longform-unstyled, [data-testid="cellInnerDiv"]',
-                timeout=20000
-            )
-        except Exception as e:
-            print(f"Warning: Tweet selector not found: {e}")
-            pass  # Continue anyway
+            snapshot = await page.evaluate(_CONTENT_SNAPSHOT_JS, CONTENT_SELECTOR)
+        except PlaywrightError:
+            # Client-side navigation destroyed the execution context; poll the new one
+            await asyncio.sleep(READY_POLL_MS / 1000)
+            continue
+        now = loop.time()
+
+        if snapshot[2]:
+            return "login"  # Redirected to login, no point waiting for content
+        if snapshot != last_snapshot:
+            last_snapshot = snapshot
+            changed_at = now
+        elif snapshot[0] and now - changed_at >= READY_QUIET_MS / 1000:
+            return "stable"
 
-        # Additional wait for dynamic content to fully load
-        page.wait_for_timeout(5000)
+        await asyncio.sleep(READY_POLL_MS / 1000)
 
-        html = page.content()
-        title = page.title()
+    return "timeout" if last_snapshot and last_snapshot[0] else "no_content"
 
-        browser.close()
 
-    # Check for auth failure before saving/returning
+def _capture_thread(page, tweet_id: str, payloads: list[dict]) -> asyncio.Event:
+    """
+    Collect thread GraphQL responses into `payloads`.
+    The returned event is set once they hold enough to build the article.
+    """
+    arrived = asyncio.Event()
+
+    async def on_response(response):
+        if not is_thread_response(response.url):
+            return
+        try:
+            payloads.append(await response.json())
+        except Exception:
+            return  # Body already gone or not JSON; the DOM path still works
+        if parse_thread(payloads, tweet_id) is not None:
+            arrived.set()
+
+    page.on("response", on_response)
+    return arrived
+
+
+async def _load_page(pool, url: str) -> dict:
+    """
+    Navigate a pooled page to the URL and return its HTML, title, thread JSON and readiness.
+    Returns as soon as the thread JSON arrives; otherwise waits for the DOM to settle.
+    """
+    tweet_id = status_id(url) if FETCH_MODE == "graphql" else None
+    payloads = []
+
+    async with pool.page() as page:
+        start = time.perf_counter()
+        # Listen before navigating: TweetDetail can land before DOMContentLoaded
+        arrived = _capture_thread(page, tweet_id, payloads) if tweet_id else asyncio.Event()
+        thread_task = asyncio.ensure_future(arrived.wait())
+        ready_task = None
+        try:
+            await page.goto(_navigation_url(url), wait_until="domcontentloaded", timeout=60000)
+            if not arrived.is_set():
+                ready_task = asyncio.ensure_future(_wait_until_ready(page))
+                await asyncio.wait({thread_task, ready_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (thread_task, ready_task):
+                if task is not None:
+                    task.cancel()
+
+        if arrived.is_set():
+            ready, html = "graphql", ""
+        else:
+            ready, html = ready_task.result(), await page.content()
+        ready_ms = int((time.perf_counter() - start) * 1000)
+
+        return {
+            "html": html,
+            "title": await page.title(),
+            "thread": payloads or None,
+            "ready": ready,
+            "ready_ms": ready_ms,
+            "traffic": await pool.traffic(page),
+        }
+
+
+def fetch_page(url: str) -> dict:
+    """
+    Fetch a page using the shared Playwright browser with Twitter cookies.
+    Returns dict with html, title, thread (captured GraphQL responses, or None)
+    and ready (the condition that ended the readiness wait).
+    """
+    pool = get_pool(get_twitter_cookies)
+    result = pool.run(_load_page(pool, url))
+    html = result["html"]
+
+    readiness_stats[result["ready"]] += 1
+    traffic = result["traffic"]
+    print(
+        f"Page ready: {result['ready']} after {result['ready_ms']}ms ({url}); "
+        f"{traffic['allowed_requests']} requests / {traffic['allowed_bytes'] // 1024} KB allowed, "
+        f"{traffic['blocked_requests']} blocked {traffic['blocked_by_type']}"
+    )
+
+    # Check for auth failure before returning
     if _check_auth_failure(html):
         raise AuthExpiredError("Twitter cookies have expired or are invalid")
 
-    if save_raw:
-        with open("raw_page.html", "w") as f:
-            f.write(html)
-        print("Saved raw HTML to raw_page.html")
+    return {"html": html, "title": result["title"], "thread": result["thread"], "ready": result["ready"]}
+
+
+def fetch_light(url: str) -> dict | None:
+    """
+    Try the browser-free HTTP sources (see http_sources).
+    Returns a page dict whose "article" holds the parsed content, or None to escalate.
+    """
+    tweet_id = status_id(url)
+    if not HTTP_SOURCES or not tweet_id:
+        return None
+    tier = get_tier(get_twitter_cookies)
+    result = tier.run(tier.fetch(url, tweet_id))
+    if result is None:
+        return None
+
+    source, article = result
+    return {"html": "", "title": article["title"], "thread": None, "source": source, "article": article}
+
+
+def load_page(url: str, force_refresh: bool = False) -> dict:
+    """
+    Fetch a page, served from the page cache unless force_refresh is set.
+    Cheap HTTP sources are tried first; the browser (fetch_page) only when they can't answer.
+    """
+    key = normalize_url(url)
+    if not force_refresh:
+        cached = page_cache.get(key)
+        if cached is not None:
+            tier_stats["cache"] += 1
+            cached.setdefault("thread", None)  # Cached before thread capture existed
+            return cached
+
+    page = fetch_light(url)
+    if page is None:
+        page = {**fetch_page(url), "source": "browser"}
+    tier_stats[page["source"]] += 1
+    print(f"Served by {page['source']}: {url}")
 
-    return html, title
+    # A page that timed out or never showed content may be half rendered; fetch it again next time
+    if page.get("ready", "stable") in _CACHEABLE_READINESS:
+        page_cache.put(key, page)
+    return page
+
+
+def cached_article(url: str) -> dict | None:
+    """Return the previously extracted article for this URL, if cached."""
+    return article_cache.get(f"{ARTICLE_FORMAT_VERSION}:{normalize_url(url)}")
+
+
+def cache_article(url: str, article: dict) -> None:
+    """Remember an extracted article so retries skip fetch and extraction."""
+    article_cache.put(f"{ARTICLE_FORMAT_VERSION}:{normalize_url(url)}", article)
 
 
 def clean_html(html: str, title: str) -> str:
@@ -109,21 +317,38 @@ def clean_html(html: str, title: str) -> str:
     Clean and format HTML for e-reader readability.
     Preserves headers, paragraphs, lists, and basic formatting.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    node = fragment_fromstring(html, create_parent="div")
+    return _format_html(_collect_paragraphs(node), title)
 
-    # Remove unwanted elements
-    for tag in soup.find_all(["script", "style", "nav", "footer", "aside", "iframe"]):
-        tag.decompose()
 
-    # Get all paragraph elements from the readability output
-    paragraphs = soup.find_all("p")
+# Attached photos; avatars, emoji and card thumbnails live on other paths
+_TWEET_PHOTO_RE = re.compile(r"https://pbs\.twimg\.com/media/")
+
+
+def _collect_paragraphs(node: HtmlElement) -> list:
+    """
+    Collect deduplicated paragraph text from extracted article markup (mutates node).
+    Tweet photos come back as ("img", url) parts.
+    """
+    # Remove unwanted elements
+    for tag in list(node.iter("script", "style", "nav", "footer", "aside", "iframe")):
+        tag.drop_tree()
 
     content_parts = []
     seen_text = set()
+    seen_index = _ShingleIndex()
+
+    # Get all paragraph elements (and tweet photos, in reading order) from the readability output
+    for p in node.iter("p", "img"):
+        if p.tag == "img":
+            src = p.get("src", "")
+            if _TWEET_PHOTO_RE.match(src) and src not in seen_text:
+                seen_text.add(src)
+                content_parts.append(("img", src))
+            continue
 
-    for p in paragraphs:
-        # Don't use strip=True - it removes spaces between inline styled elements
-        text = p.get_text()
+        # text_content() keeps the spaces between inline styled elements
+        text = p.text_content()
         # Normalize whitespace: collapse multiple spaces/newlines into single space
         text = " ".join(text.split())
 
@@ -137,43 +362,96 @@ def clean_html(html: str, title: str) -> str:
 
         # Skip if this text is a substring of something we already have
         # (handles the case where Twitter splits formatted text)
-        if any(text in existing for existing in seen_text):
+        if text in seen_index:
             continue
 
         seen_text.add(text)
+        seen_index.add(text)
         content_parts.append(text)
 
-    # Build clean HTML
-    formatted_html = _format_html(content_parts, title)
-
-    return formatted_html
+    return content_parts
+
+
+# UI/navigation strings, combined into one anchored pattern
+_UI_PATTERNS = [
+    r"follow",
+    r"repost",
+    r"like",
+    r"share",
+    r"reply",
+    r"home",
+    r"explore",
+    r"notifications",
+    r"messages",
+    r"bookmarks",
+    r"profile",
+    r"more",
+    r"post",
+    r"\d+",  # Just numbers
+    r"\d+[KMB]?",  # Engagement counts like 5K, 10M
+    r"[A-Z][a-z]+ \d+",  # Dates like "Jan 15"
+    r"Show more",
+    r"Show this thread",
+]
+_UI_TEXT_RE = re.compile("^(?:" + "|".join(_UI_PATTERNS) + ")$", re.IGNORECASE)
 
 
 def _is_ui_text(text: str) -> bool:
     """Check if text is likely UI/navigation rather than content."""
-    ui_patterns = [
-        r"^follow$",
-        r"^repost$",
-        r"^like$",
-        r"^share$",
-        r"^reply$",
-        r"^home$",
-        r"^explore$",
-        r"^notifications$",
-        r"^messages$",
-        r"^bookmarks$",
-        r"^profile$",
-        r"^more$",
-        r"^post$",
-        r"^\d+$",  # Just numbers
-        r"^\d+[KMB]?$",  # Engagement counts like 5K, 10M
-        r"^[A-Z][a-z]+ \d+$",  # Dates like "Jan 15"
-        r"^Show more$",
-        r"^Show this thread$",
-    ]
+    return _UI_TEXT_RE.match(text.lower().strip()) is not None
+
 
-    text_lower = text.lower().strip()
-    return any(re.match(pattern, text_lower, re.IGNORECASE) for pattern in ui_patterns)
+class _ShingleIndex:
+    """
+    Answers "is this text inside any accepted paragraph?" without scanning them all.
+
+    Accepted paragraphs are indexed by the hash of a SHINGLE-character window
+    every STEP characters. Any occurrence of a long enough query covers one of
+    those windows near its start and one near its end, so only paragraphs
+    holding both are verified. Results match a full substring scan.
+    """
+
+    SHINGLE = 12
+    STEP = 8
+
+    def __init__(self):
+        self._paragraphs = []
+        self._postings = {}  # hash(window) -> paragraph id, or set of ids
+
+    def add(self, text: str) -> None:
+        paragraph_id = len(self._paragraphs)
+        self._paragraphs.append(text)
+        postings = self._postings
+        for start in range(0, len(text) - self.SHINGLE + 1, self.STEP):
+            key = hash(text[start:start + self.SHINGLE])
+            ids = postings.get(key)
+            if ids is None:
+                postings[key] = paragraph_id
+            elif isinstance(ids, set):
+                ids.add(paragraph_id)
+            elif ids != paragraph_id:
+                postings[key] = {ids, paragraph_id}
+
+    def _candidates(self, text: str, first: int) -> set:
+        """Paragraphs holding an indexed window at query offsets first .. first + STEP - 1."""
+        found = set()
+        for start in range(first, first + self.STEP):
+            ids = self._postings.get(hash(text[start:start + self.SHINGLE]))
+            if isinstance(ids, set):
+                found |= ids
+            elif ids is not None:
+                found.add(ids)
+        return found
+
+    def __contains__(self, text: str) -> bool:
+        if len(text) < self.SHINGLE + self.STEP - 1:
+            # Too short to be sure of covering a window; under the 20 char minimum anyway
+            return any(text in paragraph for paragraph in self._paragraphs)
+
+        candidates = self._candidates(text, 0)
+        if candidates:
+            candidates &= self._candidates(text, len(text) - self.SHINGLE - self.STEP + 1)
+        return any(text in self._paragraphs[i] for i in candidates)
 
 
 def _clean_title(title: str) -> str:
@@ -186,37 +464,46 @@ def _clean_title(title: str) -> str:
     return title.strip()
 
 
-def _format_html(content_parts: list[str], title: str) -> str:
-    """Format content as clean HTML for e-readers."""
-    title = _clean_title(title)
-
-    paragraphs = "\n".join(f"<p>{part}</p>" for part in content_parts)
-
-    html = f"""<!DOCTYPE html>
+def _format_blocks(content_parts: list) -> str:
+    """
+    Render content parts as HTML. A part is paragraph text, or a (tag, text)
+    block where tag is p, h2, h3, blockquote, ul/ol for one list item, or
+    img with the image URL as text.
+    """
+    lines = []
+    open_list = None
+    for part in content_parts:
+        tag, text = ("p", part) if isinstance(part, str) else part
+        text = html.escape(text)
+        if tag != open_list and open_list:
+            lines.append(f"</{open_list}>")
+            open_list = None
+        if tag == "img":
+            lines.append(f'<figure><img src="{text}" alt=""></figure>')
+        elif tag in ("ul", "ol"):
+            if open_list is None:
+                lines.append(f"<{tag}>")
+                open_list = tag
+            lines.append(f"<li>{text}</li>")
+        else:
+            lines.append(f"<{tag}>{text}</{tag}>")
+    if open_list:
+        lines.append(f"</{open_list}>")
+    return "\n".join(lines)
+
+
+def _format_html(content_parts: list, title: str) -> str:
+    """Format content as clean HTML for e-readers (styled by the PDF render profile)."""
+    title = html.escape(_clean_title(title))
+
+    paragraphs = _format_blocks(content_parts)
+
+    return f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <style>
-        body {{
-            font-family: Georgia, serif;
-            line-height: 1.6;
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        h1 {{
-            font-size: 1.5em;
-            margin-bottom: 1em;
-            border-bottom: 1px solid #ccc;
-            padding-bottom: 0.5em;
-        }}
-        p {{
-            margin-bottom: 1em;
-            text-align: justify;
-        }}
-    </style>
 </head>
 <body>
     <h1>{title}</h1>
@@ -224,50 +511,109 @@ def _format_html(content_parts: list[str], title: str) -> str:
 </body>
 </html>"""
 
-    return html
 
+def _remove_twitter_errors(doc: HtmlElement) -> None:
+    """Remove Twitter's error/noscript containers that interfere with extraction (in place)."""
+    for element in doc.find_class("errorContainer") + list(doc.iter("noscript")):
+        element.drop_tree()
+
+
+class _ArticleDocument(Document):
+    """Readability document that keeps the extracted article node, so it isn't re-parsed."""
+
+    article = None
+
+    def get_clean_html(self):
+        self.article = self._html()
+        return super().get_clean_html()
+
+
+def _format_text(content_parts: list, title: str) -> str:
+    """Format content as plain text, paragraphs separated by blank lines."""
+    title = _clean_title(title)
+    texts = [
+        part if isinstance(part, str) else part[1]
+        for part in content_parts
+        if isinstance(part, str) or part[0] != "img"
+    ]
+    return "\n\n".join([title, *texts] if title else texts)
+
+
+def _parse_thread_article(thread: list[dict], url: str) -> dict | None:
+    """Build the article from captured GraphQL responses, or None if they don't hold the tweet."""
+    tweet_id = status_id(url)
+    parsed = parse_thread(thread, tweet_id) if tweet_id else None
+    if parsed is None:
+        return None
+    return build_article({"article": parsed}, url)
 
-def _remove_twitter_errors(html: str) -> str:
-    """Remove Twitter's error/noscript containers that interfere with extraction."""
-    soup = BeautifulSoup(html, "html.parser")
-    for error in soup.find_all(class_="errorContainer"):
-        error.decompose()
-    for noscript in soup.find_all("noscript"):
-        noscript.decompose()
-    return str(soup)
 
+def build_article(page: dict, url: str) -> dict:
+    """Turn a page from load_page into a clean article, whichever tier fetched it."""
+    if page.get("article"):
+        parsed = page["article"]
+        return {
+            "title": _clean_title(parsed["title"]),
+            "html": _format_html(parsed["blocks"], parsed["title"]),
+            "text": _format_text(parsed["blocks"], parsed["title"]),
+            "url": url,
+        }
+    return parse_article(page["html"], page["title"], url, page["thread"])
 
-def extract_article(url: str) -> dict:
+
+def parse_article(raw_html: str, page_title: str, url: str, thread: list[dict] | None = None) -> dict:
     """
-    Main extraction function.
+    Turn a fetched page into a clean article.
     Returns dict with title, html, and plain text.
+
+    Captured thread JSON is used when it holds the tweet. Otherwise the page
+    is parsed once into an lxml tree that is cleaned in place, handed to
+    Readability, and walked once for the formatted output.
     """
-    # Fetch page
-    raw_html, page_title = fetch_page(url)
+    if thread:
+        article = _parse_thread_article(thread, url)
+        if article is not None:
+            return article
+        if not raw_html:
+            raise Exception("Thread data has no usable content and no page HTML was captured")
+
+    doc, _ = build_doc(raw_html)
 
     # Remove Twitter error containers before extraction
-    clean_raw = _remove_twitter_errors(raw_html)
+    _remove_twitter_errors(doc)
 
     # Use Readability for initial extraction
-    doc = Document(clean_raw)
-    readable_html = doc.summary()
-    readable_title = doc.title() or page_title
-
-    # Clean and format HTML
-    formatted_html = clean_html(readable_html, readable_title)
+    readable = _ArticleDocument(doc)
+    readable.summary()
+    readable_title = get_title(doc) or page_title
 
-    # Also generate plain text version
-    soup = BeautifulSoup(formatted_html, "html.parser")
-    plain_text = soup.get_text(separator="\n\n", strip=True)
+    content_parts = _collect_paragraphs(readable.article)
 
     return {
         "title": _clean_title(readable_title),
-        "html": formatted_html,
-        "text": plain_text,
+        "html": _format_html(content_parts, readable_title),
+        "text": _format_text(content_parts, readable_title),
         "url": url,
     }
 
 
+def extract_article(url: str, force_refresh: bool = False) -> dict:
+    """
+    Main extraction function.
+    Returns dict with title, html, and plain text.
+    Cached pages and articles are reused unless force_refresh is set.
+    """
+    if not force_refresh:
+        article = cached_article(url)
+        if article is not None:
+            return article
+
+    page = load_page(url, force_refresh)
+    article = build_article(page, url)
+    cache_article(url, article)
+    return article
+
+
 if __name__ == "__main__":
     # Test extraction
     test_url = "https://x.com/thedankoe/status/2012956603297964167"
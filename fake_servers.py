@@ -0,0 +1,202 @@
+"""
+Local stand-ins for external services, shared by the tests and loadtest.py.
+Each one is a ThreadingHTTPServer on a free port, served from a daemon thread.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeServer:
+    """A ThreadingHTTPServer on a free local port, served from a daemon thread."""
+
+    def __init__(self, handler: type[BaseHTTPRequestHandler]):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> str:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is visible
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload, headers: dict | None = None):
+        self._reply(status, json.dumps(payload).encode(), "application/json", headers)
+
+
+class FakeDropbox(FakeServer):
+    """
+    OAuth token, files/upload and upload session endpoints (including
+    finish_batch_v2, which only commits closed sessions).
+
+    Each authenticated call fails at random with the given rates: 401
+    revokes the current token (so clients must refresh; a new token always
+    serves its first call), 429 carries Retry-After: 1, and "5xx" answers
+    503. Tests can also script failures: `upload_failures` lists statuses
+    for the next files/upload calls (sent with `retry_after`, if set), and
+    `lost_appends` appends are stored but answered with 500.
+
+    Uploaded files end up in `files`, keyed by path; `stats` counts token
+    calls and responses by status.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        rate_401: float = 0,
+        rate_429: float = 0,
+        rate_5xx: float = 0,
+        seed: int = 0,
+    ):
+        self.latency = latency_ms / 1000
+        self.rates = [(401, rate_401), (429, rate_429), (503, rate_5xx)]
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        self.expires_in = 14400
+        self.valid_tokens = set()
+        self.fresh_tokens = set()
+        self.upload_failures = []
+        self.retry_after = None
+        self.lost_appends = 0
+        self.client_ports = set()
+        self.sessions = {}  # session_id -> {"data": bytearray, "closed": bool}
+        self.files = {}
+        self.lock = threading.Lock()
+        fake = self
+
+        class DropboxHandler(Handler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(fake.latency)
+                with fake.lock:
+                    fake.client_ports.add(self.client_address[1])
+
+                if self.path == "/oauth2/token":
+                    with fake.lock:
+                        fake.stats["token"] += 1
+                        token = f"token-{fake.stats['token']}"
+                        fake.valid_tokens = {token}
+                        fake.fresh_tokens = {token}
+                    return self._json(200, {"access_token": token, "expires_in": fake.expires_in})
+
+                token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+                headers = {}
+                with fake.lock:
+                    failure = fake._roll() if token in fake.valid_tokens else 401
+                    if failure == 401 and token in fake.fresh_tokens:
+                        failure = None  # A token just handed out isn't revoked before its first use
+                    fake.fresh_tokens.discard(token)
+                    if failure == 401:
+                        fake.valid_tokens.discard(token)
+                    if failure == 429:
+                        headers = {"Retry-After": "1"}
+                    elif failure is None and self.path == "/2/files/upload" and fake.upload_failures:
+                        failure = fake.upload_failures.pop(0)
+                        headers = {"Retry-After": fake.retry_after} if fake.retry_after else {}
+                    fake.stats[failure or "ok"] += 1
+                if failure == 401:
+                    return self._json(401, {"error_summary": "expired_access_token/"})
+                if failure:
+                    summary = "too_many_requests/" if failure == 429 else "internal_error/"
+                    return self._json(failure, {"error_summary": summary}, headers)
+
+                if self.path == "/2/files/upload_session/finish_batch_v2":
+                    entries = json.loads(body)["entries"]
+                    return self._json(200, {"entries": [fake._finish(**entry, batch=True) for entry in entries]})
+
+                arg = json.loads(self.headers.get("Dropbox-API-Arg", "{}"))
+                if self.path == "/2/files/upload":
+                    with fake.lock:
+                        fake.files[arg["path"]] = body
+                    return self._json(200, {"path_display": arg["path"], "size": len(body)})
+                if self.path.startswith("/2/files/upload_session/"):
+                    return self._session(self.path.rsplit("/", 1)[1], arg, body)
+                self._json(404, {})
+
+            def _session(self, endpoint, arg, body):
+                if endpoint == "start":
+                    with fake.lock:
+                        session_id = f"session-{len(fake.sessions)}"
+                        fake.sessions[session_id] = {"data": bytearray(body), "closed": arg["close"]}
+                    return self._json(200, {"session_id": session_id})
+
+                if endpoint == "append_v2":
+                    cursor = arg["cursor"]
+                    with fake.lock:
+                        session = fake.sessions.get(cursor["session_id"])
+                        if session is None:
+                            error = {".tag": "not_found"}
+                            return self._json(409, {"error_summary": "not_found/", "error": error})
+                        if cursor["offset"] != len(session["data"]):
+                            error = {".tag": "incorrect_offset", "correct_offset": len(session["data"])}
+                            return self._json(409, {"error_summary": "incorrect_offset/", "error": error})
+                        session["data"] += body
+                        session["closed"] = arg["close"]
+                        lost = fake.lost_appends > 0
+                        fake.lost_appends -= lost
+                    if lost:
+                        return self._json(500, {"error_summary": "internal_error/"})
+                    return self._json(200, None)
+
+                if endpoint == "finish":
+                    with fake.lock:
+                        if arg["cursor"]["session_id"] in fake.sessions:
+                            fake.sessions[arg["cursor"]["session_id"]]["data"] += body
+                    result = fake._finish(**arg)
+                    return self._json(200 if result[".tag"] == "success" else 409, result)
+
+                self._json(404, {})
+
+        super().__init__(DropboxHandler)
+
+    @property
+    def token_calls(self) -> int:
+        return self.stats["token"]
+
+    def _roll(self) -> int | None:
+        """Pick an injected status for one call, or None to let it through (holds self.lock)."""
+        roll = self.random.random()
+        for status, rate in self.rates:
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+    def _finish(self, cursor: dict, commit: dict, batch: bool = False) -> dict:
+        """
+        Commit a session's data to a file, if the cursor's offset matches what
+        was received (and, for a batch, the session was closed).
+        """
+        with self.lock:
+            session = self.sessions.get(cursor["session_id"])
+            if session is None:
+                return {".tag": "failure", "failure": {".tag": "lookup_failed", "lookup_failed": {".tag": "not_found"}}}
+            if cursor["offset"] != len(session["data"]):
+                return {".tag": "failure", "failure": {".tag": "lookup_failed"}}
+            if batch and not session["closed"]:
+                return {".tag": "failure", "failure": {".tag": "lookup_failed", "lookup_failed": {".tag": "not_closed"}}}
+            self.files[commit["path"]] = bytes(session["data"])
+        return {".tag": "success", "path_display": commit["path"], "size": len(session["data"])}
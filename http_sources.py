@@ -0,0 +1,236 @@
+"""
+Browser-free fetch tier for Twitter/X links.
+Public JSON endpoints answer single tweets in one HTTP request, so the
+headless browser is only needed for threads, long posts and articles.
+"""
+
+import asyncio
+import html
+from abc import ABC, abstractmethod
+import math
+import os
+from typing import Callable
+
+import httpx
+from lxml.html import fragment_fromstring
+from shared_service import SharedService
+from tweet_graphql import first_text, paragraphs, short_title
+
+# Sources tried in order before falling back to the browser (comma-separated; empty disables)
+HTTP_SOURCES = [name for name in os.getenv("HTTP_SOURCES", "syndication").split(",") if name]
+HTTP_SOURCE_TIMEOUT = float(os.getenv("HTTP_SOURCE_TIMEOUT", "5"))
+SYNDICATION_URL = os.getenv("SYNDICATION_URL", "https://cdn.syndication.twimg.com")
+OEMBED_URL = os.getenv("OEMBED_URL", "https://publish.twitter.com")
+
+_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class Source(ABC):
+    """
+    A cheap way to fetch one tweet.
+
+    `fetch()` returns an article as {"title", "author", "blocks"} (the shape
+    of tweet_graphql.parse_thread), or None when the source can't give the
+    complete content and the browser has to take over.
+    """
+
+    name = "source"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    @abstractmethod
+    async def fetch(self, client: httpx.AsyncClient, url: str, tweet_id: str) -> dict | None:
+        """Fetch and parse the tweet; None escalates to the next tier."""
+
+
+def _base36(value: float, fraction_digits: int = 11) -> str:
+    """Float to base 36, close to JavaScript's Number.prototype.toString(36)."""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    integer = int(value)
+    fraction = value - integer
+    head = ""
+    while True:
+        integer, digit = divmod(integer, 36)
+        head = digits[digit] + head
+        if not integer:
+            break
+    tail = ""
+    for _ in range(fraction_digits):
+        fraction *= 36
+        digit = int(fraction)
+        tail += digits[digit]
+        fraction -= digit
+    return f"{head}.{tail}"
+
+
+class SyndicationSource(Source):
+    """The embed widget's tweet-result JSON (no login needed)."""
+
+    name = "syndication"
+
+    @staticmethod
+    def token(tweet_id: str) -> str:
+        # Same derivation as the embed widget; the endpoint only checks it loosely
+        return _base36(int(tweet_id) / 1e15 * math.pi).replace("0", "").replace(".", "")
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, tweet_id: str) -> dict | None:
+        response = await client.get(
+            f"{self.base_url}/tweet-result",
+            params={"id": tweet_id, "token": self.token(tweet_id), "lang": "en"},
+        )
+        if response.status_code == 404 or not response.content:
+            return None
+        response.raise_for_status()
+        data = response.json()
+
+        if data.get("__typename") != "Tweet":
+            return None  # Tombstone (deleted, protected, age-gated)
+        user = data.get("user", {})
+        # Threads, long posts and articles are truncated here; the browser gets all of it
+        if data.get("self_thread") or data.get("note_tweet") or data.get("article"):
+            return None
+        if data.get("in_reply_to_user_id_str") and data.get("in_reply_to_user_id_str") == user.get("id_str"):
+            return None
+
+        text = data.get("text", "")
+        start, end = data.get("display_text_range", [0, len(text)])
+        text = text[start:end]
+        entities = data.get("entities", {})
+        for link in entities.get("urls", []):
+            text = text.replace(link["url"], link.get("expanded_url") or link["url"])
+        for media in entities.get("media", []):
+            text = text.replace(media["url"], "")
+
+        blocks = paragraphs(html.unescape(text))
+        blocks += [
+            ("img", media["media_url_https"])
+            for media in data.get("mediaDetails", [])
+            if media.get("type") == "photo"
+        ]
+        if not blocks:
+            return None
+        return {
+            "title": short_title(first_text(blocks)),
+            "author": {"name": user.get("name", ""), "screen_name": user.get("screen_name", "")},
+            "blocks": blocks,
+        }
+
+
+class OEmbedSource(Source):
+    """
+    The public oEmbed endpoint. It can't tell whether a tweet starts a thread,
+    so only enable it when shared links are mostly single tweets.
+    """
+
+    name = "oembed"
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, tweet_id: str) -> dict | None:
+        response = await client.get(
+            f"{self.base_url}/oembed",
+            params={"url": url, "omit_script": "true", "dnt": "true"},
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+
+        blockquote = fragment_fromstring(data.get("html", ""), create_parent="div")
+        blocks = []
+        for p in blockquote.iter("p"):
+            for a in list(p.iter("a")):
+                if a.text_content().startswith("pic.twitter.com"):
+                    a.drop_tree()
+            blocks.extend(paragraphs(p.text_content()))
+        if not blocks:
+            return None
+        return {
+            "title": short_title(blocks[0][1]),
+            "author": {"name": data.get("author_name", ""), "screen_name": ""},
+            "blocks": blocks,
+        }
+
+
+# name -> factory for that source; register adapters here to make them selectable in HTTP_SOURCES
+SOURCE_TYPES = {
+    "syndication": lambda: SyndicationSource(SYNDICATION_URL),
+    "oembed": lambda: OEmbedSource(OEMBED_URL),
+}
+
+
+class HttpTier:
+    """
+    Pooled async HTTP client plus the ordered list of sources to try.
+    Like the browser pool, it lives on one event loop; worker threads call run().
+    """
+
+    def __init__(
+        self,
+        cookies: Callable[[], list[dict]] | None = None,
+        sources: list[Source] | None = None,
+        timeout: float = HTTP_SOURCE_TIMEOUT,
+    ):
+        self._cookies = cookies
+        self.sources = sources if sources is not None else [SOURCE_TYPES[name]() for name in HTTP_SOURCES]
+        self.timeout = timeout
+        self.client: httpx.AsyncClient | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        jar = httpx.Cookies()
+        try:
+            for cookie in self._cookies() if self._cookies else []:
+                jar.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        except ValueError:
+            pass  # No cookies configured; the public endpoints don't need them
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            cookies=jar,
+            headers={"User-Agent": _USER_AGENT},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def fetch(self, url: str, tweet_id: str) -> tuple[str, dict] | None:
+        """Return (source name, article) from the first source with complete content."""
+        for source in self.sources:
+            try:
+                article = await source.fetch(self.client, url, tweet_id)
+            except Exception as e:
+                # Any failure here just means the next source (or the browser) gets a go
+                print(f"{source.name} fetch failed for {url}: {e!r}")
+                continue
+            if article is not None:
+                return source.name, article
+        return None
+
+    def run(self, coro):
+        """Run a coroutine on the tier's loop from a worker thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_tier = SharedService("http-tier", HttpTier)
+
+
+async def start_tier(cookies: Callable[[], list[dict]] | None = None) -> HttpTier:
+    """Start the shared HTTP tier on the current event loop (app startup)."""
+    return await _tier.start(cookies)
+
+
+async def stop_tier() -> None:
+    """Close the shared HTTP tier if it is running (app shutdown)."""
+    await _tier.stop()
+
+
+def get_tier(cookies: Callable[[], list[dict]] | None = None) -> HttpTier:
+    """Return the shared HTTP tier, started lazily outside the server (see SharedService)."""
+    return _tier.get(cookies)
@@ -0,0 +1,378 @@
+"""
+Persistent in-process job queue for article processing.
+Jobs are stored in SQLite so queued work survives a server restart.
+"""
+
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable
+
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+# Jobs in flight at once; per-stage limits decide how many run each stage
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+# Jobs allowed to wait for a worker; beyond this submit raises QueueFullError (0 = unbounded)
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "32"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    key TEXT,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    stages TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# Queued, running, or deferred by the handler (see JobDeferred)
+_ACTIVE = "NOT IN ('done', 'failed')"
+
+
+def _boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _process_start(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22 (start time); the command name before it may contain spaces
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return ""
+
+
+def process_owner(pid: int | None = None) -> str:
+    """Identify a process across reboots and pid reuse: boot id, pid and start time."""
+    pid = pid or os.getpid()
+    return f"{_boot_id()}:{pid}:{_process_start(pid)}"
+
+
+def _owner_alive(owner: str | None) -> bool:
+    try:
+        boot_id, pid, _ = owner.split(":")
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False  # Claimed before owners were recorded
+    if boot_id != _boot_id():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, just not ours to signal
+    return process_owner(pid) == owner
+
+
+class JobDeferred(Exception):
+    """
+    Raised by a handler whose job will finish outside the queue (e.g. an
+    upload left to a retry loop). The job is stored with `status` and
+    `result`, still counts as active, and ends when finish() is called.
+    """
+
+    def __init__(self, status: str, message: str, result: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.result = result
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue has no room; `retry_after` is a suggested delay in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """
+    Queue of article jobs drained by a pool of worker threads.
+
+    `handler(job, stage)` runs the pipeline for one job. `stage(name)` is a
+    context manager that records status and timing for each pipeline step.
+    Whatever dict the handler returns is stored as the job result; a handler
+    that raises JobDeferred leaves the job for a later finish().
+
+    `limits` caps how many jobs may be inside a given stage at once, so with
+    enough workers one job can render while others fetch or upload.
+    `on_stage(name, seconds, error)` is called after each stage (e.g. for metrics)
+    and `on_finish(job)` with the final job once it is done or failed.
+
+    At most `max_pending` jobs wait for a worker; submitting more raises
+    QueueFullError instead of letting a burst pile up.
+
+    Several processes (e.g. uvicorn workers) may share one database: a worker
+    claims a job by recording its process as the owner, and start() only
+    requeues running jobs whose owner has exited.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict, Callable], dict],
+        path: str = JOBS_DB,
+        workers: int = JOB_WORKERS,
+        limits: dict[str, int] | None = None,
+        on_stage: Callable[[str, float, BaseException | None], None] | None = None,
+        on_finish: Callable[[dict], None] | None = None,
+        max_pending: int = JOB_QUEUE_MAX,
+    ):
+        self._handler = handler
+        self._on_stage = on_stage
+        self._on_finish = on_finish
+        self.workers = workers
+        self.max_pending = max_pending
+        # Moving average of job duration, for Retry-After estimates
+        self._job_seconds = 10.0
+        self._limits = {
+            name: threading.BoundedSemaphore(limit) for name, limit in (limits or {}).items()
+        }
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column in ("key", "owner"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+        self._db.commit()
+        self._db_lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._admit_lock = threading.Lock()
+        self._threads = []
+        self.owner = process_owner()
+
+    def start(self) -> None:
+        """Requeue unfinished jobs from the last run and start the workers."""
+        with self._db_lock:
+            running = self._db.execute(
+                "SELECT id, owner FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            # Jobs another live process is working on stay with it
+            orphaned = [(job_id,) for job_id, owner in running if not _owner_alive(owner)]
+            self._db.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running'",
+                orphaned,
+            )
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        for (job_id,) in rows:
+            self._pending.put(job_id)
+        if rows:
+            print(f"Resuming {len(rows)} unfinished job(s)")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Stop the workers once they finish their current job."""
+        for _ in self._threads:
+            self._pending.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending(self) -> int:
+        """Jobs waiting for a worker."""
+        return self._pending.qsize()
+
+    def full(self, count: int = 1) -> bool:
+        """True if `count` more jobs would not fit in the wait queue."""
+        return bool(self.max_pending) and self.pending() + count > self.max_pending
+
+    def retry_after(self) -> int:
+        """Seconds until the workers have likely worked through the current backlog."""
+        return max(1, math.ceil((self.pending() + 1) / self.workers * self._job_seconds))
+
+    def submit(self, url: str, key: str | None = None, **options) -> dict:
+        """
+        Persist a new job and queue it for processing.
+        `key` identifies duplicate work for find_active() (e.g. the normalized URL).
+        """
+        return self.submit_many([(url, key)], **options)[0]
+
+    def submit_many(self, items: list[tuple[str, str | None]], **options) -> list[dict]:
+        """
+        Persist and queue one job per (url, key) pair in a single transaction.
+        Raises QueueFullError (and queues nothing) if they don't all fit.
+        """
+        now = time.time()
+        job_ids = [uuid.uuid4().hex for _ in items]
+        with self._admit_lock:
+            if self.full(len(items)):
+                raise QueueFullError(self.retry_after())
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT INTO jobs (id, url, key, status, options, created_at, updated_at)"
+                    " VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                    [
+                        (job_id, url, key, json.dumps(options), now, now)
+                        for job_id, (url, key) in zip(job_ids, items)
+                    ],
+                )
+                self._db.commit()
+            for job_id in job_ids:
+                self._pending.put(job_id)
+        return [self.get(job_id) for job_id in job_ids]
+
+    def finish(self, job_id: str, result: dict | None = None, error: str | None = None) -> bool:
+        """
+        End a deferred job: done with `result`, or failed with `error`.
+        Returns False if the job had already ended.
+        """
+        fields = {"status": "failed" if error else "done", "error": error}
+        if result is not None:
+            fields["result"] = result
+        if not self._update(job_id, active_only=True, **fields):
+            return False
+        if self._on_finish is not None:
+            self._on_finish(self.get(job_id))
+        return True
+
+    def find_active(self, key: str) -> dict | None:
+        """Return the queued, running or deferred job for `key`, if any."""
+        return self.find_active_many([key]).get(key)
+
+    def find_active_many(self, keys: list[str]) -> dict[str, dict]:
+        """Map each key that has a queued, running or deferred job to that job."""
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT key, id FROM jobs WHERE key IN ({placeholders}) AND status {_ACTIVE}"
+                " ORDER BY created_at DESC",
+                list(keys),
+            ).fetchall()
+        # Oldest job wins when a key somehow has several
+        job_ids = dict(rows)
+        return {key: self.get(job_id) for key, job_id in job_ids.items()}
+
+    def get(self, job_id: str) -> dict | None:
+        """Return a job as a dict, or None if it doesn't exist."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, url, status, options, stages, result, error, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "url": row[1],
+            "status": row[2],
+            "options": json.loads(row[3]),
+            "stages": json.loads(row[4]),
+            "result": json.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def _claim(self, job_id: str) -> bool:
+        """Move a queued job to running under this process; False if another worker got it."""
+        with self._db_lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, stages = '{}', error = NULL,"
+                " updated_at = ? WHERE id = ? AND status = 'queued'",
+                (self.owner, time.time(), job_id),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def _update(self, job_id: str, active_only: bool = False, **fields) -> bool:
+        """Set fields on a job (only while it is active, if `active_only`); True if it was updated."""
+        fields["updated_at"] = time.time()
+        for key in ("stages", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        condition = f" AND status {_ACTIVE}" if active_only else ""
+        with self._db_lock:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?{condition}",
+                (*fields.values(), job_id),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def _stage(self, job_id: str, stages: dict, name: str):
+        """Record running/done/failed status and duration of one pipeline step."""
+        limit = self._limits.get(name)
+        if limit is not None and not limit.acquire(blocking=False):
+            stages[name] = {"status": "waiting", "started_at": time.time(), "duration_ms": None}
+            self._update(job_id, stages=stages)
+            limit.acquire()
+
+        started = time.time()
+        stages[name] = {"status": "running", "started_at": started, "duration_ms": None}
+        self._update(job_id, stages=stages)
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            stages[name]["status"] = "failed"
+            raise
+        else:
+            stages[name]["status"] = "done"
+        finally:
+            if limit is not None:
+                limit.release()
+            elapsed = time.time() - started
+            stages[name]["duration_ms"] = int(elapsed * 1000)
+            self._update(job_id, stages=stages)
+            if self._on_stage is not None:
+                self._on_stage(name, elapsed, error)
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._pending.get()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None or not self._claim(job_id):
+                continue
+
+            stages = {}
+            started = time.time()
+
+            def stage(name: str, _job_id=job_id, _stages=stages):
+                return self._stage(_job_id, _stages, name)
+
+            finished = True
+            try:
+                result = self._handler(job, stage)
+                self._update(job_id, status="done", result=result)
+            except JobDeferred as e:
+                print(f"Job {job_id} {e.status}: {e}")
+                # finish() may already have ended it from another thread
+                self._update(job_id, active_only=True, status=e.status, result=e.result, error=str(e))
+                finished = False
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e))
+            self._job_seconds = 0.8 * self._job_seconds + 0.2 * (time.time() - started)
+            if finished and self._on_finish is not None:
+                self._on_finish(self.get(job_id))
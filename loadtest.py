@@ -0,0 +1,259 @@
+"""
+Load test harness: stand-in x.com and Dropbox servers plus a load generator.
+
+The app runs as a subprocess pointed at the stand-ins (X_BASE_URL,
+SYNDICATION_URL, DROPBOX_API_URL, DROPBOX_CONTENT_URL) with fresh job,
+dedup, cache and trace state in a temporary directory. For each
+concurrency level, that many clients submit unique status URLs to /send
+and poll /jobs/{id} until the job finishes. The report gives throughput,
+p50/p95/p99 submit-to-done latency and the peak RSS of the app process
+tree (server, Chromium and PDF workers).
+
+The x.com stand-in serves the pages in bench_corpus/ with a configurable
+delay; the Dropbox stand-in can inject 401 (token revoked), 429
+(with Retry-After) and 503 responses at given rates.
+
+Usage:
+    python loadtest.py                                  # levels 1,4,16; 40 articles each
+    python loadtest.py --concurrency 1,8,32 --requests 100
+    python loadtest.py --x-latency-ms 400 --dropbox-429 0.1 --dropbox-5xx 0.05 --dropbox-401 0.02
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import httpx
+
+from bench_extract import load_corpus
+from browser_pool import process_tree_rss_mb
+from fake_servers import FakeDropbox, FakeServer, Handler
+from tweet_graphql import status_id
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeX(FakeServer):
+    """
+    Serves recorded pages for every /<user>/status/<id> URL (chosen by id,
+    so the mix is stable) after `latency_ms`. The syndication endpoint
+    answers 404, so every article goes through the browser.
+    """
+
+    def __init__(self, pages: list[str], latency_ms: float = 0):
+        self.pages = [page.encode() for page in pages]
+        self.latency = latency_ms / 1000
+        self.requests = Counter()
+        fake = self
+
+        class XHandler(Handler):
+            def do_GET(self):
+                tweet_id = status_id(self.path)
+                fake.requests["status" if tweet_id else "other"] += 1
+                if self.path.startswith("/tweet-result"):
+                    return self._json(404, {})
+                if not tweet_id:
+                    return self._reply(404, b"", "text/plain")
+                time.sleep(fake.latency)
+                page = fake.pages[int(tweet_id) % len(fake.pages)]
+                self._reply(200, page, "text/html; charset=utf-8")
+
+        super().__init__(XHandler)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile (p in 0-100); 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))  # ceil without floats
+    return ordered[int(rank) - 1]
+
+
+class RssSampler:
+    """Track the peak RSS of this process's children (the app and everything it spawned)."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        while True:
+            self.peak_mb = max(self.peak_mb, process_tree_rss_mb())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+async def _drive(client: httpx.AsyncClient, urls, count: int, poll: float, timeout: float) -> tuple[list, Counter]:
+    """One client: submit and wait for articles until `count` have been claimed overall."""
+    latencies = []
+    outcomes = Counter()
+    while True:
+        index, url = next(urls)
+        if index >= count:
+            return latencies, outcomes
+        started = time.perf_counter()
+        response = await client.post("/send", json={"url": url})
+        if response.status_code != 202:
+            outcomes[f"http_{response.status_code}"] += 1
+            continue
+        job_id = response.json()["job_id"]
+        status = "timeout"
+        while time.perf_counter() - started < timeout:
+            await asyncio.sleep(poll)
+            status = (await client.get(f"/jobs/{job_id}")).json()["status"]
+            if status in ("done", "failed"):
+                break
+        outcomes[status] += 1
+        if status == "done":
+            latencies.append(time.perf_counter() - started)
+
+
+async def run_level(app_url: str, urls, concurrency: int, count: int, poll: float, timeout: float) -> dict:
+    """Run `count` articles through the app with `concurrency` clients; return the level's figures."""
+    shared = enumerate(urls)  # Clients take turns on one iterator, so every URL is used once
+    async with httpx.AsyncClient(base_url=app_url, timeout=30) as client:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(_drive(client, shared, count, poll, timeout) for _ in range(concurrency))
+            )
+            elapsed = time.perf_counter() - started
+
+    latencies = [value for result, _ in results for value in result]
+    outcomes = sum((outcome for _, outcome in results), Counter())
+    return {
+        "concurrency": concurrency,
+        "done": outcomes.pop("done", 0),
+        "other": dict(outcomes),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": rss.peak_mb,
+    }
+
+
+def start_app(port: int, env: dict, verbose: bool = False, startup_timeout: float = 60) -> subprocess.Popen:
+    """Launch the app under uvicorn and wait until its health check answers."""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=None if verbose else subprocess.DEVNULL,
+    )
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("App did not become healthy in time")
+
+
+def app_env(state_dir: str, x_url: str, dropbox_url: str) -> dict:
+    """Environment for the app under test: stand-in endpoints, throwaway credentials and state."""
+    return {
+        **os.environ,
+        "X_BASE_URL": x_url,
+        "SYNDICATION_URL": x_url,
+        "DROPBOX_API_URL": dropbox_url,
+        "DROPBOX_CONTENT_URL": dropbox_url,
+        "TWITTER_AUTH_TOKEN": "loadtest",
+        "TWITTER_CT0": "loadtest",
+        "DROPBOX_APP_KEY": "loadtest",
+        "DROPBOX_APP_SECRET": "loadtest",
+        "DROPBOX_REFRESH_TOKEN": "loadtest",
+        "DROPBOX_ACCESS_TOKEN": "",
+        "DROPBOX_UPLOAD_PATH": "/loadtest",
+        "JOBS_DB": os.path.join(state_dir, "jobs.db"),
+        "SENT_DB": os.path.join(state_dir, "sent.db"),
+        "CACHE_DIR": os.path.join(state_dir, "cache"),
+        "TRACE_DIR": os.path.join(state_dir, "traces"),
+        "UPLOAD_SPOOL_DIR": os.path.join(state_dir, "spool"),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=40, help="articles per concurrency level")
+    parser.add_argument("--port", type=int, default=3100)
+    parser.add_argument("--x-latency-ms", type=float, default=200)
+    parser.add_argument("--dropbox-latency-ms", type=float, default=50)
+    parser.add_argument("--dropbox-401", type=float, default=0, help="rate of revoked-token replies")
+    parser.add_argument("--dropbox-429", type=float, default=0, help="rate of rate-limit replies")
+    parser.add_argument("--dropbox-5xx", type=float, default=0, help="rate of 503 replies")
+    parser.add_argument("--poll-ms", type=float, default=100)
+    parser.add_argument("--job-timeout", type=float, default=300, help="seconds before a job counts as timed out")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the app's output")
+    args = parser.parse_args()
+
+    _, pages = load_corpus()
+    x = FakeX(list(pages.values()), args.x_latency_ms)
+    dropbox = FakeDropbox(args.dropbox_latency_ms, args.dropbox_401, args.dropbox_429, args.dropbox_5xx)
+    x_url, dropbox_url = x.start(), dropbox.start()
+
+    # Unique ids per run so nothing is answered from the dedup store or caches
+    first_id = int(time.time() * 1000) * 1000
+    urls = (f"https://x.com/loadtest/status/{first_id + n}" for n in itertools.count())
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as state_dir:
+        app = start_app(args.port, app_env(state_dir, x_url, dropbox_url), args.verbose)
+        try:
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                results.append(asyncio.run(run_level(
+                    f"http://127.0.0.1:{args.port}", urls, concurrency, args.requests,
+                    args.poll_ms / 1000, args.job_timeout,
+                )))
+        finally:
+            app.terminate()
+            app.wait(timeout=30)
+            x.close()
+            dropbox.close()
+
+    if args.json:
+        print(json.dumps({"levels": results, "dropbox": dict(dropbox.stats)}, indent=2, default=str))
+        return 0
+
+    print(f"{'clients':>7} {'done':>5} {'other':<22} {'art/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'RSS MB':>7}")
+    for r in results:
+        other = ",".join(f"{k}={v}" for k, v in r["other"].items()) or "-"
+        print(
+            f"{r['concurrency']:>7} {r['done']:>5} {other:<22} {r['throughput']:7.2f} "
+            f"{r['p50']:7.2f} {r['p95']:7.2f} {r['p99']:7.2f} {r['peak_rss_mb']:7.0f}"
+        )
+    print(f"Dropbox stand-in: {dict(dropbox.stats)}; x.com stand-in: {dict(x.requests)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
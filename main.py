@@ -2,46 +2,261 @@
 Remark Drop - FastAPI server for saving Twitter articles to Dropbox.
 """
 
+import asyncio
 import os
 import re
-from fastapi import FastAPI, HTTPException
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from extractor import extract_article, AuthExpiredError
-from dropbox_uploader import upload_to_dropbox
-
-SENT_LOG = "sent_articles.txt"
+from pydantic import BaseModel, Field, HttpUrl
+from extractor import (
+    load_page,
+    build_article,
+    cached_article,
+    cache_article,
+    normalize_url,
+    start_browser,
+    stop_browser,
+    AuthExpiredError,
+)
+from browser_pool import POOL_SIZE
+from dropbox_uploader import UPLOAD_CONCURRENCY
+from epub_builder import build_epub
+from pdf_renderer import render_pdf, start_renderer, stop_renderer, PDF_PROFILE, PDF_WORKERS, RENDER_PROFILES
+from jobs import JOB_QUEUE_MAX, JobDeferred, JobQueue, QueueFullError
+from dedup import DedupStore
+from upload_scheduler import UploadScheduler, retrying
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import media
+import metrics
+import tracing
 
+# Jobs allowed in each pipeline stage at once: browser pages, PDF workers, Dropbox uploads
+STAGE_LIMITS = {"fetch": POOL_SIZE, "render": PDF_WORKERS, "upload": UPLOAD_CONCURRENCY}
+# A batch never holds more URLs than the wait queue, so one sent to an idle server is admitted whole
+MAX_BATCH_SIZE = min(100, JOB_QUEUE_MAX) if JOB_QUEUE_MAX else 100
+# pdf (WeasyPrint, see PDF_PROFILE) or epub (zipped XHTML, no page layout); jobs may override it
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "pdf")
 
-def normalize_url(url: str) -> str:
-    """Normalize Twitter URL to canonical form for dedup."""
-    url = re.sub(r"https?://(www\.)?twitter\.com", "https://x.com", url)
-    url = url.split("?")[0].rstrip("/")
-    return url
+sent_store = DedupStore()
 
 
-def was_already_sent(url: str) -> bool:
-    """Check if URL was already processed."""
-    if not os.path.exists(SENT_LOG):
-        return False
-    normalized = normalize_url(url)
-    with open(SENT_LOG, "r") as f:
-        return normalized in {line.strip() for line in f}
+def reserve_url(url: str) -> bool:
+    """Claim URL for processing; False if it was sent or is already in progress."""
+    return sent_store.reserve(normalize_url(url))
 
 
 def mark_as_sent(url: str) -> None:
     """Record URL as processed."""
-    normalized = normalize_url(url)
-    with open(SENT_LOG, "a") as f:
-        f.write(normalized + "\n")
+    sent_store.mark_sent(normalize_url(url))
+
+
+def release_url(url: str) -> None:
+    """Give up the claim on a URL after a failure so it can be retried."""
+    sent_store.release(normalize_url(url))
+
+
+def spool_key(url: str, output_format: str, profile: str) -> str:
+    """Spool entry for one rendering of a URL; the profile only matters for PDFs."""
+    return f"{output_format}:{profile if output_format == 'pdf' else ''}:{normalize_url(url)}"
+
+
+def process_article(job: dict, stage) -> dict:
+    """Run the full pipeline for a queued job: fetch, extract, images, render (PDF or EPUB), upload."""
+    url = job["url"]
+    force_refresh = job["options"].get("force_refresh", False)
+    output_format = job["options"].get("format") or OUTPUT_FORMAT
+    profile = job["options"].get("profile") or PDF_PROFILE
+    # Debug jobs keep the raw page and profile extract/render under TRACE_DIR/<request id>
+    debug_dir = extract_profile = render_profile = None
+    if job["options"].get("debug"):
+        debug_dir = os.path.abspath(tracing.trace_dir(job["options"].get("request_id") or job["id"]))
+        extract_profile = os.path.join(debug_dir, "extract.folded")
+        render_profile = os.path.join(debug_dir, "render.folded")
+        force_refresh = True  # Profile a real extraction, not a cache hit
+
+    key = spool_key(url, output_format, profile)
+    try:
+        # A file spooled by an earlier failed or interrupted upload is never rendered again
+        entry = None if force_refresh else uploads.get(key)
+        if entry is None:
+            # A cached article skips the browser entirely
+            article = None if force_refresh else cached_article(url)
+            if article is None:
+                try:
+                    with stage("fetch"):
+                        page = load_page(url, force_refresh)
+                    if debug_dir:
+                        tracing.save_page(debug_dir, page)
+                except AuthExpiredError:
+                    raise AuthExpiredError(
+                        "Twitter cookies expired. Update TWITTER_AUTH_TOKEN and TWITTER_CT0 in .env"
+                    )
+
+                with stage("extract"), tracing.sampled(extract_profile):
+                    article = build_article(page, url)
+                    cache_article(url, article)
+
+            html_content = article["html"]
+            if media.MEDIA_IMAGES:
+                with stage("images"):
+                    html_content = media.embed_images(html_content)
+            else:
+                html_content = media.strip_images(html_content)
+
+            if output_format == "epub":
+                # Its own stage name, so its latency can be compared with "render" in the metrics
+                with stage("epub"), tracing.sampled(render_profile):
+                    data = build_epub(article["title"], html_content, url)
+            else:
+                with stage("render"):
+                    data = render_pdf(html_content, profile, sample_to=render_profile)
+                    metrics.observe_pdf(data, profile)
+            entry = uploads.spool(
+                key, data, article["title"], f".{output_format}", url=url, format=output_format, profile=profile
+            )
+        elif retrying(entry):
+            # The upload retry loop already has it; the job ends once that upload does
+            raise JobDeferred("upload_pending", f"Upload waiting for retry: {entry['error']}", upload_result(entry))
+        else:
+            print(f"✓ Found {entry['title']!r} in the upload spool; skipping render")
+
+        try:
+            with stage("upload"):
+                dropbox_path = uploads.upload(key)
+        except Exception as e:
+            entry = uploads.get(key)
+            if entry is not None and retrying(entry):
+                # Transient: keep the URL reserved and leave the file to the retry loop
+                raise JobDeferred("upload_pending", f"Upload will be retried: {e}", upload_result(entry))
+            raise
+    except JobDeferred:
+        raise
+    except Exception:
+        release_url(url)
+        raise
+
+    mark_as_sent(url)
+    return upload_result(entry, dropbox_path)
+
+
+def upload_result(entry: dict, dropbox_path: str | None = None) -> dict:
+    """Job result for a spooled upload (no path while it waits for a retry)."""
+    return {
+        "title": entry["title"],
+        "dropbox_path": dropbox_path,
+        "format": entry["format"],
+        "profile": entry["profile"] if entry["format"] == "pdf" else None,
+        "bytes": entry["bytes"],
+    }
+
+
+def finish_upload(entry: dict, dropbox_path: str) -> None:
+    """The retry loop uploaded a spooled file: record the URL as sent and end its waiting job."""
+    mark_as_sent(entry["url"])
+    job = job_queue.find_active(normalize_url(entry["url"]))
+    if job is not None:
+        job_queue.finish(job["id"], result=upload_result(entry, dropbox_path))
+
+
+def abandon_upload(entry: dict, error: str) -> None:
+    """The retry loop gave up on a spooled file: fail its waiting job so the URL can be sent again."""
+    release_url(entry["url"])
+    job = job_queue.find_active(normalize_url(entry["url"]))
+    if job is not None:
+        job_queue.finish(job["id"], error=error)
+
+
+def trace_job(job: dict) -> None:
+    """Log a structured trace record for a finished job."""
+    tracing.log_trace({
+        "request_id": job["options"].get("request_id"),
+        "job_id": job["id"],
+        "url": job["url"],
+        "status": job["status"],
+        "error": job["error"],
+        "stages_ms": {name: stage["duration_ms"] for name, stage in job["stages"].items()},
+        "total_ms": int((job["updated_at"] - job["created_at"]) * 1000),
+        "dropbox_path": (job["result"] or {}).get("dropbox_path"),
+        "format": (job["result"] or {}).get("format"),
+        "profile": (job["result"] or {}).get("profile"),
+        "bytes": (job["result"] or {}).get("bytes"),
+    })
+
+
+uploads = UploadScheduler(
+    on_retry=metrics.observe_upload_retry,
+    on_uploaded=finish_upload,
+    on_abandoned=abandon_upload,
+)
+metrics.watch_spool(uploads.pending)
+
+job_queue = JobQueue(
+    process_article,
+    limits=STAGE_LIMITS,
+    on_stage=metrics.observe_stage,
+    on_finish=trace_job,
+)
+metrics.watch_queue(job_queue.pending)
+
+# Serializes "attach to running job or reserve a new one" within this process
+_submit_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep a warm browser, PDF workers and the job workers for the lifetime of the server."""
+    try:
+        await start_browser()
+    except Exception as e:
+        # e.g. missing cookies: surface the error per job instead of refusing to boot
+        print(f"Browser pool not started: {e}")
+    await media.start_fetcher()
+    try:
+        await asyncio.to_thread(start_renderer)
+    except Exception as e:
+        print(f"PDF renderer not warmed: {e}")
+    job_queue.start()
+    uploads.start()
+    yield
+    await asyncio.to_thread(uploads.stop)
+    # Workers may be waiting on the browser, which runs on this event loop
+    await asyncio.to_thread(job_queue.stop)
+    await asyncio.to_thread(stop_renderer)
+    await media.stop_fetcher()
+    await stop_browser()
 
 
 app = FastAPI(
     title="Remark Drop",
     description="Save Twitter/X articles to Dropbox for reMarkable",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+@app.middleware("http")
+async def request_id_and_timing(request: Request, call_next):
+    """Tag each request with an id (X-Request-ID) and report its total time via Server-Timing."""
+    request_id = request.headers.get("X-Request-ID", "")
+    if not _REQUEST_ID_RE.fullmatch(request_id):
+        request_id = uuid.uuid4().hex[:16]  # Also names the debug trace directory, so keep it tame
+    request.state.request_id = request_id
+    started = time.perf_counter()
+    response = await call_next(request)
+    total = tracing.server_timing({"app": (time.perf_counter() - started) * 1000})
+    timing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{timing}, {total}" if timing else total
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -53,12 +268,59 @@ app.add_middleware(
 
 class SendRequest(BaseModel):
     url: HttpUrl
+    force_refresh: bool = False  # Ignore cached page/article and refetch
+    debug: bool = False  # Keep raw page and profiles under TRACE_DIR (needs TRACE_DEBUG=true)
+    profile: str | None = None  # PDF render profile (see pdf_renderer.RENDER_PROFILES); PDF_PROFILE if unset
+    format: Literal["pdf", "epub"] | None = None  # OUTPUT_FORMAT if unset
 
 
 class SendResponse(BaseModel):
     success: bool
     title: str
     message: str
+    job_id: str
+
+
+class BatchRequest(BaseModel):
+    urls: list[str] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    force_refresh: bool = False
+    profile: str | None = None
+    format: Literal["pdf", "epub"] | None = None
+
+
+class BatchItem(BaseModel):
+    url: str
+    status: str  # queued, in_progress, already_saved, duplicate, invalid or busy
+    job_id: str | None = None
+
+
+class BatchResponse(BaseModel):
+    success: bool
+    queued: int
+    results: list[BatchItem]
+
+
+class StageStatus(BaseModel):
+    status: str
+    started_at: float
+    duration_ms: int | None = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    url: str
+    status: str
+    stages: dict[str, StageStatus]
+    title: str | None = None
+    dropbox_path: str | None = None
+    error: str | None = None
+    created_at: float
+    updated_at: float
+
+
+def is_twitter_url(url: str) -> bool:
+    """Loose check that a URL points at Twitter/X."""
+    return "twitter.com" in url or "x.com" in url
 
 
 @app.get("/")
@@ -67,49 +329,210 @@ def health_check() -> dict:
     return {"status": "ok", "service": "remark-drop"}
 
 
-@app.post("/send", response_model=SendResponse)
-def save_article(request: SendRequest):
+def _check_profile(profile: str | None) -> None:
+    if profile is not None and profile not in RENDER_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown profile; use one of: {', '.join(RENDER_PROFILES)}",
+        )
+
+
+def _busy(retry_after: int) -> HTTPException:
+    """503 telling the client when to try again; the queue is full."""
+    metrics.REJECTED.inc()
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, try again later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+@app.post("/send", response_model=SendResponse, status_code=202)
+async def save_article(request: SendRequest, http_request: Request, response: Response):
     """
-    Extract a Twitter/X article and save it to Dropbox.
+    Queue a Twitter/X article to be saved to Dropbox.
 
     - Fetches the article using Playwright + cookies
     - Extracts clean, formatted content
     - Converts to PDF and uploads to Dropbox
+
+    Returns immediately with a job id; poll GET /jobs/{job_id} for progress
+    (its Server-Timing header carries the stage durations). Returns 503 with
+    Retry-After when JOB_QUEUE_MAX jobs are already waiting, unless the URL
+    already has a queued or running job, whose id is returned as usual.
     """
     url = str(request.url)
+    if request.debug and not tracing.TRACE_DEBUG:
+        raise HTTPException(status_code=400, detail="Debug traces are disabled (TRACE_DEBUG)")
 
-    if "twitter.com" not in url and "x.com" not in url:
+    if not is_twitter_url(url):
         raise HTTPException(
             status_code=400,
             detail="URL must be a Twitter/X link",
         )
+    _check_profile(request.profile)
 
-    if was_already_sent(url):
-        raise HTTPException(
-            status_code=409,
-            detail="Article already saved",
-        )
+    job, message, timings = await asyncio.to_thread(
+        _submit_article, url, request, http_request.state.request_id
+    )
+    if timings:
+        response.headers["Server-Timing"] = tracing.server_timing(timings)
+    return SendResponse(success=True, title=url, message=message, job_id=job["id"])
 
-    try:
-        article = extract_article(url)
-        upload_to_dropbox(article["title"], article["html"])
-        mark_as_sent(url)
-
-        return SendResponse(
-            success=True,
-            title=article["title"],
-            message="Article saved to Dropbox!",
-        )
 
-    except AuthExpiredError:
-        raise HTTPException(
-            status_code=401,
-            detail="Twitter cookies expired. Update TWITTER_AUTH_TOKEN and TWITTER_CT0 in .env",
-        )
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process: {str(e)}")
+def _submit_article(url: str, request: SendRequest, request_id: str) -> tuple[dict, str, dict]:
+    """Attach to a running job or reserve the URL and queue a new one; returns (job, message, timings)."""
+    key = normalize_url(url)
+    timings = {}
+
+    with _submit_lock:
+        started = time.perf_counter()
+        # A retry or second share of an in-flight URL attaches to the running job
+        job = job_queue.find_active(key)
+        if job is not None:
+            metrics.observe_dedup(hit=True)
+            return job, "Article already in progress", timings
+
+        # Only new work is turned away, before it takes a dedup reservation
+        if job_queue.full():
+            raise _busy(job_queue.retry_after())
+
+        reserved = reserve_url(url)
+        metrics.observe_dedup(hit=not reserved)
+        timings["dedup"] = (time.perf_counter() - started) * 1000
+        if not reserved:
+            raise HTTPException(
+                status_code=409,
+                detail="Article already saved",
+            )
+
+        started = time.perf_counter()
+        try:
+            job = job_queue.submit(
+                url,
+                key=key,
+                force_refresh=request.force_refresh,
+                request_id=request_id,
+                debug=request.debug,
+                profile=request.profile,
+                format=request.format,
+            )
+        except QueueFullError as e:
+            release_url(url)
+            raise _busy(e.retry_after)
+        timings["enqueue"] = (time.perf_counter() - started) * 1000
+
+    return job, "Article queued for Dropbox", timings
+
+
+@app.post("/send/batch", response_model=BatchResponse, status_code=202)
+async def save_articles(request: BatchRequest, response: Response):
+    """
+    Queue many Twitter/X articles at once (e.g. back-filling bookmarks).
+
+    URLs are checked against running jobs and the dedup store in one pass;
+    each new one becomes a job. Jobs share the per-stage limits in
+    STAGE_LIMITS, so fetching, rendering and uploading overlap across the batch.
+    New URLs beyond the queue's free room come back as "busy" (not reserved)
+    with a Retry-After header; if none fit and none attach to a running job,
+    the batch gets a 503.
+    """
+    _check_profile(request.profile)
+
+    results = await asyncio.to_thread(_submit_batch, request)
+    if any(item.status == "busy" for item in results):
+        metrics.REJECTED.inc()
+        response.headers["Retry-After"] = str(job_queue.retry_after())
+    queued = sum(item.status == "queued" for item in results)
+    return BatchResponse(success=True, queued=queued, results=results)
+
+
+def _submit_batch(request: BatchRequest) -> list[BatchItem]:
+    results = []
+    keys = {}
+    for url in request.urls:
+        item = BatchItem(url=url, status="invalid")
+        results.append(item)
+        if not url.startswith(("http://", "https://")) or not is_twitter_url(url):
+            continue
+        key = normalize_url(url)
+        if key in keys:
+            item.status = "duplicate"
+            continue
+        keys[key] = item
+
+    with _submit_lock:
+        active = job_queue.find_active_many(list(keys))
+        for key, job in active.items():
+            metrics.observe_dedup(hit=True)
+            keys[key].status = "in_progress"
+            keys[key].job_id = job["id"]
+
+        new_keys = [key for key in keys if key not in active]
+        if job_queue.max_pending:
+            room = max(0, job_queue.max_pending - job_queue.pending())
+            if new_keys and not room and not active:
+                raise _busy(job_queue.retry_after())
+            for key in new_keys[room:]:
+                keys[key].status = "busy"
+            new_keys = new_keys[:room]
+
+        reserved = sent_store.reserve_many(new_keys)
+        for key in new_keys:
+            metrics.observe_dedup(hit=key not in reserved)
+            if key not in reserved:
+                keys[key].status = "already_saved"
+
+        submit = [(keys[key].url, key) for key in new_keys if key in reserved]
+        try:
+            jobs = job_queue.submit_many(
+                submit,
+                force_refresh=request.force_refresh,
+                profile=request.profile,
+                format=request.format,
+            )
+        except QueueFullError as e:
+            for key in reserved:
+                sent_store.release(key)
+            raise _busy(e.retry_after)
+
+    for (_, key), job in zip(submit, jobs):
+        keys[key].status = "queued"
+        keys[key].job_id = job["id"]
+
+    return results
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: stage latencies, errors, PDF sizes, browser pool, dedup hits."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str, response: Response):
+    """Report per-stage status, timings and the final Dropbox path of a job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    timings = {name: stage["duration_ms"] for name, stage in job["stages"].items()}
+    if job["status"] in ("done", "failed"):
+        timings["total"] = (job["updated_at"] - job["created_at"]) * 1000
+    response.headers["Server-Timing"] = tracing.server_timing(timings)
+
+    result = job["result"] or {}
+    return JobResponse(
+        id=job["id"],
+        url=job["url"],
+        status=job["status"],
+        stages=job["stages"],
+        title=result.get("title"),
+        dropbox_path=result.get("dropbox_path"),
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+"""
+Image stage for e-ink output.
+Tweet photos are fetched concurrently, shrunk to the reMarkable's screen,
+dithered to its gray levels and inlined into the article HTML, so PDFs
+stay small and the render workers never touch the network.
+"""
+
+import asyncio
+import base64
+import io
+import os
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from lxml.html import document_fromstring, tostring
+
+from content_cache import TieredCache
+from shared_service import SharedService
+
+# Inline tweet photos into rendered documents (false drops them)
+MEDIA_IMAGES = os.getenv("MEDIA_IMAGES", "true").lower() in ("1", "true", "yes")
+# reMarkable 2 screen in pixels; images are only ever scaled down to fit
+MEDIA_MAX_WIDTH = int(os.getenv("MEDIA_MAX_WIDTH", "1404"))
+MEDIA_MAX_HEIGHT = int(os.getenv("MEDIA_MAX_HEIGHT", "1872"))
+MEDIA_GRAY_LEVELS = 16  # What the panel can show; fewer levels also means smaller PNGs
+# Processed image bytes allowed per document; later images are left out
+MEDIA_MAX_DOCUMENT_KB = int(os.getenv("MEDIA_MAX_DOCUMENT_KB", "2048"))
+MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", "6"))
+MEDIA_TIMEOUT = float(os.getenv("MEDIA_TIMEOUT", "10"))
+
+# Bump when process_image output changes so cached images are redone
+PROCESS_VERSION = 1
+
+media_cache = TieredCache("media", memory_items=16)
+
+
+def source_url(url: str) -> str:
+    """The variant to download: pbs.twimg.com serves up to 2048px as name=large."""
+    parts = urlsplit(url)
+    if parts.netloc != "pbs.twimg.com":
+        return url
+    query = dict(parse_qsl(parts.query))
+    query["name"] = "large"
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def process_image(data: bytes) -> bytes:
+    """
+    Downscale to the screen, convert to grayscale and Floyd-Steinberg dither
+    to MEDIA_GRAY_LEVELS; returns a 4-bit palette PNG.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto paper white
+            image = image.convert("RGBA")
+            background = Image.new("RGBA", image.size, "white")
+            image = Image.alpha_composite(background, image)
+        image = image.convert("L")
+        image.thumbnail((MEDIA_MAX_WIDTH, MEDIA_MAX_HEIGHT), Image.Resampling.LANCZOS)
+
+        step = 255 / (MEDIA_GRAY_LEVELS - 1)
+        grays = [round(i * step) for i in range(MEDIA_GRAY_LEVELS)]
+        palette = Image.new("P", (1, 1))
+        palette.putpalette([value for gray in grays for value in (gray, gray, gray)])
+        dithered = image.convert("RGB").quantize(palette=palette, dither=Image.Dither.FLOYDSTEINBERG)
+
+        output = io.BytesIO()
+        dithered.save(output, "PNG", optimize=True, bits=4)
+        return output.getvalue()
+
+
+class MediaFetcher:
+    """
+    Pooled async HTTP client for image downloads, on its own event loop
+    like the HTTP tier; worker threads call run().
+    """
+
+    def __init__(self, concurrency: int = MEDIA_CONCURRENCY, timeout: float = MEDIA_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.client: httpx.AsyncClient | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        # Downloads queue here rather than in the connection pool, whose wait counts against the timeout
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            follow_redirects=True,
+        )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _fetch(self, url: str) -> bytes | None:
+        try:
+            async with self._slots:
+                response = await self.client.get(source_url(url))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Image fetch failed for {url}: {e!r}")
+            return None
+        return response.content
+
+    async def fetch_all(self, urls: list[str]) -> dict[str, bytes | None]:
+        """Download every URL, `concurrency` at a time across all callers; None marks a failure."""
+        results = await asyncio.gather(*(self._fetch(url) for url in urls))
+        return dict(zip(urls, results))
+
+    def run(self, coro):
+        """Run a coroutine on the fetcher's loop from a worker thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_fetcher = SharedService("media-fetcher", MediaFetcher)
+
+
+async def start_fetcher() -> MediaFetcher:
+    """Start the shared image fetcher on the current event loop (app startup)."""
+    return await _fetcher.start()
+
+
+async def stop_fetcher() -> None:
+    """Close the shared image fetcher if it is running (app shutdown)."""
+    await _fetcher.stop()
+
+
+def get_fetcher() -> MediaFetcher:
+    """Return the shared image fetcher, started lazily outside the server (see SharedService)."""
+    return _fetcher.get()
+
+
+def _cache_key(url: str) -> str:
+    return f"{PROCESS_VERSION}:{MEDIA_MAX_WIDTH}x{MEDIA_MAX_HEIGHT}:{url}"
+
+
+def processed_images(urls: list[str]) -> dict[str, bytes]:
+    """
+    Processed PNG bytes for each URL that could be fetched and decoded.
+    Each distinct URL is downloaded and processed once, then served from the media cache.
+    """
+    images = {}
+    missing = []
+    for url in dict.fromkeys(urls):
+        cached = media_cache.get(_cache_key(url))
+        if cached is not None:
+            images[url] = base64.b64decode(cached["png"])
+        else:
+            missing.append(url)
+
+    if missing:
+        fetcher = get_fetcher()
+        for url, data in fetcher.run(fetcher.fetch_all(missing)).items():
+            if data is None:
+                continue
+            try:
+                png = process_image(data)
+            except Exception as e:
+                print(f"Skipping unreadable image {url}: {e}")
+                continue
+            media_cache.put(_cache_key(url), {"png": base64.b64encode(png).decode("ascii")})
+            images[url] = png
+    return images
+
+
+def _remote_images(doc) -> list:
+    return [img for img in doc.iter("img") if img.get("src", "").startswith(("http://", "https://"))]
+
+
+def _drop(img) -> None:
+    parent = img.getparent()
+    (parent if parent.tag == "figure" else img).drop_tree()
+
+
+def embed_images(html_content: str, max_bytes: int = MEDIA_MAX_DOCUMENT_KB * 1024) -> str:
+    """
+    Replace remote <img> sources with processed, inlined PNGs.
+
+    Images are taken in reading order until `max_bytes` is spent; ones past
+    the cap, or that failed to download, are removed with their <figure>.
+    """
+    doc = document_fromstring(html_content)
+    elements = _remote_images(doc)
+    if not elements:
+        return html_content
+
+    images = processed_images([img.get("src") for img in elements])
+    spent = 0
+    dropped = 0
+    inlined = {}  # url -> data URI; a repeated image is embedded once by the renderer, so counts once
+    for img in elements:
+        url = img.get("src")
+        png = images.get(url)
+        if url not in inlined and png is not None and spent + len(png) <= max_bytes:
+            inlined[url] = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+            spent += len(png)
+        if url in inlined:
+            img.set("src", inlined[url])
+        else:
+            _drop(img)
+            dropped += 1
+
+    print(f"✓ Embedded {len(elements) - dropped} image(s), {spent // 1024} KB ({dropped} left out)")
+    return "<!DOCTYPE html>\n" + tostring(doc, encoding="unicode")
+
+
+def strip_images(html_content: str) -> str:
+    """Remove remote images (MEDIA_IMAGES=false), so the renderer never downloads originals."""
+    doc = document_fromstring(html_content)
+    elements = _remote_images(doc)
+    if not elements:
+        return html_content
+    for img in elements:
+        _drop(img)
+    return "<!DOCTYPE html>\n" + tostring(doc, encoding="unicode")
@@ -0,0 +1,110 @@
+"""
+Prometheus metrics for the article pipeline, served at GET /metrics.
+Hot-path updates are single histogram/counter operations; pool sizes and
+the extractor's counters are read only when Prometheus scrapes.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, REGISTRY
+
+import browser_pool
+import extractor
+from dropbox_uploader import DropboxError
+
+# Browser fetches dominate: up to a couple of minutes with retries
+STAGE_SECONDS = Histogram(
+    "remark_drop_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+ERRORS = Counter(
+    "remark_drop_errors_total",
+    "Pipeline failures by stage and error (exception class, with HTTP status for Dropbox)",
+    ["stage", "error"],
+)
+PDF_BYTES = Histogram(
+    "remark_drop_pdf_bytes",
+    "Size of rendered PDFs by render profile",
+    ["profile"],
+    buckets=(50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6),
+)
+DEDUP_CHECKS = Counter(
+    "remark_drop_dedup_checks_total",
+    "URLs checked against the dedup store; hit = already saved or in progress",
+    ["result"],
+)
+QUEUE_PENDING = Gauge("remark_drop_queue_pending", "Jobs waiting for a worker")
+REJECTED = Counter(
+    "remark_drop_rejected_total",
+    "Submissions turned away with 503 because the job queue was full",
+)
+UPLOAD_RETRIES = Counter(
+    "remark_drop_upload_retries_total",
+    "Dropbox uploads retried from the spool, by error",
+    ["error"],
+)
+SPOOL_PENDING = Gauge("remark_drop_spool_pending", "Rendered files in the spool waiting for upload")
+BROWSER = Gauge("remark_drop_browser", "Browser pool state", ["kind"])
+for _kind in ("browsers", "contexts", "pages"):
+    BROWSER.labels(_kind).set_function(lambda kind=_kind: browser_pool.pool_stats()[kind])
+
+
+def error_label(error: BaseException) -> str:
+    """Exception class name; Dropbox errors also carry the HTTP status (e.g. DropboxError_429)."""
+    name = type(error).__name__
+    if isinstance(error, DropboxError) and error.status_code:
+        return f"{name}_{error.status_code}"
+    return name
+
+
+def observe_stage(name: str, seconds: float, error: BaseException | None) -> None:
+    """JobQueue stage hook: record duration and, on failure, the error."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    if error is not None:
+        ERRORS.labels(name, error_label(error)).inc()
+
+
+def observe_pdf(pdf_data: bytes, profile: str) -> None:
+    PDF_BYTES.labels(profile).observe(len(pdf_data))
+
+
+def observe_dedup(hit: bool) -> None:
+    DEDUP_CHECKS.labels("hit" if hit else "miss").inc()
+
+
+def watch_queue(pending) -> None:
+    """Report `pending()` (the job queue's backlog) at scrape time."""
+    QUEUE_PENDING.set_function(pending)
+
+
+def observe_upload_retry(error: BaseException) -> None:
+    """UploadScheduler retry hook."""
+    UPLOAD_RETRIES.labels(error_label(error)).inc()
+
+
+def watch_spool(pending) -> None:
+    """Report `len(pending())` (spooled uploads) at scrape time."""
+    SPOOL_PENDING.set_function(lambda: len(pending()))
+
+
+class _ExtractorCollector:
+    """Exposes extractor's plain Counters (fetch tier, readiness outcome) at scrape time."""
+
+    def collect(self):
+        tiers = CounterMetricFamily(
+            "remark_drop_fetch_tier", "Which tier served each page fetch", labels=["tier"]
+        )
+        for tier, count in list(extractor.tier_stats.items()):
+            tiers.add_metric([tier], count)
+        yield tiers
+
+        readiness = CounterMetricFamily(
+            "remark_drop_page_ready", "Condition that ended the browser readiness wait", labels=["condition"]
+        )
+        for condition, count in list(extractor.readiness_stats.items()):
+            readiness.add_metric([condition], count)
+        yield readiness
+
+
+REGISTRY.register(_ExtractorCollector())
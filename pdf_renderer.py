@@ -0,0 +1,317 @@
+"""
+Process pool for WeasyPrint PDF rendering.
+Keeps CPU-bound layout off the request threads and lets it use every core.
+"""
+
+import io
+import multiprocessing
+import os
+import pathlib
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_TIMEOUT = int(os.getenv("PDF_TIMEOUT", "120"))
+PDF_MAX_MEMORY_MB = int(os.getenv("PDF_MAX_MEMORY_MB", "2048"))
+# Render profile used unless a job asks for another (see RENDER_PROFILES)
+PDF_PROFILE = os.getenv("PDF_PROFILE", "default")
+
+FONTS_URL = pathlib.Path(__file__).resolve().parent.joinpath("fonts").as_uri()
+
+
+class PdfRenderError(Exception):
+    """Raised when an article can't be converted to PDF."""
+    pass
+
+
+# Stylesheets for each rendering profile, parsed once per worker process
+RENDER_PROFILES = {
+    "default": """
+        @page {
+            size: A4;
+            margin: 2cm;
+        }
+        body {
+            font-family: 'Helvetica', 'Arial', sans-serif;
+            font-size: 12pt;
+            line-height: 1.6;
+            color: #000;
+            max-width: 800px;
+            margin: 0 auto;
+        }
+        h1 {
+            font-size: 20pt;
+            margin-bottom: 0.5em;
+            line-height: 1.2;
+        }
+        h2 {
+            font-size: 16pt;
+            margin-top: 1em;
+            margin-bottom: 0.5em;
+        }
+        p {
+            margin-bottom: 1em;
+            text-align: justify;
+        }
+        a {
+            color: #000;
+            text-decoration: underline;
+        }
+        figure {
+            margin: 1em 0;
+            text-align: center;
+            page-break-inside: avoid;
+        }
+        img {
+            max-width: 100%;
+            max-height: 24cm;
+            height: auto;
+        }
+    """,
+    # Page matched to the reMarkable 2 screen (1404x1872 px at 226 dpi), bundled subset fonts
+    "remarkable": f"""
+        @font-face {{
+            font-family: 'Remark Serif';
+            src: url('{FONTS_URL}/DejaVuSerif-Subset.ttf');
+        }}
+        @font-face {{
+            font-family: 'Remark Serif';
+            font-weight: bold;
+            src: url('{FONTS_URL}/DejaVuSerif-Bold-Subset.ttf');
+        }}
+        @page {{
+            size: 157.8mm 210.4mm;
+            margin: 10mm 9mm 12mm 9mm;
+        }}
+        body {{
+            font-family: 'Remark Serif', serif;
+            font-size: 11pt;
+            line-height: 1.45;
+            color: #000;
+        }}
+        h1 {{
+            font-size: 17pt;
+            margin: 0 0 0.5em;
+            line-height: 1.2;
+        }}
+        h2 {{
+            font-size: 14pt;
+            margin: 1em 0 0.4em;
+        }}
+        h3 {{
+            font-size: 12pt;
+            margin: 1em 0 0.4em;
+        }}
+        p {{
+            margin: 0 0 0.8em;
+            text-align: justify;
+            hyphens: auto;
+        }}
+        a {{
+            color: #000;
+        }}
+        figure {{
+            margin: 0.8em 0;
+            text-align: center;
+            page-break-inside: avoid;
+        }}
+        img {{
+            max-width: 100%;
+            max-height: 180mm;
+            height: auto;
+        }}
+    """,
+}
+
+# write_pdf options per profile. Fonts are always subset (full_fonts=False);
+# identical images (same src) are embedded once per document.
+RENDER_OPTIONS = {
+    "default": {},
+    "remarkable": {
+        "optimize_images": True,
+        "jpeg_quality": 75,
+        "dpi": 226,  # The screen's resolution; larger images are downsampled
+        "hinting": False,
+        "full_fonts": False,
+        "uncompressed_pdf": False,
+    },
+}
+
+# Per-process cache: profile name -> (CSS, FontConfiguration)
+_stylesheets = {}
+
+
+def _stylesheet(profile: str):
+    """Parse a profile's CSS once per process, sharing one FontConfiguration."""
+    if profile not in _stylesheets:
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = FontConfiguration()
+        css = CSS(string=RENDER_PROFILES[profile], font_config=font_config)
+        _stylesheets[profile] = (css, font_config)
+    return _stylesheets[profile]
+
+
+def _init_worker(max_memory_mb: int) -> None:
+    """Cap worker memory, then load WeasyPrint, fonts and stylesheets once per process."""
+    if max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    for profile in RENDER_PROFILES:
+        _render("<p>warm up</p>", profile)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _render(html_content: str, profile: str = "default") -> bytes:
+    """Render article HTML to PDF with a cached profile stylesheet."""
+    from weasyprint import HTML
+
+    css, font_config = _stylesheet(profile)
+    pdf_buffer = io.BytesIO()
+    HTML(string=html_content).write_pdf(
+        pdf_buffer, stylesheets=[css], font_config=font_config, **RENDER_OPTIONS.get(profile, {})
+    )
+    return pdf_buffer.getvalue()
+
+
+def _render_sampled(html_content: str, profile: str, sample_to: str) -> bytes:
+    """_render under the sampling profiler, writing folded stacks to `sample_to`."""
+    from tracing import sampled
+
+    with sampled(sample_to):
+        return _render(html_content, profile)
+
+
+class PdfRenderer:
+    """
+    Pool of warm WeasyPrint worker processes.
+
+    Each render gets `timeout` seconds; a stuck or crashed pool is torn down
+    and replaced so one bad document can't wedge later renders.
+    """
+
+    def __init__(
+        self,
+        workers: int = PDF_WORKERS,
+        timeout: int = PDF_TIMEOUT,
+        max_memory_mb: int = PDF_MAX_MEMORY_MB,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the server process runs threads and a browser event loop
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.max_memory_mb,),
+        )
+
+    def warm(self) -> None:
+        """Start every worker now rather than on the first render."""
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+        print(f"✓ PDF renderer started ({self.workers} workers)")
+
+    def _restart(self, broken: ProcessPoolExecutor, reason: str) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # Another thread already replaced it
+            print(f"Restarting PDF workers: {reason}")
+            self._executor = self._new_executor()
+        # ProcessPoolExecutor has no public way to kill a running worker before 3.14
+        for process in list((getattr(broken, "_processes", None) or {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, html_content: str, profile: str = PDF_PROFILE, sample_to: str | None = None) -> bytes:
+        """
+        Render HTML to PDF bytes, blocking the calling thread until done.
+        With `sample_to`, the worker profiles the render into that file.
+        """
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"Unknown render profile: {profile}")
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                if sample_to:
+                    future = executor.submit(_render_sampled, html_content, profile, sample_to)
+                else:
+                    future = executor.submit(_render, html_content, profile)
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                self._restart(executor, f"render exceeded {self.timeout}s")
+                raise Exception(f"PDF rendering timed out after {self.timeout}s")
+            except BrokenProcessPool:
+                # A worker died (e.g. hit the memory cap); retry once on a fresh pool
+                self._restart(executor, "worker process died")
+                if attempt:
+                    raise Exception("PDF worker process died (memory cap or crash)")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_renderer: PdfRenderer | None = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> PdfRenderer:
+    """Return the shared renderer, creating it on first use."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer()
+    return _renderer
+
+
+def start_renderer() -> None:
+    """Create and warm the shared renderer (app startup)."""
+    get_renderer().warm()
+
+
+def stop_renderer() -> None:
+    """Shut the shared renderer down (app shutdown)."""
+    global _renderer
+    with _renderer_lock:
+        renderer, _renderer = _renderer, None
+    if renderer is not None:
+        renderer.close()
+
+
+def render_pdf(html_content: str, profile: str = PDF_PROFILE, sample_to: str | None = None) -> bytes:
+    """
+    Convert article HTML to PDF bytes (reMarkable compatible).
+
+    Args:
+        html_content: The formatted HTML content (a full document or a fragment)
+        profile: Name of the stylesheet profile in RENDER_PROFILES
+        sample_to: Optional path for a sampling profile of the render (debug traces)
+
+    Returns:
+        The rendered PDF
+    """
+    try:
+        print("Converting article to PDF...")
+        started = time.perf_counter()
+        pdf_data = get_renderer().render(html_content, profile, sample_to)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"PDF generated ({len(pdf_data)} bytes, profile {profile}, {elapsed_ms:.0f}ms)")
+    except Exception as e:
+        print(f"Failed to convert HTML to PDF: {e}")
+        raise PdfRenderError(f"PDF conversion failed: {e}")
+
+    return pdf_data
@@ -0,0 +1,58 @@
+"""
+Process-wide async services (browser pool, HTTP tier, image fetcher).
+The server starts them on its own event loop; job worker threads call into them.
+"""
+
+import asyncio
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SharedService(Generic[T]):
+    """
+    The one running instance of a service with async start() and close().
+
+    The server calls start() and stop() from its lifespan. get() returns the
+    running instance; outside the server (scripts, tests) it first starts one
+    on a daemon thread with its own event loop, which is stopped again if
+    the start fails.
+    """
+
+    def __init__(self, name: str, factory: Callable[..., T]):
+        self.name = name
+        self._factory = factory
+        self._instance: T | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> T | None:
+        """The running instance, or None; never starts one."""
+        return self._instance
+
+    async def start(self, *args) -> T:
+        """Start an instance on the current event loop; `args` go to the factory."""
+        instance = self._factory(*args)
+        await instance.start()
+        self._instance = instance
+        return instance
+
+    async def stop(self) -> None:
+        """Close the running instance, if any."""
+        if self._instance is not None:
+            instance, self._instance = self._instance, None
+            await instance.close()
+
+    def get(self, *args) -> T:
+        """Return the running instance, starting one on a background loop if needed."""
+        with self._lock:
+            if self._instance is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                try:
+                    asyncio.run_coroutine_threadsafe(self.start(*args), loop).result()
+                except BaseException:
+                    loop.call_soon_threadsafe(loop.stop)
+                    raise
+        return self._instance
@@ -0,0 +1,27 @@
+"""
+Tests for the benchmark's regression check and corpus.
+"""
+
+from bench_extract import load_corpus, pipeline, regressions
+
+
+def test_regressions_respect_threshold_and_noise_floor():
+    baseline = {"page": {"readability": {"ms": 40.0, "peak_kb": 200, "bytes": 1000}}}
+    within = {"page": {"readability": {"ms": 49.0, "peak_kb": 240, "bytes": 1000}}}
+    assert regressions(within, baseline, 0.25) == []
+
+    slower = {"page": {"readability": {"ms": 60.0, "peak_kb": 200, "bytes": 1300}}}
+    problems = regressions(slower, baseline, 0.25)
+    assert [problem.split(":")[1].split()[0] for problem in problems] == ["ms", "bytes"]
+
+    # Tiny stages can double without tripping the check
+    tiny = {"page": {"parse": {"ms": 0.5, "peak_kb": 1, "bytes": 0}}}
+    assert regressions({"page": {"parse": {"ms": 1.2, "peak_kb": 2, "bytes": 0}}}, tiny, 0.25) == []
+
+
+def test_corpus_pages_extract():
+    _, pages = load_corpus()
+    assert set(pages) == {"short_tweet", "long_thread", "longform_article"}
+    for raw_html in pages.values():
+        outputs = [run() for _, run in pipeline(raw_html, None)]
+        assert "<h1>" in outputs[-1] and "<p>" in outputs[-1]
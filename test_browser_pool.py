@@ -0,0 +1,103 @@
+"""
+Tests for context recycling in the browser pool and the memory check behind it.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool, _rss_mb, browser_rss_mb, process_tree_rss_mb
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+        self.pages = 0
+
+    async def add_cookies(self, cookies):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    async def new_page(self):
+        assert not self.closed
+        self.pages += 1
+        return FakePage()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    """Stands in for Chromium: hands out contexts and remembers them."""
+
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        self.contexts.append(FakeContext())
+        return self.contexts[-1]
+
+
+async def _open_pages(pool: BrowserPool, count: int) -> FakeBrowser:
+    """Warm a one-context pool on a fake browser and open `count` pages in turn."""
+    async def no_blocking(page):
+        pass
+
+    browser = FakeBrowser()
+    pool._browser = browser
+    pool._block_requests = no_blocking
+    pool._idle = asyncio.Queue()
+    pool._idle.put_nowait(await pool._new_context())
+    for _ in range(count):
+        async with pool.page():
+            pass
+    return browser
+
+
+def test_context_is_recycled_after_max_pages():
+    pool = BrowserPool(lambda: [], size=1, max_pages=3, max_rss_mb=0)
+    browser = asyncio.run(_open_pages(pool, 7))
+    assert [context.pages for context in browser.contexts] == [3, 3, 1]
+    assert [context.closed for context in browser.contexts] == [True, True, False]
+    assert pool.stats()["contexts"] == 1
+
+
+def test_context_is_recycled_when_browser_memory_is_high(monkeypatch):
+    readings = iter([100, 900, 100, 100, 2000])
+    monkeypatch.setattr(browser_pool, "browser_rss_mb", lambda: next(readings))
+    pool = BrowserPool(lambda: [], size=1, max_pages=100, max_rss_mb=512)
+    browser = asyncio.run(_open_pages(pool, 5))
+    assert [context.pages for context in browser.contexts] == [2, 3]
+    assert [context.closed for context in browser.contexts] == [True, True]
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="reads /proc")
+def test_browser_rss_counts_only_the_playwright_driver_tree():
+    sleeper = [sys.executable, "-c", "import time; time.sleep(30)"]
+    # A PDF worker stand-in, and a driver stand-in (matched by its "run-driver" argument)
+    worker = subprocess.Popen(sleeper)
+    driver = subprocess.Popen([*sleeper, "run-driver"])
+    try:
+        time.sleep(0.3)
+        assert browser_rss_mb() == pytest.approx(_rss_mb({driver.pid}), abs=1)
+        assert process_tree_rss_mb() >= _rss_mb({driver.pid, worker.pid}) - 1
+    finally:
+        worker.kill()
+        driver.kill()
+        worker.wait()
+        driver.wait()
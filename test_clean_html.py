@@ -0,0 +1,103 @@
+"""
+Equivalence tests for the paragraph dedup index and UI text matcher.
+Compares against the original straightforward implementations.
+"""
+
+import random
+import re
+
+from extractor import _ShingleIndex, _is_ui_text, clean_html
+
+
+def _reference_is_ui_text(text: str) -> bool:
+    ui_patterns = [
+        r"^follow$", r"^repost$", r"^like$", r"^share$", r"^reply$", r"^home$",
+        r"^explore$", r"^notifications$", r"^messages$", r"^bookmarks$",
+        r"^profile$", r"^more$", r"^post$", r"^\d+$", r"^\d+[KMB]?$",
+        r"^[A-Z][a-z]+ \d+$", r"^Show more$", r"^Show this thread$",
+    ]
+    text_lower = text.lower().strip()
+    return any(re.match(pattern, text_lower, re.IGNORECASE) for pattern in ui_patterns)
+
+
+def _reference_dedup(texts: list[str]) -> list[str]:
+    kept = []
+    seen_text = set()
+    for text in texts:
+        if text in seen_text or any(text in existing for existing in seen_text):
+            continue
+        seen_text.add(text)
+        kept.append(text)
+    return kept
+
+
+def _indexed_dedup(texts: list[str]) -> list[str]:
+    kept = []
+    index = _ShingleIndex()
+    for text in texts:
+        if text in index:
+            continue
+        index.add(text)
+        kept.append(text)
+    return kept
+
+
+def test_ui_text_matches_reference():
+    samples = [
+        "Follow", "REPOST", "like", " Share ", "Reply", "Home", "Explore",
+        "Notifications", "Messages", "Bookmarks", "Profile", "More", "Post",
+        "42", "5K", "10m", "3b", "12KB", "Jan 15", "january 2024", "Show more",
+        "show this thread", "Show this thread!", "Follow me", "", "  ", "1.5K",
+        "Jan 15\n", "post post", "A 1",
+    ]
+    for text in samples:
+        assert _is_ui_text(text) == _reference_is_ui_text(text), text
+
+
+def test_dedup_matches_reference_on_random_fragments():
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta", "thread", "tweet", "x", "the", "a"]
+    for _ in range(50):
+        paragraphs = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(1, 30)))
+            for _ in range(rng.randint(1, 40))
+        ]
+        # Mix in fragments and exact repeats of earlier paragraphs
+        texts = []
+        for paragraph in paragraphs:
+            texts.append(paragraph)
+            if rng.random() < 0.5:
+                start = rng.randint(0, len(paragraph))
+                texts.append(paragraph[start:start + rng.randint(0, 60)])
+            if rng.random() < 0.2:
+                texts.append(rng.choice(texts))
+        rng.shuffle(texts)
+        assert _indexed_dedup(texts) == _reference_dedup(texts)
+
+
+def test_clean_html_drops_split_fragments():
+    long_text = "This is a long tweet with some bold words in the middle of it"
+    html = (
+        f"<div><p>{long_text}</p>"
+        "<p>some bold words in the middle</p>"
+        f"<p>{long_text}</p>"
+        "<p>A different paragraph that stays in the output</p>"
+        "<p>Show this thread</p></div>"
+    )
+    formatted = clean_html(html, "Someone on X: \"Title\" / X")
+    assert formatted.count("<p>") == 2
+    assert "some bold words in the middle</p>" not in formatted
+
+
+def test_clean_html_keeps_tweet_photos_in_order():
+    photo = "https://pbs.twimg.com/media/abc?format=jpg&amp;name=small"
+    html = (
+        "<div><p>A paragraph before the photo, long enough to keep</p>"
+        f'<div><img src="{photo}"><img src="{photo}"></div>'
+        '<img src="https://pbs.twimg.com/profile_images/1/avatar.jpg">'
+        "<p>A paragraph after the photo, also long enough</p></div>"
+    )
+    formatted = clean_html(html, "Title")
+    assert formatted.count("<figure>") == 1
+    assert "profile_images" not in formatted
+    assert formatted.index("before the photo") < formatted.index("<figure>") < formatted.index("after the photo")
@@ -0,0 +1,93 @@
+"""
+Tests for TieredCache: TTL expiry, LRU order in memory and on disk, reloading from disk and size-based eviction.
+"""
+
+import os
+import random
+import time
+
+import content_cache
+from content_cache import TieredCache
+
+
+class Clock:
+    """Stand-in for time.time that only moves when told to."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def noise(size: int) -> str:
+    """Incompressible text, so gzip leaves the file about `size` bytes."""
+    return "".join(random.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=size))
+
+
+def test_entries_expire_after_ttl_in_memory_and_on_disk(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(content_cache.time, "time", clock)
+    cache = TieredCache("pages", directory=str(tmp_path), ttl=60)
+    cache.put("a", {"html": "x"})
+
+    clock.now += 59
+    assert cache.get("a") == {"html": "x"}
+    clock.now += 1
+    assert cache.get("a") is None
+    assert os.listdir(cache.path) == []  # The expired file was removed on read
+
+
+def test_reload_from_disk_in_a_new_instance(tmp_path):
+    TieredCache("pages", directory=str(tmp_path)).put("a", {"html": "x"})
+    reopened = TieredCache("pages", directory=str(tmp_path))
+    assert reopened.get("a") == {"html": "x"}
+    assert reopened._disk_bytes == os.path.getsize(reopened._file("a"))
+
+
+def test_disk_key_must_match(tmp_path):
+    cache = TieredCache("pages", directory=str(tmp_path), memory_items=1)
+    cache.put("a", {"html": "x"})
+    # Another key's file under this key's name (e.g. a hash collision) is not served
+    os.replace(cache._file("a"), cache._file("b"))
+    cache.put("c", {"html": "y"})  # Push "a" out of memory too
+    assert cache.get("b") is None
+
+
+def test_memory_keeps_most_recently_used(tmp_path):
+    cache = TieredCache("pages", directory=str(tmp_path), memory_items=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", {"n": 3})
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") == {"n": 2}  # Still on disk
+
+
+def test_evicts_oldest_files_to_below_90_percent(tmp_path):
+    cache = TieredCache("pages", directory=str(tmp_path))
+    cache.max_bytes = 10_000
+    for n in range(12):
+        cache.put(str(n), {"html": noise(1000)})
+        # Distinct mtimes, so "oldest" is well defined
+        os.utime(cache._file(str(n)), (n, n))
+
+    on_disk = sum(entry.stat().st_size for entry in os.scandir(cache.path))
+    assert on_disk == cache._disk_bytes <= cache.max_bytes * 0.9
+    assert not os.path.exists(cache._file("0"))
+    assert os.path.exists(cache._file("11"))
+
+
+def test_disk_eviction_spares_recently_read_entries(tmp_path):
+    cache = TieredCache("pages", directory=str(tmp_path), memory_items=1)
+    cache.max_bytes = 10_000
+    for n in range(9):
+        cache.put(str(n), {"html": noise(1000)})
+        os.utime(cache._file(str(n)), (n, n))
+
+    assert cache.get("0") is not None  # Written first, but read last
+    for n in range(9, 12):
+        cache.put(str(n), {"html": noise(1000)})
+
+    assert os.path.exists(cache._file("0"))
+    assert not os.path.exists(cache._file("1"))
@@ -0,0 +1,98 @@
+"""
+Tests for DedupStore: atomic reservations, the one-time text log import,
+stale reservations, release and the export command.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import dedup
+from dedup import DedupStore
+
+URL = "https://x.com/dan/status/1"
+
+
+def test_only_one_concurrent_caller_gets_the_reservation(tmp_path):
+    path = str(tmp_path / "sent.db")
+    DedupStore(path, legacy_log=str(tmp_path / "none.txt"))
+    # Separate connections, as in separate uvicorn workers
+    stores = [DedupStore(path, legacy_log=str(tmp_path / "none.txt")) for _ in range(8)]
+    barrier = threading.Barrier(len(stores))
+    results = []
+
+    def claim(store):
+        barrier.wait()
+        results.append(store.reserve(URL))
+
+    threads = [threading.Thread(target=claim, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 7 + [True]
+
+
+def test_legacy_log_is_imported_once(tmp_path):
+    path = str(tmp_path / "sent.db")
+    log = tmp_path / "sent_articles.txt"
+    log.write_text(f"{URL}\n\n{URL}\nhttps://x.com/dan/status/2\n")
+
+    store = DedupStore(path, legacy_log=str(log))
+    assert store.was_sent(URL)
+    assert store.export() == sorted([URL, "https://x.com/dan/status/2"])
+
+    # Lines added after the import are not picked up on the next start
+    log.write_text("https://x.com/dan/status/3\n")
+    reopened = DedupStore(path, legacy_log=str(log))
+    assert not reopened.was_sent("https://x.com/dan/status/3")
+    assert len(reopened.export()) == 2
+
+
+def test_stale_reservation_can_be_taken_over(tmp_path, monkeypatch):
+    store = DedupStore(str(tmp_path / "sent.db"), legacy_log=str(tmp_path / "none.txt"))
+    now = time.time()
+    monkeypatch.setattr(dedup.time, "time", lambda: now)
+    assert store.reserve(URL)
+    assert not store.reserve(URL)
+
+    monkeypatch.setattr(dedup.time, "time", lambda: now + dedup.RESERVATION_TTL + 1)
+    assert store.reserve(URL)
+    # A sent URL never expires
+    store.mark_sent(URL)
+    monkeypatch.setattr(dedup.time, "time", lambda: now + 10 * dedup.RESERVATION_TTL)
+    assert not store.reserve(URL)
+
+
+def test_release_frees_only_pending_reservations(tmp_path):
+    store = DedupStore(str(tmp_path / "sent.db"), legacy_log=str(tmp_path / "none.txt"))
+    assert store.reserve(URL)
+    store.release(URL)
+    assert store.reserve(URL)
+
+    store.mark_sent(URL)
+    store.release(URL)
+    assert store.was_sent(URL)
+    assert store.reserve_many([URL, "https://x.com/dan/status/2"]) == {"https://x.com/dan/status/2"}
+
+
+def test_export_command(tmp_path):
+    path = str(tmp_path / "sent.db")
+    store = DedupStore(path, legacy_log=str(tmp_path / "none.txt"))
+    store.mark_sent("https://x.com/dan/status/2")
+    store.mark_sent(URL)
+    store.reserve("https://x.com/dan/status/3")  # Pending, so not exported
+
+    script = os.path.join(os.path.dirname(os.path.abspath(dedup.__file__)), "dedup.py")
+    result = subprocess.run(
+        [sys.executable, script, "export"],
+        cwd=tmp_path,
+        env={**os.environ, "SENT_DB": path},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.splitlines() == ["https://x.com/dan/status/2", URL]
@@ -0,0 +1,214 @@
+"""
+Tests for DropboxClient against a local fake Dropbox server.
+"""
+
+import io
+import threading
+import time
+
+import pytest
+
+import dropbox_uploader
+from dropbox_uploader import DropboxClient, DropboxError
+from fake_servers import FakeDropbox
+
+
+@pytest.fixture
+def fake():
+    server = FakeDropbox()
+    server.start()
+    yield server
+    server.close()
+
+
+def make_client(fake: FakeDropbox, **options) -> DropboxClient:
+    return DropboxClient(
+        app_key="key",
+        app_secret="secret",
+        refresh_token="refresh",
+        api_url=fake.url,
+        content_url=fake.url,
+        backoff=0,
+        **options,
+    )
+
+
+def test_upload_reuses_one_connection_and_token(fake):
+    client = make_client(fake)
+    for i in range(5):
+        result = client.upload(f"/reMarkable/{i}.pdf", b"%PDF")
+        assert result["path_display"] == f"/reMarkable/{i}.pdf"
+
+    assert fake.token_calls == 1
+    assert len(fake.client_ports) == 1
+
+
+def test_token_refreshed_before_expiry_without_401(fake):
+    fake.expires_in = 10  # Already inside the refresh margin
+    client = make_client(fake)
+    client.upload("/a.pdf", b"%PDF")
+    client.upload("/b.pdf", b"%PDF")
+    # Each upload refreshed up front instead of failing with 401 first
+    assert fake.token_calls == 2
+
+
+def test_concurrent_uploads_refresh_once(fake):
+    client = make_client(fake)
+    errors = []
+
+    def upload(i):
+        try:
+            client.upload(f"/{i}.pdf", b"%PDF")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert fake.token_calls == 1
+
+
+def test_revoked_token_refreshes_and_retries(fake):
+    client = make_client(fake)
+    client.upload("/a.pdf", b"%PDF")
+    fake.valid_tokens = set()  # Server-side revocation
+
+    client.upload("/b.pdf", b"%PDF")
+    assert fake.token_calls == 2
+
+
+def test_transient_errors_are_retried(fake):
+    client = make_client(fake)
+    fake.upload_failures = [503, 429]
+    assert client.upload("/a.pdf", b"%PDF")["path_display"] == "/a.pdf"
+
+
+def test_retry_after_is_waited_in_full(fake):
+    client = make_client(fake)
+    fake.upload_failures = [429]
+    fake.retry_after = "1"
+    started = time.monotonic()
+    client.upload("/a.pdf", b"%PDF")
+    assert time.monotonic() - started >= 1
+
+
+def test_retry_after_holds_other_threads(fake):
+    client = make_client(fake)
+    fake.upload_failures = [429]
+    fake.retry_after = "1"
+    started = time.monotonic()
+    first = threading.Thread(target=client.upload, args=("/a.pdf", b"%PDF"))
+    first.start()
+    time.sleep(0.2)  # The 429 has arrived; this upload was never rate limited itself
+    client.upload("/b.pdf", b"%PDF")
+    assert time.monotonic() - started >= 1
+    first.join()
+
+
+def test_persistent_errors_raise(fake):
+    client = make_client(fake)
+    fake.upload_failures = [500] * 5
+    with pytest.raises(DropboxError) as excinfo:
+        client.upload("/a.pdf", b"%PDF")
+    assert excinfo.value.status_code == 500
+
+
+def test_zero_retries_still_makes_one_attempt(fake):
+    client = make_client(fake, retries=0)
+    assert client.upload("/a.pdf", b"%PDF")["path_display"] == "/a.pdf"
+    fake.upload_failures = [503]
+    with pytest.raises(DropboxError) as excinfo:
+        client.upload("/b.pdf", b"%PDF")
+    assert excinfo.value.status_code == 503
+
+
+def test_large_upload_is_streamed_in_chunks(fake):
+    client = make_client(fake, session_threshold=10, chunk_size=4)
+    data = b"%PDF-0123456789abcdef!"
+    result = client.upload("/big.pdf", data)
+
+    assert result["path_display"] == "/big.pdf"
+    assert fake.files["/big.pdf"] == data
+    assert len(fake.sessions) == 1
+
+
+def test_upload_from_file_streams_large_and_sends_small_whole(fake, tmp_path):
+    client = make_client(fake, session_threshold=10, chunk_size=4)
+    big, small = tmp_path / "big.pdf", tmp_path / "small.pdf"
+    big.write_bytes(b"%PDF-0123456789abcdef!")
+    small.write_bytes(b"%PDF")
+
+    with open(small, "rb") as f:
+        assert client.upload("/small.pdf", f)["size"] == 4
+    assert fake.sessions == {}
+    with open(big, "rb") as f:
+        client.upload("/big.pdf", f)
+    assert fake.files["/big.pdf"] == big.read_bytes() and len(fake.sessions) == 1
+
+
+def test_upload_session_resumes_from_server_offset(fake):
+    client = make_client(fake, session_threshold=10, chunk_size=4)
+    # The server stores the chunk but the reply is lost; the retry hits incorrect_offset
+    fake.lost_appends = 1
+    data = b"0123456789abcdefghij"
+    client.upload("/resumed.pdf", data)
+    assert fake.files["/resumed.pdf"] == data
+
+
+def test_interrupted_upload_resumes_its_recorded_session(fake):
+    client = make_client(fake, session_threshold=10, chunk_size=4)
+    data = b"0123456789abcdefghij"
+    recorded = []
+
+    def record(session):
+        recorded.append(session)
+        if len(recorded) == 2:
+            raise ConnectionError("worker stopped")
+
+    with pytest.raises(ConnectionError):
+        client.upload("/resumed.pdf", data, on_session=record)
+    assert recorded[-1]["offset"] == 8
+
+    client.upload("/resumed.pdf", data, session=recorded[-1], on_session=recorded.append)
+    assert fake.files["/resumed.pdf"] == data
+    assert len(fake.sessions) == 1  # Picked up where it stopped, not sent again
+
+    fake.sessions.clear()  # Expired
+    with pytest.raises(DropboxError) as excinfo:
+        client.upload("/gone.pdf", data, session={"session_id": "session-0", "offset": 8})
+    assert excinfo.value.status_code == 409
+
+
+def test_finish_batch_commits_closed_sessions(fake):
+    client = make_client(fake, chunk_size=4)
+    files = {f"/reMarkable/{n}.pdf": f"%PDF-{n}-batched".encode() for n in range(3)}
+    sessions = [
+        (client.upload_session(io.BytesIO(data), len(data), close=True), path) for path, data in files.items()
+    ]
+    assert all(session["closed"] for session, _ in sessions)
+    open_session = client.upload_session(io.BytesIO(b"%PDF-open"), 9)
+
+    results = client.finish_batch(sessions + [(open_session, "/reMarkable/open.pdf")])
+    assert [result.get("path_display") for result in results[:3]] == list(files)
+    assert fake.files == files
+    assert "error" in results[3]  # Only closed sessions can be committed in a batch
+
+
+def test_upload_files_commits_every_file_together(fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(dropbox_uploader, "_client", make_client(fake, chunk_size=4))
+    monkeypatch.setenv("DROPBOX_UPLOAD_PATH", "/reMarkable")
+    paths = []
+    for name in ("One", "Two"):
+        path = tmp_path / f"{name}.pdf"
+        path.write_bytes(f"%PDF-{name}".encode())
+        paths.append(path)
+
+    with open(paths[0], "rb") as one, open(paths[1], "rb") as two:
+        results = dropbox_uploader.upload_files([("One", one, ".pdf", None), ("Two", two, ".pdf", None)])
+    assert results == ["/reMarkable/One.pdf", "/reMarkable/Two.pdf"]
+    assert fake.files == {"/reMarkable/One.pdf": b"%PDF-One", "/reMarkable/Two.pdf": b"%PDF-Two"}
+    assert fake.stats["ok"] == len(fake.sessions) * 2 + 1  # Chunks, then one commit for both
@@ -0,0 +1,54 @@
+"""
+Tests for EPUB output.
+"""
+
+import base64
+import io
+import zipfile
+
+from lxml import etree
+
+from epub_builder import build_epub
+from extractor import _format_html
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAACklEQVR4nGNgAAAAAgABSK+kcQAAAABJRU5ErkJggg=="
+)
+
+
+def test_epub_structure_and_xhtml():
+    html = _format_html(
+        [
+            "Fish & chips <3, naïve café",
+            ("h2", "Section"),
+            ("img", "data:image/png;base64," + base64.b64encode(PNG).decode()),
+            ("img", "https://pbs.twimg.com/media/not-inlined.jpg"),
+        ],
+        "A <b>title</b> / X",
+    )
+    epub = zipfile.ZipFile(io.BytesIO(build_epub("A <b>title</b>", html, "https://x.com/a/status/1")))
+
+    first = epub.infolist()[0]
+    assert first.filename == "mimetype" and first.compress_type == zipfile.ZIP_STORED
+    assert epub.read("mimetype") == b"application/epub+zip"
+
+    package = etree.fromstring(epub.read("OEBPS/content.opf"))
+    hrefs = package.xpath("//opf:item/@href", namespaces={"opf": "http://www.idpf.org/2007/opf"})
+    assert "images/0.png" in hrefs and "nav.xhtml" in hrefs
+
+    article = etree.fromstring(epub.read("OEBPS/article.xhtml"))
+    text = "".join(article.itertext())
+    assert "Fish & chips <3, naïve café" in text
+    images = article.xpath("//x:img/@src", namespaces={"x": "http://www.w3.org/1999/xhtml"})
+    assert images == ["images/0.png"]  # Remote images aren't fetched here
+    assert epub.read("OEBPS/images/0.png") == PNG
+
+
+def test_identifier_is_stable_per_url():
+    html = _format_html(["Some paragraph text"], "Title")
+    first = zipfile.ZipFile(io.BytesIO(build_epub("Title", html, "https://x.com/a/status/1")))
+    second = zipfile.ZipFile(io.BytesIO(build_epub("Title", html, "https://x.com/a/status/1")))
+    identifier = b"<dc:identifier"
+    assert [line for line in first.read("OEBPS/content.opf").splitlines() if identifier in line] == [
+        line for line in second.read("OEBPS/content.opf").splitlines() if identifier in line
+    ]
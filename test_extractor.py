@@ -0,0 +1,48 @@
+"""
+Tests for the page readiness wait and which fetched pages get cached.
+"""
+
+import asyncio
+
+from playwright.async_api import Error as PlaywrightError
+
+import extractor
+
+
+class NavigatingPage:
+    """Page stand-in whose first evaluate hits a client-side navigation."""
+
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.calls = 0
+
+    async def evaluate(self, script, selector):
+        self.calls += 1
+        if self.calls == 1:
+            raise PlaywrightError("Execution context was destroyed, most likely because of a navigation")
+        return self.snapshots.pop(0) if len(self.snapshots) > 1 else self.snapshots[0]
+
+
+def test_readiness_wait_survives_a_destroyed_context(monkeypatch):
+    monkeypatch.setattr(extractor, "READY_POLL_MS", 1)
+    monkeypatch.setattr(extractor, "READY_QUIET_MS", 20)
+    page = NavigatingPage([[0, 0, False], [3, 120, False]])
+    assert asyncio.run(extractor._wait_until_ready(page)) == "stable"
+    assert page.calls > 2
+
+
+def test_only_settled_browser_pages_are_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(extractor, "page_cache", extractor.TieredCache("pages", directory=str(tmp_path)))
+    monkeypatch.setattr(extractor, "fetch_light", lambda url: None)
+    ready = {}
+    monkeypatch.setattr(
+        extractor,
+        "fetch_page",
+        lambda url: {"html": "<p>x</p>", "title": "t", "thread": None, "ready": ready[url]},
+    )
+    for n, condition in enumerate(["stable", "graphql", "timeout", "no_content"]):
+        url = f"https://x.com/dan/status/{n}"
+        ready[url] = condition
+        extractor.load_page(url)
+        cached = extractor.page_cache.get(url) is not None
+        assert cached == (condition in ("stable", "graphql")), condition
@@ -0,0 +1,172 @@
+"""
+Tests for the browser-free HTTP tier against a local stand-in server.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import extractor
+from http_sources import HttpTier, OEmbedSource, Source, SyndicationSource
+
+TWEET = {
+    "__typename": "Tweet",
+    "id_str": "100",
+    "text": "@dan A single tweet &amp; a link https://t.co/abc https://t.co/pic",
+    "display_text_range": [5, 50],
+    "entities": {
+        "urls": [{"url": "https://t.co/abc", "expanded_url": "https://example.com"}],
+        "media": [{"url": "https://t.co/pic"}],
+    },
+    "user": {"id_str": "1", "name": "Dan", "screen_name": "dan"},
+}
+
+
+class FakeTwitter:
+    """Serves /tweet-result and /oembed from dicts keyed by tweet id."""
+
+    def __init__(self):
+        self.tweets = {"100": TWEET}
+        self.oembed = {}
+        self.syndication_status = 200
+        self.requests = []
+        self.client_ports = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                fake.requests.append(parsed.path)
+                fake.client_ports.add(self.client_address[1])
+
+                if parsed.path == "/tweet-result" and fake.syndication_status != 200:
+                    payload, status = {}, fake.syndication_status
+                elif parsed.path == "/tweet-result":
+                    payload = fake.tweets.get(query["id"])
+                    status = 200 if payload else 404
+                elif parsed.path == "/oembed":
+                    payload = fake.oembed.get(query["url"].rsplit("/", 1)[1])
+                    status = 200 if payload else 404
+                else:
+                    payload, status = {}, 404
+
+                body = json.dumps(payload or {}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake():
+    server = FakeTwitter()
+    yield server
+    server.close()
+
+
+def fetch_all(fake, tweet_ids, sources=("syndication",)):
+    """Fetch tweets through one HttpTier and return the results."""
+    adapters = {"syndication": SyndicationSource(fake.url), "oembed": OEmbedSource(fake.url)}
+
+    async def run():
+        tier = HttpTier(sources=[adapters[name] for name in sources])
+        await tier.start()
+        try:
+            return [
+                await tier.fetch(f"https://x.com/dan/status/{tweet_id}", tweet_id)
+                for tweet_id in tweet_ids
+            ]
+        finally:
+            await tier.close()
+
+    return asyncio.run(run())
+
+
+def test_single_tweet_served_over_one_connection(fake):
+    results = fetch_all(fake, ["100", "100", "100"])
+    source, article = results[0]
+
+    assert source == "syndication"
+    assert article["blocks"] == [("p", "A single tweet & a link https://example.com")]
+    assert len(fake.client_ports) == 1
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"self_thread": {"id_str": "100"}},
+        {"note_tweet": {"id": "x"}},
+        {"article": {"title": "Longform"}},
+        {"in_reply_to_user_id_str": "1"},
+    ],
+)
+def test_incomplete_tweets_escalate(fake, extra):
+    fake.tweets["100"] = {**TWEET, **extra}
+    assert fetch_all(fake, ["100"]) == [None]
+
+
+def test_failed_source_falls_through_to_next(fake):
+    fake.syndication_status = 500
+    fake.oembed["100"] = {
+        "author_name": "Dan",
+        "html": '<blockquote><p>Hello from oEmbed <a href="https://t.co/p">pic.twitter.com/p</a></p>'
+                "&mdash; Dan (@dan)</blockquote>",
+    }
+    [(source, article)] = fetch_all(fake, ["100"], sources=("syndication", "oembed"))
+    assert source == "oembed"
+    assert article["blocks"] == [("p", "Hello from oEmbed")]
+
+
+def test_load_page_escalates_to_browser(fake, monkeypatch, tmp_path):
+    monkeypatch.setattr(extractor, "page_cache", extractor.TieredCache("pages", directory=str(tmp_path)))
+    tier = HttpTier(sources=[SyndicationSource(fake.url)])
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(tier.start(), loop).result()
+    monkeypatch.setattr(extractor, "get_tier", lambda cookies: tier)
+    browser_calls = []
+    monkeypatch.setattr(
+        extractor,
+        "fetch_page",
+        lambda url: browser_calls.append(url) or {"html": "<p>x</p>", "title": "t", "thread": None},
+    )
+    extractor.tier_stats.clear()
+
+    page = extractor.load_page("https://x.com/dan/status/100")
+    assert page["source"] == "syndication" and not browser_calls
+    article = extractor.build_article(page, "https://x.com/dan/status/100")
+    assert "<p>A single tweet &amp; a link https://example.com</p>" in article["html"]
+
+    page = extractor.load_page("https://x.com/dan/status/404")
+    assert page["source"] == "browser" and browser_calls == ["https://x.com/dan/status/404"]
+    assert extractor.tier_stats == {"syndication": 1, "browser": 1}
+
+    asyncio.run_coroutine_threadsafe(tier.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_source_without_fetch_cannot_be_created():
+    class Incomplete(Source):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete("https://example.com")
@@ -0,0 +1,181 @@
+"""
+Tests for JobQueue stage limits, batch submission and job ownership across processes.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from dedup import DedupStore
+from jobs import JobQueue, QueueFullError
+
+
+class StageTracker:
+    """Handler that sleeps in each stage and records peak concurrency per stage."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, job, stage):
+        for name in ("fetch", "render", "upload"):
+            with stage(name):
+                with self.lock:
+                    self.active[name] = self.active.get(name, 0) + 1
+                    self.peak[name] = max(self.peak.get(name, 0), self.active[name])
+                time.sleep(self.delay)
+                with self.lock:
+                    self.active[name] -= 1
+        return {"title": job["url"]}
+
+
+def wait_for(queue, jobs, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(queue.get(job["id"])["status"] == "done" for job in jobs):
+            return
+        time.sleep(0.02)
+    raise AssertionError("jobs did not finish")
+
+
+def test_stage_limits_bound_concurrency_and_overlap(tmp_path):
+    tracker = StageTracker()
+    limits = {"fetch": 2, "render": 1, "upload": 3}
+    queue = JobQueue(tracker, path=str(tmp_path / "jobs.db"), workers=6, limits=limits)
+    queue.start()
+    try:
+        jobs = queue.submit_many([(f"https://x.com/a/status/{i}", str(i)) for i in range(8)])
+        wait_for(queue, jobs)
+    finally:
+        queue.stop()
+
+    for name, limit in limits.items():
+        assert tracker.peak[name] <= limit
+    # Render is the bottleneck: other stages ran alongside it rather than in lockstep
+    assert tracker.peak["fetch"] == 2
+
+
+def test_find_active_many_returns_running_jobs(tmp_path):
+    queue = JobQueue(lambda job, stage: {}, path=str(tmp_path / "jobs.db"))
+    jobs = queue.submit_many([("https://x.com/a/status/1", "a"), ("https://x.com/b/status/2", "b")])
+
+    active = queue.find_active_many(["a", "b", "c"])
+    assert {key: job["id"] for key, job in active.items()} == {"a": jobs[0]["id"], "b": jobs[1]["id"]}
+
+
+def test_reserve_many_skips_sent_and_pending(tmp_path):
+    store = DedupStore(path=str(tmp_path / "sent.db"), legacy_log=str(tmp_path / "none.txt"))
+    store.mark_sent("sent")
+    store.reserve("pending")
+
+    assert store.reserve_many(["sent", "pending", "new-1", "new-2"]) == {"new-1", "new-2"}
+    assert not store.reserve("new-1")
+
+
+def test_on_stage_reports_duration_and_error(tmp_path):
+    observed = []
+
+    def handler(job, stage):
+        with stage("fetch"):
+            pass
+        with stage("render"):
+            raise ValueError("bad html")
+
+    queue = JobQueue(
+        handler,
+        path=str(tmp_path / "jobs.db"),
+        workers=1,
+        on_stage=lambda name, seconds, error: observed.append((name, type(error).__name__)),
+    )
+    queue.start()
+    try:
+        job = queue.submit("https://x.com/a/status/1")
+        deadline = time.time() + 5
+        while queue.get(job["id"])["status"] != "failed" and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        queue.stop()
+
+    assert observed == [("fetch", "NoneType"), ("render", "ValueError")]
+
+
+def test_full_queue_rejects_whole_submission(tmp_path):
+    queue = JobQueue(lambda job, stage: {}, path=str(tmp_path / "jobs.db"), workers=2, max_pending=3)
+    queue.submit_many([(f"https://x.com/a/status/{i}", str(i)) for i in range(2)])
+
+    with pytest.raises(QueueFullError) as excinfo:
+        queue.submit_many([(f"https://x.com/b/status/{i}", f"b{i}") for i in range(2)])
+    assert excinfo.value.retry_after >= 1
+    assert queue.pending() == 2
+    assert queue.find_active("b0") is None
+
+    queue.submit("https://x.com/c/status/1", key="c")
+    assert queue.full()
+
+
+def test_queued_jobs_resume_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    tracker = StageTracker(delay=0)
+    # Submitted but never started, as if the server went down right after accepting them
+    jobs = JobQueue(tracker, path=path).submit_many([(f"https://x.com/a/status/{i}", str(i)) for i in range(3)])
+
+    restarted = JobQueue(tracker, path=path, workers=2)
+    restarted.start()
+    try:
+        wait_for(restarted, jobs)
+    finally:
+        restarted.stop()
+    assert [restarted.get(job["id"])["result"]["title"] for job in jobs] == [job["url"] for job in jobs]
+    assert set(restarted.get(jobs[0]["id"])["stages"]) == {"fetch", "render", "upload"}
+
+# Runs one job that never finishes, in another process sharing the database
+_HOLDER = """
+import sys, time
+from jobs import JobQueue
+
+def hold(job, stage):
+    print("running", flush=True)
+    time.sleep(60)
+
+queue = JobQueue(hold, path=sys.argv[1], workers=1)
+queue.start()
+queue.submit("https://x.com/a/status/1", key="a")
+time.sleep(60)
+"""
+
+
+def test_running_job_is_reclaimed_only_once_its_process_exits(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    holder = subprocess.Popen(
+        [sys.executable, "-c", _HOLDER, path],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "running"
+        tracker = StageTracker(delay=0)
+        neighbour = JobQueue(tracker, path=path, workers=1)
+        neighbour.start()
+        job = neighbour.find_active("a")
+        time.sleep(0.2)
+        assert neighbour.get(job["id"])["status"] == "running"
+        assert not tracker.peak
+        neighbour.stop()
+    finally:
+        holder.kill()
+        holder.wait()
+
+    restarted = JobQueue(tracker, path=path, workers=1)
+    restarted.start()
+    try:
+        wait_for(restarted, [job])
+    finally:
+        restarted.stop()
+    assert restarted.get(job["id"])["result"] == {"title": "https://x.com/a/status/1"}
@@ -0,0 +1,49 @@
+"""
+Tests for the load test stand-ins and report helpers.
+"""
+
+import httpx
+import pytest
+
+from dropbox_uploader import DropboxClient
+from fake_servers import FakeDropbox
+from loadtest import FakeX, percentile
+
+
+@pytest.fixture
+def dropbox():
+    fake = FakeDropbox(rate_401=0.1, rate_5xx=0.2, seed=1)
+    fake.start()
+    yield fake
+    fake.close()
+
+
+def test_percentile_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3
+    assert percentile([], 50) == 0
+
+
+def test_fake_x_serves_corpus_pages_by_status_id():
+    fake = FakeX(["<p>zero</p>", "<p>one</p>"])
+    fake.start()
+    try:
+        assert httpx.get(f"{fake.url}/someone/status/7").text == "<p>one</p>"
+        assert httpx.get(f"{fake.url}/tweet-result", params={"id": "7"}).status_code == 404
+        assert fake.requests["status"] == 1
+    finally:
+        fake.close()
+
+
+def test_client_rides_out_injected_errors(dropbox):
+    client = DropboxClient(
+        app_key="key", app_secret="secret", refresh_token="refresh",
+        api_url=dropbox.url, content_url=dropbox.url, retries=6, backoff=0,
+    )
+    for n in range(10):
+        assert client.upload(f"/loadtest/{n}.pdf", b"%PDF")["path_display"] == f"/loadtest/{n}.pdf"
+
+    assert dropbox.stats[401] and dropbox.stats[503]
+    assert dropbox.stats["token"] > 1  # Revoked tokens were refreshed
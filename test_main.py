@@ -0,0 +1,156 @@
+"""
+Tests for job admission: coalescing with running jobs, a full queue, and jobs whose upload is retried.
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from dedup import DedupStore
+from dropbox_uploader import DropboxError
+from jobs import JobQueue
+from upload_scheduler import UploadScheduler
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # No lifespan, so the workers never start and submitted jobs stay queued
+    queue = JobQueue(main.process_article, path=str(tmp_path / "jobs.db"), max_pending=1)
+    monkeypatch.setattr(main, "job_queue", queue)
+    monkeypatch.setattr(main, "sent_store", DedupStore(str(tmp_path / "sent.db"), legacy_log=str(tmp_path / "sent.txt")))
+    uploads = UploadScheduler(
+        str(tmp_path / "spool"),
+        backoff=0.01,
+        upload_batch=None,
+        on_uploaded=main.finish_upload,
+        on_abandoned=main.abandon_upload,
+    )
+    monkeypatch.setattr(main, "uploads", uploads)
+    return TestClient(main.app)
+
+
+def test_full_queue_still_returns_the_running_job_for_its_url(client):
+    first = client.post("/send", json={"url": "https://x.com/dan/status/1"})
+    assert first.status_code == 202
+
+    again = client.post("/send", json={"url": "https://x.com/dan/status/1?s=20"})
+    assert again.status_code == 202
+    assert again.json()["job_id"] == first.json()["job_id"]
+
+    other = client.post("/send", json={"url": "https://x.com/dan/status/2"})
+    assert other.status_code == 503 and "Retry-After" in other.headers
+
+    batch = client.post("/send/batch", json={"urls": ["https://x.com/dan/status/1", "https://x.com/dan/status/3"]})
+    assert batch.status_code == 202
+    assert [item["status"] for item in batch.json()["results"]] == ["in_progress", "busy"]
+
+    assert client.post("/send/batch", json={"urls": ["https://x.com/dan/status/3"]}).status_code == 503
+
+
+def test_batch_size_is_bounded_by_the_wait_queue(client, tmp_path, monkeypatch):
+    assert main.MAX_BATCH_SIZE == min(100, main.JOB_QUEUE_MAX)
+    queue = JobQueue(main.process_article, path=str(tmp_path / "idle.db"), max_pending=main.MAX_BATCH_SIZE)
+    monkeypatch.setattr(main, "job_queue", queue)
+    urls = [f"https://x.com/dan/status/{n}" for n in range(main.MAX_BATCH_SIZE + 1)]
+
+    assert client.post("/send/batch", json={"urls": urls}).status_code == 422
+    batch = client.post("/send/batch", json={"urls": urls[:-1]})
+    assert batch.json()["queued"] == main.MAX_BATCH_SIZE
+
+
+def test_duplicate_send_attaches_to_the_running_job(client, tmp_path, monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+    calls = []
+
+    def handler(job, stage):
+        calls.append(job["url"])
+        started.set()
+        finish.wait(5)
+        main.mark_as_sent(job["url"])
+        return {"title": "T"}
+
+    queue = JobQueue(handler, path=str(tmp_path / "running.db"), workers=2)
+    monkeypatch.setattr(main, "job_queue", queue)
+    queue.start()
+    try:
+        first = client.post("/send", json={"url": "https://x.com/dan/status/1"})
+        assert started.wait(5)
+        assert client.get(f"/jobs/{first.json()['job_id']}").json()["status"] == "running"
+
+        again = client.post("/send", json={"url": "https://twitter.com/dan/status/1/?s=20"})
+        assert again.status_code == 202
+        assert again.json()["job_id"] == first.json()["job_id"]
+        assert again.json()["message"] == "Article already in progress"
+
+        finish.set()
+        deadline = time.time() + 5
+        while queue.get(first.json()["job_id"])["status"] != "done" and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        finish.set()
+        queue.stop()
+
+    assert calls == ["https://x.com/dan/status/1"]
+    assert client.post("/send", json={"url": "https://x.com/dan/status/1"}).status_code == 409
+
+def uploads_that(*outcomes):
+    """upload_file stand-in: raises or returns each outcome in turn."""
+    outcomes = list(outcomes)
+
+    def upload(title, fileobj, extension, session=None, on_session=None):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return upload
+
+
+def spool_rendered(url):
+    output_format, profile = main.OUTPUT_FORMAT, main.PDF_PROFILE
+    key = main.spool_key(url, output_format, profile)
+    main.uploads.spool(key, b"%PDF", "T", f".{output_format}", url=url, format=output_format, profile=profile)
+
+
+def wait_for_status(job_id, status):
+    deadline = time.time() + 5
+    while main.job_queue.get(job_id)["status"] != status and time.time() < deadline:
+        time.sleep(0.02)
+    assert main.job_queue.get(job_id)["status"] == status
+
+
+def test_transient_upload_failure_ends_in_the_retry_loop(client, tmp_path, monkeypatch):
+    queue = JobQueue(main.process_article, path=str(tmp_path / "retry.db"), workers=2)
+    monkeypatch.setattr(main, "job_queue", queue)
+    uploaded, rejected = "https://x.com/dan/status/1", "https://x.com/dan/status/2"
+    # Rendered earlier, so the jobs go straight to the upload
+    spool_rendered(uploaded)
+    spool_rendered(rejected)
+    queue.start()
+    try:
+        main.uploads._upload = uploads_that(DropboxError("down", 503))
+        first = client.post("/send", json={"url": uploaded}).json()["job_id"]
+        wait_for_status(first, "upload_pending")
+        main.uploads._upload = uploads_that(DropboxError("down", 503))
+        second = client.post("/send", json={"url": rejected}).json()["job_id"]
+        wait_for_status(second, "upload_pending")
+
+        # A resend while the upload waits attaches to the job instead of rendering again
+        assert client.post("/send", json={"url": uploaded}).json()["job_id"] == first
+
+        main.uploads._upload = uploads_that("/reMarkable/T.pdf", DropboxError("bad path", 400))
+        time.sleep(0.05)
+        assert main.uploads.retry_due() == 1
+    finally:
+        queue.stop()
+
+    job = client.get(f"/jobs/{first}").json()
+    assert job["status"] == "done" and job["dropbox_path"] == "/reMarkable/T.pdf"
+    assert client.post("/send", json={"url": uploaded}).status_code == 409
+
+    assert client.get(f"/jobs/{second}").json()["status"] == "failed"
+    assert main.uploads.pending()[0]["retryable"] is False  # Parked for a resend
+    assert client.post("/send", json={"url": rejected}).status_code == 202
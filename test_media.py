@@ -0,0 +1,116 @@
+"""
+Tests for the e-ink image stage: processing, inlining, the per-document cap and the cache.
+"""
+
+import asyncio
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import media
+from content_cache import TieredCache
+from extractor import _format_html
+
+
+def jpeg(width, height):
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def photos(tmp_path, monkeypatch):
+    """
+    Local image server: /big.jpg and /small.jpg exist (/slow/... after 0.3s), anything else is 404.
+    Counts requests.
+    """
+    files = {"/big.jpg": jpeg(3000, 2000), "/small.jpg": jpeg(200, 100)}
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            hits.append(self.path)
+            path = self.path
+            if path.startswith("/slow/"):
+                time.sleep(0.3)
+                path = "/small.jpg"
+            body = files.get(path)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(media, "media_cache", TieredCache("media", directory=str(tmp_path)))
+    yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    server.shutdown()
+
+
+def test_process_image_fits_screen_with_gray_levels():
+    png = media.process_image(jpeg(3000, 2000))
+    with Image.open(io.BytesIO(png)) as image:
+        assert image.size == (media.MEDIA_MAX_WIDTH, 936)
+        colors = {rgb for _, rgb in image.convert("RGB").getcolors()}
+    assert len(colors) <= media.MEDIA_GRAY_LEVELS
+    assert all(r == g == b for r, g, b in colors)
+
+
+def test_embed_images_inlines_caches_and_drops_failures(photos):
+    base, hits = photos
+    html = _format_html(
+        ["Some text long enough to keep.", ("img", f"{base}/small.jpg"), ("img", f"{base}/missing.jpg"),
+         ("img", f"{base}/small.jpg")],
+        "Photos",
+    )
+
+    embedded = media.embed_images(html)
+    assert embedded.count('src="data:image/png;base64,') == 2
+    assert "missing.jpg" not in embedded and "<figure>" in embedded
+    assert sorted(hits) == ["/missing.jpg", "/small.jpg"]  # Repeated image fetched once
+
+    media.embed_images(html)
+    assert sorted(hits) == ["/missing.jpg", "/missing.jpg", "/small.jpg"]  # Processed image came from the cache
+
+
+def test_embed_images_stops_at_document_cap(photos):
+    base, _ = photos
+    small_url = f"{base}/small.jpg"
+    html = _format_html([("img", small_url), ("img", f"{base}/big.jpg"), ("img", small_url)], "Photos")
+    small = len(media.process_image(jpeg(200, 100)))
+
+    embedded = media.embed_images(html, max_bytes=small + 1)
+    assert embedded.count("data:image/png") == 2  # The repeat is embedded once, so it is free
+    assert "big.jpg" not in embedded
+
+
+def test_fetches_beyond_the_pool_wait_instead_of_timing_out(photos):
+    base, hits = photos
+    urls = [f"{base}/slow/{n}.jpg" for n in range(6)]
+
+    async def fetch():
+        # Each download fits the timeout, but all six at once would not fit two connections
+        fetcher = media.MediaFetcher(concurrency=2, timeout=0.5)
+        await fetcher.start()
+        try:
+            return await fetcher.fetch_all(urls)
+        finally:
+            await fetcher.close()
+
+    results = asyncio.run(fetch())
+    assert all(results[url] for url in urls)
+    assert len(hits) == 6
+
+
+def test_strip_images_removes_remote_figures():
+    html = _format_html(["Text that stays in the document.", ("img", "https://pbs.twimg.com/media/a.jpg")], "T")
+    stripped = media.strip_images(html)
+    assert "<figure>" not in stripped and "Text that stays" in stripped
@@ -0,0 +1,31 @@
+"""
+Tests for render profile configuration (rendering itself needs WeasyPrint's native libraries).
+"""
+
+import re
+from urllib.parse import urlsplit
+
+import pytest
+
+from pdf_renderer import RENDER_OPTIONS, RENDER_PROFILES, PdfRenderer
+
+
+def test_every_profile_has_write_options():
+    assert set(RENDER_OPTIONS) == set(RENDER_PROFILES)
+
+
+def test_bundled_fonts_exist():
+    urls = re.findall(r"url\('([^']+)'\)", RENDER_PROFILES["remarkable"])
+    assert urls
+    for url in urls:
+        with open(urlsplit(url).path, "rb") as f:
+            assert f.read(4) == b"\x00\x01\x00\x00"  # TrueType
+
+
+def test_unknown_profile_is_rejected():
+    renderer = PdfRenderer(workers=1)
+    try:
+        with pytest.raises(ValueError):
+            renderer.render("<p>hi</p>", "no-such-profile")
+    finally:
+        renderer.close()
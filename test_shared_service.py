@@ -0,0 +1,57 @@
+"""
+Tests for SharedService: lazy start on a background loop, and cleanup when that start fails.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from shared_service import SharedService
+
+
+class Service:
+    starts = 0
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.loop = None
+
+    async def start(self):
+        Service.starts += 1
+        self.loop = asyncio.get_running_loop()
+        if self.fail:
+            raise RuntimeError("no browser")
+
+    async def close(self):
+        pass
+
+
+def test_get_starts_one_instance_on_a_background_loop():
+    Service.starts = 0
+    service = SharedService("test-service", Service)
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(service.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert Service.starts == 1
+    assert all(instance is service.current for instance in instances)
+    assert service.current.loop.is_running()
+    loop = service.current.loop
+    asyncio.run_coroutine_threadsafe(service.stop(), loop).result()
+    assert service.current is None
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_failed_start_stops_its_loop():
+    service = SharedService("failing-service", Service)
+    with pytest.raises(RuntimeError):
+        service.get(True)
+    assert service.current is None
+    for thread in threading.enumerate():
+        if thread.name == "failing-service":
+            thread.join(2)
+            assert not thread.is_alive()
@@ -0,0 +1,36 @@
+"""
+Tests for Server-Timing formatting and the sampling profiler.
+"""
+
+import time
+
+from tracing import sampled, server_timing
+
+
+def busy_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_server_timing_skips_unfinished_stages():
+    header = server_timing({"fetch": 4210, "extract": 12.34, "render": None})
+    assert header == "fetch;dur=4210.0, extract;dur=12.3"
+
+
+def test_sampled_writes_folded_stacks(tmp_path):
+    path = tmp_path / "extract.folded"
+    with sampled(str(path)):
+        busy_work(0.2)
+
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "test_tracing.py:busy_work" in stack
+
+
+def test_sampled_without_path_is_a_no_op(tmp_path):
+    with sampled(None):
+        busy_work(0.01)
+    assert not list(tmp_path.iterdir())
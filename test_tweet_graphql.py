@@ -0,0 +1,135 @@
+"""
+Tests for building articles from captured TweetDetail GraphQL responses.
+"""
+
+from extractor import parse_article
+from tweet_graphql import is_thread_response, parse_thread
+
+AUTHOR = {"rest_id": "1", "legacy": {"name": "Dan", "screen_name": "dan"}}
+OTHER = {"rest_id": "2", "legacy": {"name": "Someone", "screen_name": "someone"}}
+
+
+def tweet(tweet_id, text, user=AUTHOR, reply_to=None, conversation="100", **extra):
+    return {
+        "__typename": "Tweet",
+        "rest_id": tweet_id,
+        "core": {"user_results": {"result": user}},
+        "legacy": {
+            "full_text": text,
+            "display_text_range": [0, len(text)],
+            "entities": {"urls": [], "media": []},
+            "user_id_str": user["rest_id"],
+            "conversation_id_str": conversation,
+            "in_reply_to_status_id_str": reply_to,
+        },
+        **extra,
+    }
+
+
+def entry(result):
+    return {"content": {"itemContent": {"tweet_results": {"result": result}}}}
+
+
+def conversation_entry(*results):
+    return {"content": {"items": [{"item": {"itemContent": {"tweet_results": {"result": r}}}} for r in results]}}
+
+
+def tweet_detail(*entries):
+    return {
+        "data": {
+            "threaded_conversation_with_injections_v2": {
+                "instructions": [{"type": "TimelineAddEntries", "entries": list(entries)}]
+            }
+        }
+    }
+
+
+def test_self_thread_follows_author_replies_only():
+    link = "https://t.co/abc"
+    root = tweet("100", f"First part of the thread &amp; more {link}")
+    root["legacy"]["entities"]["urls"] = [{"url": link, "expanded_url": "https://example.com/post"}]
+    payload = tweet_detail(
+        entry(root),
+        conversation_entry(
+            tweet("101", "Second part.\n\nWith a second paragraph.", reply_to="100"),
+            tweet("102", "Third part", reply_to="101"),
+        ),
+        conversation_entry(tweet("200", "Great thread!", user=OTHER, reply_to="100")),
+        conversation_entry(tweet("103", "@someone thanks", reply_to="200")),
+    )
+
+    article = parse_thread([payload], "100")
+    assert article["author"]["screen_name"] == "dan"
+    assert [text for _, text in article["blocks"]] == [
+        "First part of the thread & more https://example.com/post",
+        "Second part.",
+        "With a second paragraph.",
+        "Third part",
+    ]
+
+
+def test_thread_photos_follow_their_tweet():
+    root = tweet("100", "Look at this")
+    root["legacy"]["extended_entities"] = {
+        "media": [
+            {"type": "photo", "media_url_https": "https://pbs.twimg.com/media/a.jpg"},
+            {"type": "video", "media_url_https": "https://pbs.twimg.com/ext_tw_video_thumb/b.jpg"},
+        ]
+    }
+    payload = tweet_detail(entry(root), conversation_entry(tweet("101", "And more", reply_to="100")))
+
+    article = parse_thread([payload], "100")
+    assert article["title"] == "Look at this"
+    assert article["blocks"] == [
+        ("p", "Look at this"),
+        ("img", "https://pbs.twimg.com/media/a.jpg"),
+        ("p", "And more"),
+    ]
+    html = parse_article("", "", "https://x.com/dan/status/100", [payload])["html"]
+    assert '<figure><img src="https://pbs.twimg.com/media/a.jpg" alt=""></figure>' in html
+
+
+def test_longform_article_blocks_and_html():
+    article_result = {
+        "title": "How to <write>",
+        "content_state": {
+            "blocks": [
+                {"type": "unstyled", "text": "Intro paragraph."},
+                {"type": "header-one", "text": "Section"},
+                {"type": "unordered-list-item", "text": "one"},
+                {"type": "unordered-list-item", "text": "two"},
+                {"type": "atomic", "text": " "},
+            ]
+        },
+    }
+    focal = tweet("100", "https://t.co/x", article={"article_results": {"result": article_result}})
+
+    article = parse_article("", "", "https://x.com/dan/status/100", [tweet_detail(entry(focal))])
+    assert article["title"] == "How to <write>"
+    assert "<h1>How to &lt;write&gt;</h1>" in article["html"]
+    assert "<h2>Section</h2>\n<ul>\n<li>one</li>\n<li>two</li>\n</ul>" in article["html"]
+    assert article["text"].split("\n\n")[1] == "Intro paragraph."
+
+
+def test_longform_article_without_blocks_is_not_enough():
+    article_result = {"title": "My Article", "preview_text": "Just the teaser"}
+    focal = tweet("100", "https://t.co/x", article={"article_results": {"result": article_result}})
+    assert parse_thread([tweet_detail(entry(focal))], "100") is None
+
+
+def test_missing_tweet_falls_back_to_dom():
+    payload = tweet_detail(entry(tweet("999", "Unrelated")))
+    assert parse_thread([payload], "100") is None
+
+    raw_html = "<html><head><title>Dan on X: \"Title\" / X</title></head><body><article>" + (
+        "<p>Paragraph text long enough to keep in the article body.</p>" * 5
+    ) + "</article></body></html>"
+    article = parse_article(raw_html, "", "https://x.com/dan/status/100", [payload])
+    assert article["title"] == "Title"
+
+
+def test_is_thread_response():
+    assert is_thread_response("https://x.com/i/api/graphql/abc-_1/TweetDetail?variables=%7B%7D")
+    assert not is_thread_response("https://x.com/i/api/graphql/abc/UserByScreenName?variables=")
+    # The logged-out view; capturing it would skip the expired-cookie check
+    assert not is_thread_response("https://x.com/i/api/graphql/abc/TweetResultByRestId?variables=")
@@ -0,0 +1,192 @@
+"""
+Tests for the upload scheduler: spooling, the retry loop, resumed and batched
+uploads, Retry-After and the shared token bucket.
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from dropbox_uploader import DropboxError
+from upload_scheduler import TokenBucket, UploadScheduler, retrying
+
+
+class FlakyUpload:
+    """upload_file stand-in that raises the queued errors before succeeding."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, title, fileobj, extension, session=None, on_session=None):
+        self.calls.append((time.monotonic(), title, fileobj.read(), extension))
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"/reMarkable/{title}{extension}"
+
+
+def scheduler(directory, upload, **kwargs):
+    kwargs.setdefault("upload_batch", None)
+    return UploadScheduler(
+        str(directory), bucket=TokenBucket(per_minute=0), backoff=0.01, upload=upload, **kwargs
+    )
+
+
+def test_transient_failure_is_left_to_the_retry_loop(tmp_path):
+    upload = FlakyUpload(DropboxError("down", 503), DropboxError("reset"))
+    retried, uploaded = [], []
+    uploads = scheduler(tmp_path, upload, on_retry=retried.append, on_uploaded=lambda entry, path: uploaded.append(path))
+    uploads.spool("k", b"%PDF", "Title", ".pdf", url="https://x.com/a/status/1")
+
+    # One attempt per call; the failure schedules a retry instead of sleeping here
+    with pytest.raises(DropboxError):
+        uploads.upload("k")
+    assert len(upload.calls) == 1 and uploads.get("k")["attempts"] == 1
+
+    deadline = time.time() + 5
+    while uploads.get("k") is not None and time.time() < deadline:
+        uploads.retry_due()
+        time.sleep(0.01)
+    assert uploaded == ["/reMarkable/Title.pdf"]
+    assert [call[1:] for call in upload.calls] == [("Title", b"%PDF", ".pdf")] * 3
+    assert len(retried) == 2
+    assert uploads.pending() == []
+
+
+def test_retry_loop_runs_in_the_background(tmp_path):
+    done = threading.Event()
+    uploads = scheduler(
+        tmp_path, FlakyUpload(*[DropboxError("down", 500)] * 3), on_uploaded=lambda entry, path: done.set()
+    )
+    uploads.spool("k", b"x", "T", ".epub")
+    uploads.start()
+    try:
+        with pytest.raises(DropboxError):
+            uploads.upload("k")
+        assert done.wait(5)
+    finally:
+        uploads.stop()
+    assert uploads.get("k") is None
+
+
+def test_retry_after_pauses_every_upload(tmp_path):
+    upload = FlakyUpload(DropboxError("slow down", 429, retry_after=0.3))
+    uploads = scheduler(tmp_path, upload)
+    uploads.spool("a", b"1", "A", ".pdf")
+    uploads.spool("b", b"2", "B", ".pdf")
+
+    started, now = time.monotonic(), time.time()
+    with pytest.raises(DropboxError):
+        uploads.upload("a")
+    uploads.upload("b")
+    assert upload.calls[1][0] - started >= 0.3
+    assert uploads.get("a")["retry_at"] >= now + 0.3  # Not before Dropbox said
+
+
+def test_rejected_retry_is_abandoned_and_parked(tmp_path):
+    abandoned = []
+    upload = FlakyUpload(DropboxError("down", 503), DropboxError("bad path", 400))
+    uploads = scheduler(tmp_path, upload, on_abandoned=lambda entry, error: abandoned.append(error))
+    uploads.spool("k", b"x", "T", ".pdf")
+    with pytest.raises(DropboxError):
+        uploads.upload("k")
+
+    time.sleep(0.02)
+    assert uploads.retry_due() == 0
+    assert abandoned == ["bad path"]
+    assert uploads.get("k")["retryable"] is False
+    uploads.retry_due()
+    assert len(upload.calls) == 2  # Parked entries are not retried
+
+
+def test_failed_upload_stays_spooled_across_restart(tmp_path):
+    uploads = scheduler(tmp_path, FlakyUpload(DropboxError("bad path", 400)))
+    uploads.spool("k", b"%PDF", "Title", ".pdf", url="https://x.com/a/status/1", format="pdf")
+
+    with pytest.raises(DropboxError):
+        uploads.upload("k")
+
+    # A new scheduler on the same directory, as after a restart, still has it
+    upload = FlakyUpload()
+    restarted = scheduler(tmp_path, upload)
+    [entry] = restarted.pending()
+    assert entry["url"] == "https://x.com/a/status/1" and entry["attempts"] == 1 and "bad path" in entry["error"]
+    assert entry["retryable"] is False
+    assert restarted.upload("k") == "/reMarkable/Title.pdf"
+    assert upload.calls[0][2] == b"%PDF"
+
+
+def test_upload_session_is_kept_for_the_next_attempt(tmp_path):
+    sessions = []
+
+    def upload(title, fileobj, extension, session=None, on_session=None):
+        sessions.append(session)
+        if len(sessions) == 1:
+            on_session({"session_id": "s1", "offset": 4, "closed": False})
+            raise DropboxError("reset")
+        if len(sessions) == 2:
+            raise DropboxError("lookup_failed/not_found/", 409)  # The session expired meanwhile
+        return "/reMarkable/T.pdf"
+
+    uploads = scheduler(tmp_path, upload)
+    uploads.spool("k", b"%PDF-1234", "T", ".pdf")
+    with pytest.raises(DropboxError):
+        uploads.upload("k")
+    assert uploads.get("k")["session"]["offset"] == 4
+
+    # A rejected session is dropped and the entry stays in the retry loop to start afresh
+    time.sleep(0.02)
+    uploads.retry_due()
+    entry = uploads.get("k")
+    assert "session" not in entry and retrying(entry)
+    time.sleep(0.05)
+    assert uploads.retry_due() == 1
+    assert sessions == [None, {"session_id": "s1", "offset": 4, "closed": False}, None]
+
+
+def test_due_retries_are_committed_as_one_batch(tmp_path):
+    batches, uploaded = [], []
+
+    def upload_batch(files, on_session=None):
+        batches.append([(title, fileobj.read(), session) for title, fileobj, extension, session in files])
+        return ["/reMarkable/A.pdf", DropboxError("down", 503), "/reMarkable/C.pdf"]
+
+    uploads = scheduler(
+        tmp_path, FlakyUpload(), upload_batch=upload_batch, on_uploaded=lambda entry, path: uploaded.append(path)
+    )
+    for key in "ABC":
+        entry = uploads.spool(key, key.encode(), key, ".pdf")
+        entry["attempts"] = 1  # Failed once, due now
+        uploads._save(entry)
+
+    assert uploads.retry_due() == 2
+    assert batches == [[("A", b"A", None), ("B", b"B", None), ("C", b"C", None)]]
+    assert uploaded == ["/reMarkable/A.pdf", "/reMarkable/C.pdf"]
+    [entry] = uploads.pending()
+    assert entry["key"] == "B" and entry["attempts"] == 2 and retrying(entry)
+
+
+def test_expire_drops_old_entries(tmp_path):
+    abandoned = []
+    uploads = scheduler(tmp_path, FlakyUpload(), ttl=60, on_abandoned=lambda entry, error: abandoned.append(entry["key"]))
+    uploads.spool("old", b"1", "Old", ".pdf")
+    uploads.spool("new", b"2", "New", ".pdf")
+    entry = uploads.get("old")
+    entry["spooled_at"] -= 61
+    entry["attempts"] = 3  # Still being retried, so its job hears about it
+    uploads._save(entry)
+
+    assert uploads.expire() == 1
+    assert abandoned == ["old"]
+    assert [entry["key"] for entry in uploads.pending()] == ["new"]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(uploads._base("new")) + ext for ext in (".json", ".pdf"))
+
+
+def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(per_minute=600, burst=2)  # 10 per second
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.28  # Two free, then three at 0.1 s each
@@ -0,0 +1,107 @@
+"""
+Per-request tracing: Server-Timing headers, structured trace records and
+opt-in debug captures (sampling profiles and the raw fetched page).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Debug captures go to TRACE_DIR/<request id>/
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+# Allow "debug": true on /send; off by default so clients can't fill the disk
+TRACE_DEBUG = os.getenv("TRACE_DEBUG", "false").lower() in ("1", "true", "yes")
+SAMPLE_INTERVAL_MS = float(os.getenv("TRACE_SAMPLE_INTERVAL_MS", "5"))
+
+
+def server_timing(durations_ms: dict[str, float]) -> str:
+    """Format {name: milliseconds} as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in durations_ms.items() if ms is not None)
+
+
+def log_trace(record: dict) -> None:
+    """Print one trace record as a single JSON line (greppable by request_id)."""
+    print("TRACE " + json.dumps(record, sort_keys=True, default=str))
+
+
+def trace_dir(request_id: str) -> str:
+    path = os.path.join(TRACE_DIR, request_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_page(directory: str, page: dict) -> None:
+    """Keep the fetched page (HTML and any captured thread JSON) for offline debugging."""
+    if page.get("html"):
+        with open(os.path.join(directory, "raw_page.html"), "w") as f:
+            f.write(page["html"])
+    if page.get("thread"):
+        with open(os.path.join(directory, "raw_thread.json"), "w") as f:
+            json.dump(page["thread"], f)
+    if page.get("article"):
+        with open(os.path.join(directory, "article.json"), "w") as f:
+            json.dump(page["article"], f)
+    print(f"Saved raw page to {directory}")
+
+
+class Sampler:
+    """
+    Stack sampling profiler for one thread.
+
+    A background thread records the target thread's stack every
+    `interval_ms`; the result is in collapsed ("folded") format, one
+    `frame;frame;frame count` line per distinct stack, ready for flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int | None = None, interval_ms: float = SAMPLE_INTERVAL_MS):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._sample, name="trace-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def sampled(path: str | None):
+    """Profile the calling thread into `path` (folded stacks); no-op when path is None."""
+    if path is None:
+        yield
+        return
+    sampler = Sampler()
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        sampler.write(path)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"Profiled {sum(sampler.stacks.values())} samples over {elapsed_ms:.0f}ms to {path}")
@@ -0,0 +1,193 @@
+"""
+Build articles from Twitter's GraphQL TweetDetail responses.
+The web client loads every thread through this JSON, so reading it directly
+skips waiting for the page to render and Readability's guesswork.
+"""
+
+import html
+import re
+
+# GraphQL operations whose responses carry the focal tweet and its thread. Not
+# TweetResultByRestId: that is the logged-out view, which must reach the auth check
+THREAD_OPERATIONS = ("TweetDetail",)
+
+_OPERATION_RE = re.compile(r"/graphql/[^/]+/(\w+)")
+_STATUS_ID_RE = re.compile(r"/status(?:es)?/(\d+)")
+
+# Longform article block types -> tags understood by extractor._format_html
+_BLOCK_TAGS = {
+    "unstyled": "p",
+    "header-one": "h2",
+    "header-two": "h3",
+    "blockquote": "blockquote",
+    "unordered-list-item": "ul",
+    "ordered-list-item": "ol",
+}
+
+
+def is_thread_response(url: str) -> bool:
+    """Check if a network response URL is one of the thread GraphQL operations."""
+    match = _OPERATION_RE.search(url)
+    return match is not None and match.group(1) in THREAD_OPERATIONS
+
+
+def status_id(url: str) -> str | None:
+    """Extract the tweet id from a status URL."""
+    match = _STATUS_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _unwrap(result: dict | None) -> dict | None:
+    """Tweets behind visibility or tombstone wrappers keep the real tweet one level down."""
+    if not result:
+        return None
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet")
+    if not result or "legacy" not in result:
+        return None
+    return result
+
+
+def _iter_tweets(payload: dict):
+    """Yield every tweet result in a response, in timeline order."""
+    data = payload.get("data", {})
+    conversation = data.get("threaded_conversation_with_injections_v2", {})
+    for instruction in conversation.get("instructions", []):
+        for entry in instruction.get("entries", []):
+            content = entry.get("content", {})
+            items = [content] + [item.get("item", {}) for item in content.get("items", [])]
+            for item in items:
+                tweet = _unwrap(item.get("itemContent", {}).get("tweet_results", {}).get("result"))
+                if tweet:
+                    yield tweet
+
+
+def find_tweet(payloads: list[dict], tweet_id: str) -> dict | None:
+    """Return the tweet with this id from any of the responses."""
+    for payload in payloads:
+        for tweet in _iter_tweets(payload):
+            if tweet.get("rest_id") == tweet_id:
+                return tweet
+    return None
+
+
+def _author(tweet: dict) -> dict:
+    user = tweet.get("core", {}).get("user_results", {}).get("result", {})
+    # Newer responses moved name/screen_name from legacy to core
+    names = {**user.get("legacy", {}), **user.get("core", {})}
+    return {"name": names.get("name", ""), "screen_name": names.get("screen_name", "")}
+
+
+def _tweet_text(tweet: dict) -> str:
+    """Displayed text of a tweet (or its long-post body) with t.co links expanded."""
+    legacy = tweet["legacy"]
+    note = tweet.get("note_tweet", {}).get("note_tweet_results", {}).get("result")
+    if note:
+        text, entities = note.get("text", ""), note.get("entity_set", {})
+    else:
+        text, entities = legacy.get("full_text", ""), legacy.get("entities", {})
+        start, end = legacy.get("display_text_range", [0, len(text)])
+        text = text[start:end]
+
+    for url in entities.get("urls", []):
+        text = text.replace(url["url"], url.get("expanded_url") or url["url"])
+    for media in legacy.get("entities", {}).get("media", []):
+        text = text.replace(media["url"], "")
+    return html.unescape(text).strip()
+
+
+def _tweet_photos(tweet: dict) -> list[tuple[str, str]]:
+    """("img", url) blocks for a tweet's attached photos."""
+    legacy = tweet["legacy"]
+    media = legacy.get("extended_entities", legacy.get("entities", {})).get("media", [])
+    return [("img", item["media_url_https"]) for item in media if item.get("type") == "photo"]
+
+
+def _article_blocks(article: dict) -> list[tuple[str, str]]:
+    """Convert a longform article's content blocks into (tag, text) blocks."""
+    blocks = []
+    for block in article.get("content_state", {}).get("blocks", []):
+        tag = _BLOCK_TAGS.get(block.get("type"))
+        text = block.get("text", "").strip()
+        if tag and text:
+            blocks.append((tag, text))
+    return blocks
+
+
+def _self_thread(tweets: list[dict], focal: dict) -> list[dict]:
+    """The focal author's chain of self-replies, starting at the conversation root if they wrote it."""
+    author_id = focal["legacy"].get("user_id_str")
+    conversation_id = focal["legacy"].get("conversation_id_str")
+    own = [
+        tweet for tweet in tweets
+        if tweet["legacy"].get("user_id_str") == author_id
+        and tweet["legacy"].get("conversation_id_str") == conversation_id
+    ]
+    root_id = conversation_id if any(t["rest_id"] == conversation_id for t in own) else focal["rest_id"]
+
+    thread = []
+    thread_ids = set()
+    for tweet in own:
+        if tweet["rest_id"] in thread_ids:
+            continue
+        if tweet["rest_id"] == root_id or tweet["legacy"].get("in_reply_to_status_id_str") in thread_ids:
+            thread.append(tweet)
+            thread_ids.add(tweet["rest_id"])
+    return thread
+
+
+def short_title(text: str, limit: int = 80) -> str:
+    """First `limit` characters of the text, cut at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def first_text(blocks: list[tuple[str, str]]) -> str:
+    """Text of the first non-image block, for titles."""
+    return next((text for tag, text in blocks if tag != "img"), "")
+
+
+def paragraphs(text: str) -> list[tuple[str, str]]:
+    """Split tweet text into ("p", text) blocks; blank lines separate paragraphs, like the rendered page."""
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            blocks.append(("p", paragraph))
+    return blocks
+
+
+def parse_thread(payloads: list[dict], tweet_id: str) -> dict | None:
+    """
+    Build an article from captured GraphQL responses.
+
+    Returns dict with title, author and blocks ((tag, text) pairs; photos are
+    ("img", url)), or
+    None if the focal tweet isn't in the responses.
+    """
+    focal = find_tweet(payloads, tweet_id)
+    if focal is None:
+        return None
+    author = _author(focal)
+
+    article = focal.get("article", {}).get("article_results", {}).get("result")
+    if article:
+        blocks = _article_blocks(article)
+        if not blocks:
+            return None  # Only a title and preview; the page has the body
+        return {
+            "title": article.get("title") or short_title(_tweet_text(focal)),
+            "author": author,
+            "blocks": blocks,
+        }
+
+    tweets = [tweet for payload in payloads for tweet in _iter_tweets(payload)]
+    blocks = []
+    for tweet in _self_thread(tweets, focal):
+        blocks.extend(paragraphs(_tweet_text(tweet)))
+        blocks.extend(_tweet_photos(tweet))
+    if not blocks:
+        return None
+    return {"title": short_title(first_text(blocks)), "author": author, "blocks": blocks}
@@ -0,0 +1,377 @@
+"""
+Upload scheduler for rendered articles.
+Each rendered file is spooled to disk before it is uploaded, so a failed or
+interrupted upload is retried from the spool instead of rendering again.
+A job makes one upload attempt; transient failures are retried by a single
+background loop, so an outage never ties up job workers.
+Uploads share a token bucket, and a Retry-After from Dropbox holds all of them off.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from dropbox_uploader import DropboxError, upload_file, upload_files
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "spool")
+# Spooled files not uploaded within this many seconds are dropped
+UPLOAD_SPOOL_TTL = int(os.getenv("UPLOAD_SPOOL_TTL", str(7 * 24 * 3600)))
+# Sustained upload rate across all jobs (0 disables it), and how many may start back to back
+DROPBOX_UPLOADS_PER_MINUTE = float(os.getenv("DROPBOX_UPLOADS_PER_MINUTE", "60"))
+DROPBOX_UPLOAD_BURST = int(os.getenv("DROPBOX_UPLOAD_BURST", "4"))
+# Delay before the retry loop tries a failed upload again, doubling per failure up to the max
+UPLOAD_BACKOFF = float(os.getenv("UPLOAD_BACKOFF", "2"))
+UPLOAD_MAX_BACKOFF = float(os.getenv("UPLOAD_MAX_BACKOFF", "120"))
+# Most due retries committed together in one batch (Dropbox takes up to 1000)
+RETRY_BATCH_SIZE = 50
+
+
+class TokenBucket:
+    """
+    Blocking token bucket shared by upload threads.
+    pause() stops handing out tokens until a deadline, e.g. a Retry-After.
+    """
+
+    def __init__(self, per_minute: float = DROPBOX_UPLOADS_PER_MINUTE, burst: int = DROPBOX_UPLOAD_BURST):
+        self.rate = per_minute / 60
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is free; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self.rate <= 0:
+                    return waited
+                else:
+                    elapsed = max(now - self._updated, 0)
+                    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds`, and start from an empty bucket afterwards."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # No burst straight after the pause, or the same limit is hit again
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+def _retryable(error: Exception) -> bool:
+    """Connection errors, rate limits and server errors; not bad requests or config."""
+    return isinstance(error, DropboxError) and (
+        error.status_code is None or error.status_code == 429 or error.status_code >= 500
+    )
+
+
+class UploadScheduler:
+    """
+    Spool plus rate-limited uploads and a retry loop.
+
+    The spool holds `<key hash>.<extension>` with a `<key hash>.json` beside it
+    describing the upload; the JSON is written last, so an entry only exists
+    once its file is complete. Entries are removed after a successful upload.
+
+    upload() makes one attempt. When it fails on a transient error the entry
+    is scheduled for the retry loop (start()), which keeps trying it with
+    jittered exponential backoff until it is uploaded, rejected or expired;
+    when several are due at once, `upload_batch` commits them together.
+    A large file's upload session is kept in its entry, so the next attempt
+    resumes it instead of sending the file again.
+    `on_uploaded(entry, dropbox_path)` and `on_abandoned(entry, error)` report
+    how the loop's uploads end; `on_retry(error)` is called per transient failure.
+    """
+
+    def __init__(
+        self,
+        directory: str = UPLOAD_SPOOL_DIR,
+        ttl: int = UPLOAD_SPOOL_TTL,
+        bucket: TokenBucket | None = None,
+        backoff: float = UPLOAD_BACKOFF,
+        max_backoff: float = UPLOAD_MAX_BACKOFF,
+        upload=upload_file,
+        upload_batch=upload_files,
+        on_retry=None,
+        on_uploaded=None,
+        on_abandoned=None,
+    ):
+        self.path = directory
+        self.ttl = ttl
+        self.bucket = bucket or TokenBucket()
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._upload = upload
+        self._upload_batch = upload_batch
+        self._on_retry = on_retry
+        self._on_uploaded = on_uploaded
+        self._on_abandoned = on_abandoned
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def _base(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode()).hexdigest())
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _save(self, entry: dict) -> None:
+        self._write(self._base(entry["key"]) + ".json", json.dumps(entry).encode())
+
+    def spool(self, key: str, data: bytes, title: str, extension: str, **details) -> dict:
+        """Keep a rendered file until it is uploaded; `details` (url, options) are stored with it."""
+        base = self._base(key)
+        self._write(base + extension, data)
+        entry = {
+            "key": key,
+            "title": title,
+            "extension": extension,
+            "bytes": len(data),
+            "spooled_at": time.time(),
+            "attempts": 0,
+            "error": None,
+            "retryable": True,
+            "retry_at": None,
+            **details,
+        }
+        self._save(entry)
+        return entry
+
+    def get(self, key: str) -> dict | None:
+        """The spooled entry for `key`, or None if nothing is waiting."""
+        try:
+            with open(self._base(key) + ".json") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or not os.path.exists(self._base(key) + entry["extension"]):
+            return None
+        return entry
+
+    def pending(self) -> list[dict]:
+        """Every spooled entry, oldest first."""
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if self.get(entry.get("key", "")) is not None:
+                entries.append(entry)
+        return sorted(entries, key=lambda entry: entry["spooled_at"])
+
+    def expire(self) -> int:
+        """Drop entries spooled more than `ttl` seconds ago; returns how many."""
+        cutoff = time.time() - self.ttl
+        expired = [entry for entry in self.pending() if entry["spooled_at"] < cutoff]
+        for entry in expired:
+            print(f"Dropping {entry['title']!r} from the upload spool after {entry['attempts']} failed attempt(s)")
+            self.discard(entry["key"])
+            if self._on_abandoned and retrying(entry):
+                self._on_abandoned(entry, f"Upload still failing after {entry['attempts']} attempt(s): {entry['error']}")
+        return len(expired)
+
+    def discard(self, key: str) -> None:
+        """Remove a spooled entry and its file."""
+        entry = self.get(key)
+        base = self._base(key)
+        # JSON first, so a half-removed entry is never picked up again
+        for path in (base + ".json", base + entry["extension"] if entry else None):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def upload(self, key: str) -> str:
+        """
+        Make one attempt at uploading a spooled entry; returns the Dropbox path.
+
+        The entry is removed once uploaded. On failure it is kept and the
+        error re-raised; a transient one also schedules the entry for the
+        retry loop, and a Retry-After pauses every upload, not just this one.
+        """
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(f"Nothing spooled for {key}")
+        resumed = entry.get("session") is not None
+        self.bucket.acquire()
+        try:
+            with open(self._base(key) + entry["extension"], "rb") as f:
+                dropbox_path = self._upload(
+                    entry["title"],
+                    f,
+                    entry["extension"],
+                    session=entry.get("session"),
+                    on_session=lambda session: self._record_session(entry, session),
+                )
+        except Exception as e:
+            self._failed(entry, e, resumed)
+            raise
+
+        self.discard(key)
+        return dropbox_path
+
+    def _record_session(self, entry: dict, session: dict) -> None:
+        entry["session"] = session
+        self._save(entry)
+
+    def _failed(self, entry: dict, error: Exception, resumed: bool) -> None:
+        """Record a failed attempt on the entry and schedule its retry, if there is one."""
+        entry["attempts"] += 1
+        entry["error"] = str(error)
+        # A bad request or config problem won't fix itself: the entry waits for a resend
+        entry["retryable"] = _retryable(error)
+        if resumed and not entry["retryable"]:
+            # Most likely the stored session expired; the next attempt starts a new one
+            entry.pop("session", None)
+            entry["retryable"] = True
+        if entry["retryable"]:
+            delay = getattr(error, "retry_after", None)
+            if delay is not None:
+                print(f"Dropbox asked to wait {delay:g}s; pausing uploads")
+                self.bucket.pause(delay)
+            else:
+                delay = min(self.max_backoff, self.backoff * 2 ** (entry["attempts"] - 1))
+                delay *= 0.5 + random.random() / 2
+            entry["retry_at"] = time.time() + delay
+            if self._on_retry:
+                self._on_retry(error)
+        self._save(entry)
+        self._wake.set()
+
+    def upload_many(self, keys: list[str]) -> dict[str, str | Exception]:
+        """
+        Upload several spooled entries with one batch commit; returns each
+        key's Dropbox path or error. Failures are recorded as in upload().
+        """
+        entries = [entry for entry in map(self.get, keys) if entry is not None]
+        resumed = [entry.get("session") is not None for entry in entries]
+        for _ in entries:
+            self.bucket.acquire()
+        with contextlib.ExitStack() as stack:
+            files = [
+                (entry["title"], stack.enter_context(open(self._base(entry["key"]) + entry["extension"], "rb")),
+                 entry["extension"], entry.get("session"))
+                for entry in entries
+            ]
+            try:
+                results = self._upload_batch(
+                    files, on_session=lambda index, session: self._record_session(entries[index], session)
+                )
+            except Exception as e:
+                results = [e] * len(entries)
+
+        outcome = {}
+        for entry, was_resumed, result in zip(entries, resumed, results):
+            if isinstance(result, Exception):
+                self._failed(entry, result, was_resumed)
+            else:
+                self.discard(entry["key"])
+            outcome[entry["key"]] = result
+        return outcome
+
+    def start(self) -> None:
+        """Start the retry loop (once per process; see _retry_loop)."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._retry_loop, name="upload-retry", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30) -> None:
+        """Stop the retry loop once its current upload is done."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def retry_due(self) -> int:
+        """Retry every entry whose backoff has passed, oldest first; returns how many were uploaded."""
+        due = [
+            entry for entry in self.pending()
+            if retrying(entry) and (entry.get("retry_at") or 0) <= time.time()
+        ]
+        uploaded = 0
+        while due and not self._stop.is_set():
+            batch, due = due[:RETRY_BATCH_SIZE], due[RETRY_BATCH_SIZE:]
+            if len(batch) > 1 and self._upload_batch:
+                results = self.upload_many([entry["key"] for entry in batch])
+            else:
+                results = {}
+                for entry in batch:
+                    try:
+                        results[entry["key"]] = self.upload(entry["key"])
+                    except Exception as e:
+                        results[entry["key"]] = e
+            for entry in batch:
+                result = results.get(entry["key"])
+                if isinstance(result, Exception):
+                    failed = self.get(entry["key"]) or entry
+                    if not failed["retryable"] and self._on_abandoned:
+                        self._on_abandoned(failed, str(result))
+                elif result is not None:
+                    uploaded += 1
+                    if self._on_uploaded:
+                        self._on_uploaded(entry, result)
+        return uploaded
+
+    def _next_retry(self) -> float | None:
+        retry_at = [entry.get("retry_at") or 0 for entry in self.pending() if retrying(entry)]
+        return min(retry_at) if retry_at else None
+
+    def _retry_loop(self) -> None:
+        """
+        Drain scheduled retries until stopped. Processes sharing the spool
+        (uvicorn workers) take turns through a lock file, so only one retries.
+        """
+        with open(os.path.join(self.path, ".retry.lock"), "w") as lock:
+            while not self._stop.is_set():
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    self._stop.wait(60)  # Another process is retrying
+                    continue
+                self._wake.clear()
+                try:
+                    self.expire()
+                    if self.retry_due():
+                        print("✓ Uploaded spooled file(s) on retry")
+                    next_retry = self._next_retry()
+                except Exception as e:
+                    print(f"Upload retry loop error: {e}")
+                    next_retry = None
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                # Check for expired entries at least hourly; a new failure wakes us early
+                delay = 3600 if next_retry is None else max(next_retry - time.time(), 0)
+                self._wake.wait(min(delay, 3600))
+
+
+def retrying(entry: dict) -> bool:
+    """True if the entry belongs to the retry loop: an upload attempt failed on a transient error."""
+    return entry["retryable"] and entry["attempts"] > 0